@@ -1,10 +1,10 @@
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 from dataclasses import dataclass
 from enum import Enum
-import numpy as np
 import logging
-from core.services.fetch_bybit_klines import fetch_klines
+from core.market_data.ring import get_recent_candles
+from core.indicators import get_indicators
 
 log = logging.getLogger(__name__)
 
@@ -60,13 +60,13 @@ class AIAssistant:
     async def analyze_market(self, symbol: str = "BTCUSDT") -> MarketAnalysis:
         """Comprehensive market analysis"""
         try:
-            # Load candles
-            candles = await fetch_klines(symbol, "15", 200)
-            if len(candles) < 50:
+            # Load candles (resident columns, shared with the other AI readers)
+            candles = await get_recent_candles().window("bybit", symbol, "15m", 200)
+            if len(candles["close"]) < 50:
                 raise ValueError("Insufficient data for analysis")
             
             # Calculate technical indicators
-            indicators = await self._calculate_indicators(candles)
+            indicators = await self._calculate_indicators(candles, symbol=symbol, timeframe="15m")
             
             # Determine signal strength
             signal = self._determine_signal(indicators)
@@ -87,7 +87,7 @@ class AIAssistant:
             entry_points = self._find_entry_points(candles, indicators)
             
             # Calculate stop loss and take profit
-            current_price = candles[-1]["close"]
+            current_price = float(candles["close"][-1])
             stop_loss, take_profits = self._calculate_sl_tp(current_price, indicators)
             
             # Generate detailed analysis
@@ -120,48 +120,36 @@ class AIAssistant:
             log.error(f"Market analysis error: {e}")
             raise
     
-    async def _calculate_indicators(self, candles: List[Dict]) -> Dict[str, float]:
+    async def _calculate_indicators(
+        self, candles: Any, symbol: Optional[str] = None, timeframe: Optional[str] = None
+    ) -> Dict[str, float]:
         """Calculate technical indicators"""
-        closes = np.array([c["close"] for c in candles])
-        volumes = np.array([c["volume"] for c in candles])
+        # Cached per symbol/timeframe when they are known
+        ind = get_indicators(candles, symbol, timeframe)
+        closes = ind.close
         
         # Moving averages
-        ma7 = np.mean(closes[-7:])
-        ma20 = np.mean(closes[-20:])
-        ma50 = np.mean(closes[-50:]) if len(closes) >= 50 else ma20
+        ma7 = float(ind.sma(7)[-1])
+        ma20 = float(ind.sma(20)[-1])
+        ma50 = float(ind.sma(50)[-1]) if len(closes) >= 50 else ma20
         
         # RSI calculation
-        deltas = np.diff(closes)
-        gains = deltas.copy()
-        gains[gains < 0] = 0
-        losses = -deltas.copy()
-        losses[losses < 0] = 0
-        
-        avg_gain = np.mean(gains[-14:]) if len(gains) >= 14 else np.mean(gains)
-        avg_loss = np.mean(losses[-14:]) if len(losses) >= 14 else np.mean(losses)
-        
-        if avg_loss != 0:
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs))
-        else:
-            rsi = 100 if avg_gain > 0 else 50
+        rsi = float(ind.rsi(14)[-1])
         
         # MACD
-        ema12 = self._calculate_ema(closes, 12)
-        ema26 = self._calculate_ema(closes, 26)
-        macd = ema12 - ema26
-        signal_line = self._calculate_ema(np.array([macd]), 9)
-        macd_histogram = macd - signal_line
+        macd_line, macd_signal, macd_hist = ind.macd(12, 26, 9)
+        macd = float(macd_line[-1])
+        signal_line = float(macd_signal[-1])
+        macd_histogram = float(macd_hist[-1])
         
         # Bollinger Bands
         bb_middle = ma20
-        bb_std = np.std(closes[-20:])
+        bb_std = float(ind.bollinger(20)[3][-1])
         bb_upper = bb_middle + (2 * bb_std)
         bb_lower = bb_middle - (2 * bb_std)
         
         # Volume analysis
-        volume_ma = np.mean(volumes[-20:])
-        volume_ratio = volumes[-1] / volume_ma if volume_ma > 0 else 1
+        volume_ratio = float(ind.volume_ratio(20)[-1])
         
         # Price position
         price = closes[-1]
@@ -188,17 +176,6 @@ class AIAssistant:
             "volatility": bb_std / bb_middle * 100 if bb_middle > 0 else 0
         }
     
-    def _calculate_ema(self, data: np.ndarray, period: int) -> float:
-        """Calculate Exponential Moving Average"""
-        if len(data) < period:
-            return np.mean(data)
-        
-        alpha = 2 / (period + 1)
-        ema = data[0]
-        for price in data[1:]:
-            ema = alpha * price + (1 - alpha) * ema
-        return ema
-    
     def _determine_signal(self, indicators: Dict[str, float]) -> SignalStrength:
         """Determine trading signal based on indicators"""
         score = 0
@@ -383,7 +360,7 @@ class AIAssistant:
         else:
             return "🟢 Low Risk"
     
-    def _find_entry_points(self, candles: List[Dict], indicators: Dict[str, float]) -> List[float]:
+    def _find_entry_points(self, candles: Any, indicators: Dict[str, float]) -> List[float]:
         """Find optimal entry points"""
         current_price = indicators["price"]
         entry_points = []
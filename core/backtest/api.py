@@ -1,17 +1,88 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import json
 import threading
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from .service import BacktestService
-from .store import BacktestStore
+from .jobs import merge_sweep_parts, run_backtest_job, run_sweep_part, sweep_parts
+from .scheduler import JobScheduler, QueueFull
+from .store import FINAL_STATUSES, BacktestStore
+from .sweep import check_rank_by, expand_grid
 
 router = APIRouter(tags=["backtest"])
 _store = BacktestStore()
-_service = BacktestService()
+_scheduler = JobScheduler(_store)
+
+STREAM_KEEPALIVE_SECONDS = 15.0
+STREAM_QUEUED_REFRESH_SECONDS = 1.0
+
+
+class _StatusFeed:
+    """Fans store status changes out to the asyncio queues of open status streams."""
+
+    def __init__(self, store: BacktestStore) -> None:
+        self._lock = threading.Lock()
+        self._subs: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        store.add_listener(self._on_change)
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subs.setdefault(job_id, []).append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subs = [s for s in self._subs.get(job_id, []) if s[1] is not queue]
+            if subs:
+                self._subs[job_id] = subs
+            else:
+                self._subs.pop(job_id, None)
+
+    def _on_change(self, status: Dict[str, Any]) -> None:
+        with self._lock:
+            subs = list(self._subs.get(status["job_id"], ()))
+        for loop, queue in subs:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, status)
+            except RuntimeError:
+                # loop already closed; its stream is gone
+                pass
+
+
+_feed = _StatusFeed(_store)
+
+
+def _user_of(request: Request) -> str:
+    user = request.headers.get("x-user-id")
+    if user:
+        return user
+    return request.client.host if request.client else "anonymous"
+
+
+def _enqueue(
+    request: Request,
+    job_id: str,
+    fn: Any,
+    payload: Dict[str, Any],
+    priority: int,
+    parts: Optional[List[Dict[str, Any]]] = None,
+    combine: Any = None,
+) -> Dict[str, Any]:
+    try:
+        position = _scheduler.submit_parts(
+            job_id, fn, parts or [payload], combine, user=_user_of(request), priority=priority
+        )
+    except QueueFull as e:
+        _store.set_error(job_id, str(e))
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job_id, "status": "queued" if position else "running", "queue_position": position or None}
 
 
 class BacktestRequest(BaseModel):
@@ -24,42 +95,121 @@ class BacktestRequest(BaseModel):
     fee_rate: float = Field(default=0.0004, ge=0.0)
     slippage: float = Field(default=0.0002, ge=0.0)
     params: Dict[str, Any] = Field(default_factory=dict)
+    engine: Literal["scalar", "vector"] = Field(default="scalar")
+    priority: int = Field(default=0)
 
 
 @router.post("/api/backtest/run")
-def run(req: BacktestRequest) -> Dict[str, Any]:
+def run(req: BacktestRequest, request: Request) -> Dict[str, Any]:
     job = _store.create(request=req.model_dump())
+    return _enqueue(request, job.job_id, run_backtest_job, job.request, req.priority)
+
+
+class SweepRequest(BaseModel):
+    symbol: str = Field(default="BTCUSDT")
+    timeframe: str = Field(default="1h")
+    start: Optional[str] = Field(default=None)
+    end: Optional[str] = Field(default=None)
+    strategy: str = Field(default="sma_cross")
+    initial_balance: float = Field(default=1000.0, ge=0.0)
+    fee_rate: float = Field(default=0.0004, ge=0.0)
+    slippage: float = Field(default=0.0002, ge=0.0)
+    params: Dict[str, Any] = Field(default_factory=dict)
+    grid: Dict[str, Any] = Field(default_factory=dict)
+    rank_by: str = Field(default="total_return")
+    top: Optional[int] = Field(default=None, ge=1)
+    priority: int = Field(default=0)
 
-    def work(job_id: str, payload: Dict[str, Any]) -> None:
-        try:
-            _store.set_running(job_id)
-            _store.set_progress(job_id, 0.1)
-            result = _service.run(
-                symbol=payload["symbol"],
-                timeframe=payload["timeframe"],
-                start=payload.get("start"),
-                end=payload.get("end"),
-                strategy=payload.get("strategy", "buy_and_hold"),
-                initial_balance=payload.get("initial_balance", 1000.0),
-                fee_rate=payload.get("fee_rate", 0.0),
-                slippage=payload.get("slippage", 0.0),
-                params=payload.get("params", {}) or {},
-            )
-            _store.set_progress(job_id, 0.95)
-            _store.set_done(job_id, result=result)
-        except Exception as e:
-            _store.set_error(job_id, str(e))
-
-    threading.Thread(target=work, args=(job.job_id, job.request), daemon=True).start()
-    return {"job_id": job.job_id, "status": "queued"}
+
+@router.post("/api/backtest/sweep")
+def sweep(req: SweepRequest, request: Request) -> Dict[str, Any]:
+    try:
+        combinations = len(expand_grid(req.grid))
+        check_rank_by(req.rank_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job = _store.create(request={"kind": "sweep", **req.model_dump()})
+    # Parts run side by side on the scheduler's workers, within the per-user cap
+    out = _enqueue(
+        request,
+        job.job_id,
+        run_sweep_part,
+        job.request,
+        req.priority,
+        parts=sweep_parts(job.request),
+        combine=functools.partial(merge_sweep_parts, job.request),
+    )
+    out["combinations"] = combinations
+    return out
+
+
+def _status_payload(status: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: status[k] for k in ("job_id", "status", "progress", "error")}
+    out["queue_position"] = _scheduler.position(status["job_id"])
+    return out
 
 
 @router.get("/api/backtest/status/{job_id}")
 def status(job_id: str) -> Dict[str, Any]:
+    st = _store.status(job_id)
+    if not st:
+        raise HTTPException(status_code=404, detail="job not found")
+    return _status_payload(st)
+
+
+@router.get("/api/backtest/stream/{job_id}")
+async def stream(job_id: str, request: Request) -> StreamingResponse:
+    """Server-sent events with the job status on every change, until the job finishes."""
+    queue = _feed.subscribe(job_id)
+    st = _store.status(job_id)
+    if not st:
+        _feed.unsubscribe(job_id, queue)
+        raise HTTPException(status_code=404, detail="job not found")
+
+    async def events():
+        try:
+            current = _status_payload(st)
+            yield f"data: {json.dumps(current)}\n\n"
+            while current["status"] not in FINAL_STATUSES:
+                queued = current["queue_position"] is not None
+                timeout = STREAM_QUEUED_REFRESH_SECONDS if queued else STREAM_KEEPALIVE_SECONDS
+                try:
+                    nxt = _status_payload(await asyncio.wait_for(queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    if not queued:
+                        yield ": keepalive\n\n"
+                        continue
+                    # queue positions move without a status change of this job
+                    nxt = dict(current, queue_position=_scheduler.position(job_id))
+                    if nxt == current:
+                        continue
+                current = nxt
+                yield f"data: {json.dumps(current)}\n\n"
+        finally:
+            _feed.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/api/backtest/cancel/{job_id}")
+def cancel(job_id: str) -> Dict[str, Any]:
     job = _store.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="job not found")
-    return {"job_id": job.job_id, "status": job.status, "progress": job.progress, "error": job.error}
+    if not _scheduler.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"not cancellable: {job.status}")
+    return {"job_id": job_id, "status": "cancelled"}
+
+
+@router.get("/api/backtest/queue")
+def queue() -> Dict[str, Any]:
+    return _scheduler.stats()
 
 
 @router.get("/api/backtest/result/{job_id}")
@@ -69,6 +219,8 @@ def result(job_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=404, detail="job not found")
     if job.status == "error":
         raise HTTPException(status_code=400, detail=job.error or "error")
+    if job.status == "cancelled":
+        raise HTTPException(status_code=410, detail="cancelled")
     if job.status != "done":
         raise HTTPException(status_code=409, detail=f"not ready: {job.status}")
     return job.result or {}
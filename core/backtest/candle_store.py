@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, TextIO
+
+import numpy as np
+
+try:
+    import fcntl
+except ModuleNotFoundError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+COLUMNS = ("ts", "open", "high", "low", "close", "volume")
+_DTYPES = {"ts": np.int64}
+
+
+def _row_ts(r: Dict[str, Any]) -> int:
+    ts = int(float(r.get("ts") or r.get("time") or r.get("timestamp") or 0))
+    if ts > 10_000_000_000:
+        ts //= 1000
+    return ts
+
+
+def _counted_lines(f: TextIO, total: int, on_progress: Callable[[float], None], every: int = 100_000) -> Iterator[str]:
+    consumed = 0
+    for n, line in enumerate(f, start=1):
+        consumed += len(line)
+        if n % every == 0:
+            on_progress(min(consumed / total, 1.0))
+        yield line
+
+
+def read_csv_columns(path: str, on_progress: Optional[Callable[[float], None]] = None) -> Dict[str, np.ndarray]:
+    """
+    Parse an OHLCV CSV into sorted, de-duplicated column arrays (last row per ts wins).
+
+    ``on_progress`` gets the approximate fraction of the file read every 100k rows.
+    """
+    cols: Dict[str, list] = {c: [] for c in COLUMNS}
+    with open(path, "r", encoding="utf-8") as f:
+        lines: Any = f
+        if on_progress is not None:
+            lines = _counted_lines(f, max(os.path.getsize(path), 1), on_progress)
+        for r in csv.DictReader(lines):
+            cols["ts"].append(_row_ts(r))
+            cols["open"].append(float(r["open"]))
+            cols["high"].append(float(r["high"]))
+            cols["low"].append(float(r["low"]))
+            cols["close"].append(float(r["close"]))
+            cols["volume"].append(float(r.get("volume", 0.0) or 0.0))
+
+    out = {c: np.asarray(v, dtype=_DTYPES.get(c, np.float64)) for c, v in cols.items()}
+    ts = out["ts"]
+    if ts.size and not np.all(ts[1:] > ts[:-1]):
+        # stable sort, then keep the last occurrence of every timestamp
+        order = np.argsort(ts, kind="stable")
+        ts_sorted = ts[order]
+        last = np.ones(ts_sorted.size, dtype=bool)
+        last[:-1] = ts_sorted[1:] != ts_sorted[:-1]
+        order = order[last]
+        out = {c: v[order] for c, v in out.items()}
+    return out
+
+
+class CandleStore:
+    """
+    On-disk columnar candle store.
+
+    Each symbol/timeframe lives in ``<root>/<SYMBOL>_<TF>/`` as one ``.npy`` file
+    per column inside a generation directory, plus ``meta.json`` naming the
+    current generation. Imports write a new generation and swap ``meta.json``
+    atomically, so readers never see a half-written dataset. Reads are
+    memory-mapped and range queries are binary searches on the sorted ``ts``.
+
+    Backtests load candles from several processes (scheduler workers, the
+    executor pool), so writers hold a file lock on ``<dir>/.lock``. The
+    generation ``meta.json`` named before a swap is kept until the next one,
+    for readers that resolved it just before.
+    """
+
+    def __init__(self, root: str = os.path.join("data", "store")) -> None:
+        self._root = root
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._open: Dict[str, tuple] = {}
+
+    def _dir(self, symbol: str, timeframe: str) -> str:
+        return os.path.join(self._root, f"{symbol.replace('/', '').upper()}_{timeframe}")
+
+    @contextmanager
+    def _locked(self, symbol: str, timeframe: str) -> Iterator[None]:
+        base = self._dir(symbol, timeframe)
+        os.makedirs(base, exist_ok=True)
+        with self._write_lock, open(os.path.join(base, ".lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def meta(self, symbol: str, timeframe: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self._dir(symbol, timeframe), "meta.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def write(self, symbol: str, timeframe: str, columns: Dict[str, np.ndarray], source: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        with self._locked(symbol, timeframe):
+            return self._write(symbol, timeframe, columns, source)
+
+    def _write(self, symbol: str, timeframe: str, columns: Dict[str, np.ndarray], source: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        base = self._dir(symbol, timeframe)
+        generation = uuid.uuid4().hex
+        gen_dir = os.path.join(base, generation)
+        os.makedirs(gen_dir)
+        n = int(columns["ts"].shape[0])
+        for c in COLUMNS:
+            arr = np.ascontiguousarray(columns[c], dtype=_DTYPES.get(c, np.float64))
+            if arr.shape[0] != n:
+                raise ValueError(f"column {c} has {arr.shape[0]} rows, expected {n}")
+            np.save(os.path.join(gen_dir, f"{c}.npy"), arr)
+
+        meta = {
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "generation": generation,
+            "rows": n,
+            "first_ts": int(columns["ts"][0]) if n else None,
+            "last_ts": int(columns["ts"][-1]) if n else None,
+            "source": source or {},
+        }
+        previous = self.meta(symbol, timeframe)
+        meta_path = os.path.join(base, "meta.json")
+        tmp = f"{meta_path}.tmp_{uuid.uuid4().hex}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, meta_path)
+
+        # Retire older generations, but not the one just replaced: another process
+        # may have read it from meta.json a moment ago. Open memmaps keep deleted
+        # files alive until they are dropped.
+        keep = {generation, (previous or {}).get("generation")}
+        for name in os.listdir(base):
+            if name not in keep and os.path.isdir(os.path.join(base, name)):
+                shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+        return meta
+
+    def import_csv(
+        self, symbol: str, timeframe: str, csv_path: str, on_progress: Optional[Callable[[float], None]] = None
+    ) -> Dict[str, Any]:
+        with self._locked(symbol, timeframe):
+            return self._import(symbol, timeframe, csv_path, on_progress)
+
+    def import_if_stale(
+        self, symbol: str, timeframe: str, csv_path: str, on_progress: Optional[Callable[[float], None]] = None
+    ) -> bool:
+        """Import ``csv_path`` unless the store already has it; True if it imported."""
+        with self._locked(symbol, timeframe):
+            # Checked under the lock: a concurrent loader may have just imported it
+            if self.is_fresh(symbol, timeframe, csv_path):
+                return False
+            self._import(symbol, timeframe, csv_path, on_progress)
+            return True
+
+    def _import(
+        self, symbol: str, timeframe: str, csv_path: str, on_progress: Optional[Callable[[float], None]]
+    ) -> Dict[str, Any]:
+        columns = read_csv_columns(csv_path, on_progress=on_progress)
+        st = os.stat(csv_path)
+        source = {"path": os.path.abspath(csv_path), "mtime": st.st_mtime, "size": st.st_size}
+        return self._write(symbol, timeframe, columns, source)
+
+    def is_fresh(self, symbol: str, timeframe: str, csv_path: str) -> bool:
+        meta = self.meta(symbol, timeframe)
+        if not meta:
+            return False
+        src = meta.get("source") or {}
+        try:
+            st = os.stat(csv_path)
+        except FileNotFoundError:
+            return True
+        return src.get("mtime") == st.st_mtime and src.get("size") == st.st_size
+
+    def columns(self, symbol: str, timeframe: str) -> Optional[Dict[str, np.ndarray]]:
+        """Memory-mapped read-only column arrays for the current generation."""
+        key = self._dir(symbol, timeframe)
+        for attempt in range(2):
+            meta = self.meta(symbol, timeframe)
+            if not meta:
+                return None
+            with self._lock:
+                cached = self._open.get(key)
+                if cached and cached[0] == meta["generation"]:
+                    return cached[1]
+                gen_dir = os.path.join(key, meta["generation"])
+                try:
+                    cols = {c: np.load(os.path.join(gen_dir, f"{c}.npy"), mmap_mode="r") for c in COLUMNS}
+                except FileNotFoundError:
+                    if attempt:
+                        raise
+                    # Retired by two imports since meta.json was read: it names a newer one now
+                    continue
+                self._open[key] = (meta["generation"], cols)
+                return cols
+        return None
+
+    def query(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Rows with ``start_ts <= ts <= end_ts`` (inclusive, seconds) as zero-copy views.
+
+        ``limit`` keeps the first ``limit`` rows of the range, matching the CSV loader.
+        """
+        cols = self.columns(symbol, timeframe)
+        if cols is None:
+            return None
+        ts = cols["ts"]
+        lo = 0 if start_ts is None else int(np.searchsorted(ts, start_ts, side="left"))
+        hi = ts.shape[0] if end_ts is None else int(np.searchsorted(ts, end_ts, side="right"))
+        if limit is not None:
+            hi = min(hi, lo + int(limit))
+        return {c: v[lo:hi] for c, v in cols.items()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Import an OHLCV CSV into the columnar candle store")
+    ap.add_argument("symbol")
+    ap.add_argument("timeframe")
+    ap.add_argument("csv_path")
+    ap.add_argument("--root", default=os.path.join("data", "store"))
+    a = ap.parse_args()
+    print(json.dumps(CandleStore(a.root).import_csv(a.symbol, a.timeframe, a.csv_path), indent=2))
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
-import csv
 import os
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from core.market_data.frame import CandleFrame
+
+from .candle_store import CandleStore
 
 
 @dataclass
@@ -17,6 +22,9 @@ class Candle:
     volume: float
 
 
+_store = CandleStore()
+
+
 def _parse_dt(s: Optional[str]) -> Optional[int]:
     if not s:
         return None
@@ -30,51 +38,62 @@ def _parse_dt(s: Optional[str]) -> Optional[int]:
         return None
 
 
-def load_candles(symbol: str, timeframe: str, start: Optional[str], end: Optional[str], limit: int = 5000) -> List[Candle]:
-    start_ts = _parse_dt(start)
-    end_ts = _parse_dt(end)
-
+def _find_csv(symbol: str, timeframe: str) -> Optional[str]:
     safe_symbol = symbol.replace("/", "")
     csv_paths = [
         os.path.join("data", f"{symbol}_{timeframe}.csv"),
         os.path.join("data", f"{safe_symbol}_{timeframe}.csv"),
     ]
-
     for path in csv_paths:
         if os.path.exists(path):
-            return _load_csv(path, start_ts, end_ts, limit)
-
-    raise RuntimeError(
-        "No candles source found. Put CSV at data/{SYMBOL}_{TF}.csv with columns ts,open,high,low,close,volume"
-    )
-
-
-def _load_csv(path: str, start_ts: Optional[int], end_ts: Optional[int], limit: int) -> List[Candle]:
-    rows: List[Candle] = []
-    with open(path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            ts = int(float(r.get("ts") or r.get("time") or r.get("timestamp") or 0))
-            if ts > 10_000_000_000:
-                ts //= 1000
-            if start_ts is not None and ts < start_ts:
-                continue
-            if end_ts is not None and ts > end_ts:
-                continue
-            rows.append(
-                Candle(
-                    ts=ts,
-                    open=float(r["open"]),
-                    high=float(r["high"]),
-                    low=float(r["low"]),
-                    close=float(r["close"]),
-                    volume=float(r.get("volume", 0.0) or 0.0),
-                )
-            )
-            if len(rows) >= int(limit):
-                break
-
-    rows.sort(key=lambda x: x.ts)
-    if not rows:
-        raise RuntimeError(f"CSV loaded but empty after filters: {path}")
-    return rows
+            return path
+    return None
+
+
+def load_columns(
+    symbol: str,
+    timeframe: str,
+    start: Optional[str],
+    end: Optional[str],
+    limit: int = 5000,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Candle columns (ts/open/high/low/close/volume) from the columnar store.
+
+    A CSV at data/{SYMBOL}_{TF}.csv is the ingest format: it is imported into
+    the store the first time it is seen and again whenever it changes. The
+    import is the slow part, so ``on_progress`` follows it through the file.
+    """
+    start_ts = _parse_dt(start)
+    end_ts = _parse_dt(end)
+
+    csv_path = _find_csv(symbol, timeframe)
+    if csv_path is not None:
+        _store.import_if_stale(symbol, timeframe, csv_path, on_progress=on_progress)
+
+    cols = _store.query(symbol, timeframe, start_ts, end_ts, int(limit))
+    if cols is None:
+        raise RuntimeError(
+            "No candles source found. Put CSV at data/{SYMBOL}_{TF}.csv with columns ts,open,high,low,close,volume"
+        )
+    if cols["ts"].shape[0] == 0:
+        raise RuntimeError(f"Candles loaded but empty after filters: {symbol} {timeframe}")
+    if on_progress is not None:
+        on_progress(1.0)
+    return cols
+
+
+def columns_to_candles(cols: Dict[str, np.ndarray]) -> List[Candle]:
+    return CandleFrame.from_columns(cols).to_objects(Candle)
+
+
+def load_candles(
+    symbol: str,
+    timeframe: str,
+    start: Optional[str],
+    end: Optional[str],
+    limit: int = 5000,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> List[Candle]:
+    return columns_to_candles(load_columns(symbol, timeframe, start, end, limit, on_progress=on_progress))
@@ -4,6 +4,7 @@ from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
 from .data import Candle
+from .progress import PROGRESS_CHUNK, ProgressFn
 
 
 @dataclass
@@ -25,6 +26,7 @@ def run_backtest(
     initial_balance: float,
     fee_rate: float,
     slippage: float,
+    on_progress: Optional[ProgressFn] = None,
 ) -> Dict[str, Any]:
     if not candles:
         raise RuntimeError("No candles")
@@ -110,16 +112,21 @@ def run_backtest(
         entry_ts = 0
         entry_fee = 0.0
 
-    for i, c in enumerate(candles):
-        price = float(c.close)
-        sig = int(signals[i])
-
-        if sig > 0:
-            _buy(price, int(c.ts))
-        elif sig < 0:
-            _sell(price, int(c.ts))
-
-        equity_curve.append((int(c.ts), float(cash + position_qty * price)))
+    n = len(candles)
+    for lo in range(0, n, PROGRESS_CHUNK):
+        for i in range(lo, min(lo + PROGRESS_CHUNK, n)):
+            c = candles[i]
+            price = float(c.close)
+            sig = int(signals[i])
+
+            if sig > 0:
+                _buy(price, int(c.ts))
+            elif sig < 0:
+                _sell(price, int(c.ts))
+
+            equity_curve.append((int(c.ts), float(cash + position_qty * price)))
+        if on_progress is not None:
+            on_progress(min(lo + PROGRESS_CHUNK, n) / n)
 
     # forced close at end if still holding
     if position_qty > 0.0:
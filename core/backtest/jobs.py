@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Callable, Dict, List
+
+from .service import BacktestService
+from .sweep import expand_grid, load_sweep_candles, run_sweep_on_candles, sweep_report
+
+# Job entry points executed inside scheduler worker processes. Each takes the
+# stored request payload and a ``report(progress)`` callback; the scheduler
+# throttles what actually gets sent back.
+
+Report = Callable[[float], None]
+
+# Combinations per sweep part: a sweep is spread over the scheduler's workers
+# in parts of this size, each one slot of the bounded pool
+SWEEP_PART_SIZE = int(os.getenv("BACKTEST_SWEEP_PART_SIZE", "250"))
+
+
+def run_backtest_job(payload: Dict[str, Any], report: Report) -> Dict[str, Any]:
+    return BacktestService().run(
+        symbol=payload["symbol"],
+        timeframe=payload["timeframe"],
+        start=payload.get("start"),
+        end=payload.get("end"),
+        strategy=payload.get("strategy", "buy_and_hold"),
+        initial_balance=payload.get("initial_balance", 1000.0),
+        fee_rate=payload.get("fee_rate", 0.0),
+        slippage=payload.get("slippage", 0.0),
+        params=payload.get("params", {}) or {},
+        engine=payload.get("engine", "scalar"),
+        on_progress=report,
+    )
+
+
+def sweep_parts(payload: Dict[str, Any], part_size: int = SWEEP_PART_SIZE) -> List[Dict[str, Any]]:
+    """Split a sweep request into part payloads of at most ``part_size`` combinations."""
+    combos = expand_grid(payload.get("grid", {}) or {})
+    size = max(1, int(part_size))
+    return [{**payload, "combos": combos[i : i + size]} for i in range(0, len(combos), size)]
+
+
+def run_sweep_part(payload: Dict[str, Any], report: Report) -> Dict[str, Any]:
+    def on_progress(done: int, total: int) -> None:
+        report(0.05 + 0.95 * done / max(total, 1))
+
+    params = payload.get("params", {}) or {}
+    candles = load_sweep_candles(payload["symbol"], payload["timeframe"], payload.get("start"), payload.get("end"), params)
+    results = run_sweep_on_candles(
+        candles,
+        payload.get("strategy", "sma_cross"),
+        payload["combos"],
+        initial_balance=payload.get("initial_balance", 1000.0),
+        fee_rate=payload.get("fee_rate", 0.0),
+        slippage=payload.get("slippage", 0.0),
+        base_params=params,
+        # The part already holds a slot of the scheduler's pool; parallelism
+        # comes from the scheduler running several parts at once
+        max_workers=1,
+        on_progress=on_progress,
+    )
+    return {"results": results, "candles": len(candles)}
+
+
+def merge_sweep_parts(payload: Dict[str, Any], parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine the part results (in part order) into one ranked sweep result."""
+    return sweep_report(
+        [r for part in parts for r in part["results"]],
+        parts[0]["candles"] if parts else 0,
+        symbol=payload["symbol"],
+        timeframe=payload["timeframe"],
+        strategy=payload.get("strategy", "sma_cross"),
+        params=payload.get("params", {}) or {},
+        grid=payload.get("grid", {}) or {},
+        rank_by=payload.get("rank_by", "total_return"),
+        top=payload.get("top"),
+    )
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+ProgressFn = Callable[[float], None]
+
+# Bars (or events) processed between two progress reports inside the engines.
+PROGRESS_CHUNK = 10_000
+
+
+def noop(_: float) -> None:
+    pass
+
+
+class Throttle:
+    """Forward at most one report per ``min_interval`` seconds; 0 and 1 always go through."""
+
+    def __init__(self, report: ProgressFn, min_interval: float = 0.25, clock: Callable[[], float] = time.monotonic) -> None:
+        self._report = report
+        self._min_interval = float(min_interval)
+        self._clock = clock
+        self._last_t = float("-inf")
+        self._last_p = -1.0
+
+    def __call__(self, progress: float) -> None:
+        p = min(max(float(progress), 0.0), 1.0)
+        if p <= self._last_p and p < 1.0:
+            return
+        now = self._clock()
+        if p in (0.0, 1.0) or now - self._last_t >= self._min_interval:
+            self._last_t = now
+            self._last_p = p
+            self._report(p)
+
+
+class Stages:
+    """
+    Map per-stage progress onto a single 0..1 value.
+
+    ``Stages(report, [("load", 0.3), ("simulate", 0.7)]).stage("simulate")(0.5)``
+    reports 0.65. Weights are normalised.
+    """
+
+    def __init__(self, report: Optional[ProgressFn], weights: Sequence[Tuple[str, float]]) -> None:
+        self._report = report or noop
+        total = sum(w for _, w in weights) or 1.0
+        self._spans: Dict[str, Tuple[float, float]] = {}
+        lo = 0.0
+        for name, w in weights:
+            hi = lo + w / total
+            self._spans[name] = (lo, hi)
+            lo = hi
+
+    def stage(self, name: str) -> ProgressFn:
+        lo, hi = self._spans[name]
+        report = self._report
+
+        def on_progress(fraction: float) -> None:
+            report(lo + (hi - lo) * min(max(float(fraction), 0.0), 1.0))
+
+        return on_progress
@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.executor import SPAWN, spawn_pool
+
+from .progress import Throttle
+from .store import BacktestStore
+
+DEFAULT_MAX_WORKERS = int(os.getenv("BACKTEST_MAX_WORKERS", "0")) or (os.cpu_count() or 1)
+DEFAULT_PER_USER_LIMIT = int(os.getenv("BACKTEST_PER_USER_LIMIT", "2"))
+DEFAULT_MAX_QUEUED = int(os.getenv("BACKTEST_MAX_QUEUED", "500"))
+# Minimum seconds between two progress updates of the same job.
+PROGRESS_INTERVAL = float(os.getenv("BACKTEST_PROGRESS_INTERVAL", "0.25"))
+
+JobFn = Callable[[Dict[str, Any], Callable[[float], None]], Dict[str, Any]]
+# Merges the results of a job's parts (in part order) into the job result
+Combine = Callable[[List[Dict[str, Any]]], Dict[str, Any]]
+
+# Worker-process side: progress goes back to the parent over this queue.
+_progress_queue: Any = None
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _init_worker(progress_queue: Any) -> None:
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _execute(fn: JobFn, payload: Dict[str, Any], job_id: str, part: int) -> Dict[str, Any]:
+    def send(progress: float) -> None:
+        if _progress_queue is not None:
+            _progress_queue.put((job_id, part, progress))
+
+    return fn(payload, Throttle(send, min_interval=PROGRESS_INTERVAL))
+
+
+@dataclass(order=True)
+class _Entry:
+    sort_key: Tuple[int, int]
+    job_id: str = field(compare=False)
+    part: int = field(compare=False)
+    fn: JobFn = field(compare=False)
+    payload: Dict[str, Any] = field(compare=False)
+
+
+@dataclass
+class _Job:
+    user: str
+    combine: Optional[Combine]
+    results: List[Optional[Dict[str, Any]]]
+    progress: List[float]
+    running: int = 0
+    remaining: int = 0
+    started: bool = False
+    # cancelled or failed: parts still running are waited out, their results dropped
+    dropped: bool = False
+
+
+class JobScheduler:
+    """
+    Runs backtest jobs on a bounded process pool.
+
+    A job is one or more parts (a sweep is split into chunks of combinations).
+    Parts wait in a priority queue (higher ``priority`` first, FIFO within a
+    priority) and are dispatched while a worker is free and the owner has
+    fewer than ``per_user_limit`` parts running, so one user's sweep cannot
+    take every worker. When the last part finishes, ``combine`` merges the
+    part results into the job's result. Queued jobs can be cancelled
+    outright; parts of a cancelled job that are already running keep their
+    worker until they finish, but their results are discarded.
+    """
+
+    def __init__(
+        self,
+        store: BacktestStore,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        per_user_limit: int = DEFAULT_PER_USER_LIMIT,
+        max_queued: int = DEFAULT_MAX_QUEUED,
+    ) -> None:
+        self._store = store
+        self.max_workers = max(1, int(max_workers))
+        self.per_user_limit = max(1, int(per_user_limit))
+        self.max_queued = int(max_queued)
+        # re-entrant: a future that is already done runs its callback inside add_done_callback
+        self._lock = threading.RLock()
+        self._seq = itertools.count()
+        self._queue: List[_Entry] = []
+        self._jobs: Dict[str, _Job] = {}
+        self._running: Dict[Tuple[str, int], Future] = {}
+        self._per_user: Dict[str, int] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._progress_queue: Any = None
+        self._listener: Optional[threading.Thread] = None
+
+    # ---------- public ----------
+    def submit(self, job_id: str, fn: JobFn, payload: Dict[str, Any], user: str = "anonymous", priority: int = 0) -> int:
+        """Queue a job; returns its 1-based queue position (0 if it started right away)."""
+        return self.submit_parts(job_id, fn, [payload], None, user=user, priority=priority)
+
+    def submit_parts(
+        self,
+        job_id: str,
+        fn: JobFn,
+        payloads: List[Dict[str, Any]],
+        combine: Optional[Combine],
+        user: str = "anonymous",
+        priority: int = 0,
+    ) -> int:
+        """
+        Queue a job that runs ``fn`` once per payload, each part on its own
+        worker. ``combine(results)`` (results in payload order) produces the
+        job result; without it the job has one part and returns its result.
+        """
+        if not payloads:
+            raise ValueError("a job needs at least one part")
+        if combine is None and len(payloads) != 1:
+            raise ValueError("a job with several parts needs combine")
+        with self._lock:
+            if self._queued_jobs_locked() >= self.max_queued:
+                raise QueueFull(f"backtest queue is full ({self.max_queued} jobs)")
+            n = len(payloads)
+            self._jobs[job_id] = _Job(user, combine, [None] * n, [0.0] * n, remaining=n)
+            for part, payload in enumerate(payloads):
+                bisect.insort(self._queue, _Entry((-int(priority), next(self._seq)), job_id, part, fn, payload))
+            self._dispatch_locked()
+            return self._position_locked(job_id) or 0
+
+    def position(self, job_id: str) -> Optional[int]:
+        with self._lock:
+            return self._position_locked(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if the scheduler does not own it."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.dropped:
+                return False
+            self._drop_locked(job_id, job)
+        self._store.set_cancelled(job_id)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "per_user_limit": self.per_user_limit,
+                "running": len(self._running),
+                "queued": self._queued_jobs_locked(),
+                "queued_parts": len(self._queue),
+                "per_user": {u: n for u, n in self._per_user.items() if n},
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            pool, queue = self._detach_pool_locked()
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+        if queue is not None:
+            queue.put(None)
+
+    # ---------- internals ----------
+    def _queued_jobs_locked(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.started)
+
+    def _position_locked(self, job_id: str) -> Optional[int]:
+        job = self._jobs.get(job_id)
+        if job is None or job.started:
+            return None
+        seen: set = set()
+        for entry in self._queue:
+            if entry.job_id == job_id:
+                return len(seen) + 1
+            if not self._jobs[entry.job_id].started:
+                seen.add(entry.job_id)
+        return None
+
+    def _drop_locked(self, job_id: str, job: _Job) -> None:
+        job.dropped = True
+        self._queue = [e for e in self._queue if e.job_id != job_id]
+        if not job.running:
+            del self._jobs[job_id]
+
+    def _ensure_pool_locked(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._progress_queue = SPAWN.Queue()
+            self._listener = threading.Thread(
+                target=self._listen, args=(self._progress_queue,), name="backtest-progress", daemon=True
+            )
+            self._listener.start()
+            self._pool = spawn_pool(self.max_workers, _init_worker, (self._progress_queue,))
+        return self._pool
+
+    def _detach_pool_locked(self) -> Tuple[Optional[ProcessPoolExecutor], Any]:
+        pool, self._pool = self._pool, None
+        queue, self._progress_queue = self._progress_queue, None
+        return pool, queue
+
+    def _dispatch_locked(self) -> None:
+        while self._queue and len(self._running) < self.max_workers:
+            idx = next(
+                (
+                    i
+                    for i, e in enumerate(self._queue)
+                    if self._per_user.get(self._jobs[e.job_id].user, 0) < self.per_user_limit
+                ),
+                None,
+            )
+            if idx is None:
+                return
+            entry = self._queue.pop(idx)
+            job = self._jobs[entry.job_id]
+            if not job.started:
+                job.started = True
+                self._store.set_running(entry.job_id)
+            try:
+                future = self._ensure_pool_locked().submit(_execute, entry.fn, entry.payload, entry.job_id, entry.part)
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._store.set_error(entry.job_id, str(e) or e.__class__.__name__)
+                self._drop_locked(entry.job_id, job)
+                self._detach_pool_locked()
+                continue
+            self._running[(entry.job_id, entry.part)] = future
+            job.running += 1
+            self._per_user[job.user] = self._per_user.get(job.user, 0) + 1
+            future.add_done_callback(lambda f, jid=entry.job_id, part=entry.part: self._finished(jid, part, f))
+
+    def _finished(self, job_id: str, part: int, future: Future) -> None:
+        try:
+            exc = future.exception()
+        except Exception as e:  # CancelledError on shutdown
+            exc = e
+        failed = completed = None
+        progress: Optional[float] = None
+        with self._lock:
+            self._running.pop((job_id, part), None)
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.running -= 1
+                self._per_user[job.user] = max(0, self._per_user.get(job.user, 0) - 1)
+                if job.dropped:
+                    # cancelled, or another part failed: nothing to record
+                    if not job.running:
+                        del self._jobs[job_id]
+                elif exc is not None:
+                    self._drop_locked(job_id, job)
+                    failed = exc
+                else:
+                    job.results[part] = future.result()
+                    job.progress[part] = 1.0
+                    job.remaining -= 1
+                    if job.remaining:
+                        progress = sum(job.progress) / len(job.progress)
+                    else:
+                        del self._jobs[job_id]
+                        completed = job
+        if failed is not None:
+            self._store.set_error(job_id, str(failed) or failed.__class__.__name__)
+        elif completed is not None:
+            self._complete(job_id, completed)
+        elif progress is not None:
+            self._store.set_progress(job_id, progress)
+        broken = None
+        with self._lock:
+            if isinstance(exc, BrokenProcessPool) and self._pool is not None:
+                # a worker died; what is still queued gets a fresh pool
+                broken = self._detach_pool_locked()
+            self._dispatch_locked()
+        if broken is not None:
+            pool, queue = broken
+            pool.shutdown(wait=False)
+            if queue is not None:
+                queue.put(None)
+
+    def _complete(self, job_id: str, job: _Job) -> None:
+        try:
+            result = job.combine(job.results) if job.combine is not None else job.results[0]
+        except Exception as e:
+            self._store.set_error(job_id, str(e) or e.__class__.__name__)
+            return
+        self._store.set_done(job_id, result=result)
+
+    def _listen(self, queue: Any) -> None:
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+            job_id, part, progress = item
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.dropped or (job_id, part) not in self._running:
+                    continue
+                job.progress[part] = progress
+                total = sum(job.progress) / len(job.progress)
+            self._store.set_progress(job_id, total)
@@ -2,9 +2,11 @@ from __future__ import annotations
 
 from typing import Any, Dict, Optional
 
-from .data import load_candles
+from .data import columns_to_candles, load_candles, load_columns
 from .engine import run_backtest
+from .progress import ProgressFn, Stages
 from .strategies import get_strategy
+from .vector_engine import run_backtest_vectorized
 
 
 class BacktestService:
@@ -19,10 +21,25 @@ class BacktestService:
         fee_rate: float,
         slippage: float,
         params: Dict[str, Any],
+        engine: str = "scalar",
+        on_progress: Optional[ProgressFn] = None,
     ) -> Dict[str, Any]:
-        candles = load_candles(symbol=symbol, timeframe=timeframe, start=start, end=end, limit=int((params or {}).get("limit", 5000)))
+        limit = int((params or {}).get("limit", 5000))
         strat = get_strategy(strategy)
-        signals = strat(candles, params or {})
-        result = run_backtest(candles, signals, float(initial_balance), float(fee_rate), float(slippage))
-        result["meta"] = {"symbol": symbol, "timeframe": timeframe, "strategy": strategy, "params": params or {}}
+        stages = Stages(on_progress, [("load", 0.3), ("signals", 0.2), ("simulate", 0.5)])
+        load, signals_done, simulate = stages.stage("load"), stages.stage("signals"), stages.stage("simulate")
+        load(0.0)
+        if engine == "vector":
+            cols = load_columns(symbol=symbol, timeframe=timeframe, start=start, end=end, limit=limit, on_progress=load)
+            signals = strat(columns_to_candles(cols), params or {})
+            signals_done(1.0)
+            result = run_backtest_vectorized(
+                cols["ts"], cols["close"], signals, float(initial_balance), float(fee_rate), float(slippage), on_progress=simulate
+            )
+        else:
+            candles = load_candles(symbol=symbol, timeframe=timeframe, start=start, end=end, limit=limit, on_progress=load)
+            signals = strat(candles, params or {})
+            signals_done(1.0)
+            result = run_backtest(candles, signals, float(initial_balance), float(fee_rate), float(slippage), on_progress=simulate)
+        result["meta"] = {"symbol": symbol, "timeframe": timeframe, "strategy": strategy, "params": params or {}, "engine": engine}
         return result
@@ -5,14 +5,20 @@ import os
 import threading
 import time
 import uuid
-from dataclasses import dataclass, asdict
-from typing import Any, Dict, Optional
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+# Jobs that finished more than this long ago are dropped (with their result files).
+DEFAULT_TTL_SECONDS = float(os.getenv("BACKTEST_JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+_EXPIRE_EVERY_SECONDS = 3600.0
+_COMPACT_JSON = {"ensure_ascii": False, "separators": (",", ":")}
+FINAL_STATUSES = ("done", "error", "cancelled")
 
 
 @dataclass
 class BacktestJob:
     job_id: str
-    status: str  # queued|running|done|error
+    status: str  # queued|running|done|error|cancelled
     created_at: float
     updated_at: float
     progress: float
@@ -21,12 +27,39 @@ class BacktestJob:
     error: Optional[str]
 
 
+def job_status(job: BacktestJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "progress": job.progress,
+        "error": job.error,
+        "updated_at": job.updated_at,
+    }
+
+
 class BacktestStore:
-    def __init__(self, dir_path: str = "reports/backtests") -> None:
+    """
+    Backtest job store.
+
+    Status changes are appended as one compact line to ``events.jsonl``; a
+    job's result is written once, on completion, to ``results/<job_id>.json``
+    and loaded lazily. On start-up the log is replayed so older jobs can be
+    looked up after a restart, jobs that were still running are marked as
+    interrupted, and finished jobs older than ``ttl_seconds`` are expired.
+    """
+
+    def __init__(self, dir_path: str = "reports/backtests", ttl_seconds: float = DEFAULT_TTL_SECONDS) -> None:
         self._lock = threading.Lock()
         self._jobs: Dict[str, BacktestJob] = {}
         self._dir_path = dir_path
-        os.makedirs(self._dir_path, exist_ok=True)
+        self._results_dir = os.path.join(dir_path, "results")
+        self._log_path = os.path.join(dir_path, "events.jsonl")
+        self._ttl = float(ttl_seconds)
+        self._last_expire = 0.0
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        os.makedirs(self._results_dir, exist_ok=True)
+        self._replay()
+        self.expire()
 
     def create(self, request: Dict[str, Any]) -> BacktestJob:
         now = time.time()
@@ -42,7 +75,10 @@ class BacktestStore:
         )
         with self._lock:
             self._jobs[job.job_id] = job
-        self._persist(job)
+            self._append({"e": "create", "job_id": job.job_id, "t": now, "request": request})
+        if now - self._last_expire > _EXPIRE_EVERY_SECONDS:
+            self.expire(now)
+        self._notify(job)
         return job
 
     def set_running(self, job_id: str) -> None:
@@ -51,17 +87,24 @@ class BacktestStore:
             job.status = "running"
             job.updated_at = time.time()
             job.progress = max(job.progress, 0.01)
-        self._persist(job)
+            self._append({"e": "running", "job_id": job_id, "t": job.updated_at, "progress": job.progress})
+        self._notify(job)
 
     def set_progress(self, job_id: str, progress: float) -> None:
         p = min(max(float(progress), 0.0), 1.0)
         with self._lock:
             job = self._jobs[job_id]
+            if job.status in FINAL_STATUSES:
+                # late update from a worker that already finished or was cancelled
+                return
             job.updated_at = time.time()
             job.progress = p
-        self._persist(job)
+            self._append({"e": "progress", "job_id": job_id, "t": job.updated_at, "progress": p})
+        self._notify(job)
 
     def set_done(self, job_id: str, result: Dict[str, Any]) -> None:
+        # the (possibly large) result is serialised once, outside the lock
+        self._write_result(job_id, result)
         with self._lock:
             job = self._jobs[job_id]
             job.status = "done"
@@ -69,7 +112,8 @@ class BacktestStore:
             job.progress = 1.0
             job.result = result
             job.error = None
-        self._persist(job)
+            self._append({"e": "done", "job_id": job_id, "t": job.updated_at})
+        self._notify(job)
 
     def set_error(self, job_id: str, error: str) -> None:
         with self._lock:
@@ -79,16 +123,179 @@ class BacktestStore:
             job.progress = 1.0
             job.result = None
             job.error = (error or "")[:5000]
-        self._persist(job)
+            self._append({"e": "error", "job_id": job_id, "t": job.updated_at, "error": job.error})
+        self._notify(job)
+
+    def set_cancelled(self, job_id: str) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job.status = "cancelled"
+            job.updated_at = time.time()
+            job.result = None
+            job.error = None
+            self._append({"e": "cancelled", "job_id": job_id, "t": job.updated_at})
+        self._notify(job)
+
+    def add_listener(self, fn: Callable[[Dict[str, Any]], None]) -> None:
+        """Call ``fn(status)`` after every status change (from the thread that made it)."""
+        self._listeners.append(fn)
+
+    def remove_listener(self, fn: Callable[[Dict[str, Any]], None]) -> None:
+        try:
+            self._listeners.remove(fn)
+        except ValueError:
+            pass
+
+    def _notify(self, job: BacktestJob) -> None:
+        if not self._listeners:
+            return
+        status = job_status(job)
+        for fn in list(self._listeners):
+            fn(status)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status fields only; never loads the result."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job_status(job)
+        legacy = self._load_legacy(job_id)
+        return job_status(legacy) if legacy else None
 
     def get(self, job_id: str) -> Optional[BacktestJob]:
         with self._lock:
-            return self._jobs.get(job_id)
+            job = self._jobs.get(job_id)
+        if job is None:
+            return self._load_legacy(job_id)
+        if job.status == "done" and job.result is None:
+            result = self._read_result(job_id)
+            with self._lock:
+                job.result = result
+        return job
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop finished jobs older than the TTL and rewrite the log; returns the number removed."""
+        now = time.time() if now is None else now
+        cutoff = now - self._ttl
+        with self._lock:
+            self._last_expire = now
+            expired = [
+                jid for jid, job in self._jobs.items()
+                if job.status in FINAL_STATUSES and job.updated_at < cutoff
+            ]
+            for jid in expired:
+                del self._jobs[jid]
+                try:
+                    os.remove(self._result_path(jid))
+                except FileNotFoundError:
+                    pass
+            self._rewrite_log()
+        return len(expired)
+
+    # ---------- persistence ----------
+    def _result_path(self, job_id: str) -> str:
+        return os.path.join(self._results_dir, f"{job_id}.json")
 
-    def _persist(self, job: BacktestJob) -> None:
-        path = os.path.join(self._dir_path, f"{job.job_id}.json")
+    def _append(self, event: Dict[str, Any]) -> None:
+        line = json.dumps(event, **_COMPACT_JSON)
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def _write_result(self, job_id: str, result: Dict[str, Any]) -> None:
+        path = self._result_path(job_id)
         tmp = f"{path}.tmp_{uuid.uuid4().hex}"
-        payload = asdict(job)
         with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+            json.dump(result, f, **_COMPACT_JSON)
         os.replace(tmp, path)
+
+    def _read_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._result_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _load_legacy(self, job_id: str) -> Optional[BacktestJob]:
+        # jobs persisted by the old one-file-per-job format
+        if os.sep in job_id or "/" in job_id:
+            return None
+        path = os.path.join(self._dir_path, f"{job_id}.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return BacktestJob(**json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return None
+
+    def _apply(self, ev: Dict[str, Any]) -> None:
+        kind = ev.get("e")
+        jid = ev.get("job_id")
+        t = float(ev.get("t", 0.0))
+        if kind in ("create", "snapshot"):
+            self._jobs[jid] = BacktestJob(
+                job_id=jid,
+                status=ev.get("status", "queued"),
+                created_at=float(ev.get("created_at", t)),
+                updated_at=t,
+                progress=float(ev.get("progress", 0.0)),
+                request=ev.get("request") or {},
+                result=None,
+                error=ev.get("error"),
+            )
+            return
+        job = self._jobs.get(jid)
+        if job is None:
+            return
+        job.updated_at = t
+        if kind == "running":
+            job.status = "running"
+            job.progress = float(ev.get("progress", job.progress))
+        elif kind == "progress":
+            job.progress = float(ev.get("progress", job.progress))
+        elif kind == "done":
+            job.status = "done"
+            job.progress = 1.0
+            job.error = None
+        elif kind == "error":
+            job.status = "error"
+            job.progress = 1.0
+            job.error = ev.get("error")
+        elif kind == "cancelled":
+            job.status = "cancelled"
+
+    def _replay(self) -> None:
+        try:
+            with open(self._log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except (json.JSONDecodeError, TypeError, ValueError):
+                        # torn last line after a crash
+                        continue
+        except FileNotFoundError:
+            return
+        now = time.time()
+        for job in self._jobs.values():
+            if job.status in ("queued", "running"):
+                # the thread that owned it died with the previous process
+                job.status = "error"
+                job.progress = 1.0
+                job.error = "interrupted by server restart"
+                job.updated_at = now
+
+    def _rewrite_log(self) -> None:
+        # one snapshot line per live job keeps the log bounded
+        tmp = f"{self._log_path}.tmp_{uuid.uuid4().hex}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for job in self._jobs.values():
+                ev = {
+                    "e": "snapshot",
+                    "job_id": job.job_id,
+                    "t": job.updated_at,
+                    "created_at": job.created_at,
+                    "status": job.status,
+                    "progress": job.progress,
+                    "request": job.request,
+                    "error": job.error,
+                }
+                f.write(json.dumps(ev, **_COMPACT_JSON) + "\n")
+        os.replace(tmp, self._log_path)
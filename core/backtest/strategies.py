@@ -1,6 +1,13 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import math
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.indicators import rolling_mean
+
 from .data import Candle
 
 
@@ -13,36 +20,97 @@ def buy_and_hold(candles: List[Candle], params: Dict[str, Any]) -> List[int]:
     return sig
 
 
-def sma_cross(candles: List[Candle], params: Dict[str, Any]) -> List[int]:
+# Means this close are equal: over a flat stretch the fast and slow means
+# should tie, but their rounding residue differs by a few ulps
+TIE_RTOL = 1e-9
+
+
+def _side(fast: float, slow: float) -> int:
+    if math.isclose(fast, slow, rel_tol=TIE_RTOL):
+        return 0
+    return 1 if fast > slow else -1
+
+
+def cross_signals(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    """+1 where ``fast`` moves above ``slow``, -1 where it moves below, else 0."""
+    # same test as math.isclose in _side, so the streaming form agrees bar for bar
+    tie = np.abs(fast - slow) <= TIE_RTOL * np.maximum(np.abs(fast), np.abs(slow))
+    cur = ((fast > slow) & ~tie).astype(np.int8) - ((fast < slow) & ~tie).astype(np.int8)
+    sig = np.zeros(cur.shape[0], dtype=np.int64)
+    if cur.shape[0] > 1:
+        prev, now = cur[:-1], cur[1:]
+        sig[1:][(prev <= 0) & (now > 0)] = 1
+        sig[1:][(prev >= 0) & (now < 0)] = -1
+    return sig
+
+
+def _sma_windows(params: Dict[str, Any]) -> Tuple[int, int]:
     fast = int(params.get("fast", 10))
     slow = int(params.get("slow", 30))
     if slow <= fast:
         slow = fast + 5
+    return fast, slow
 
-    closes = [c.close for c in candles]
-    sig = [0] * len(closes)
-
-    def sma(i: int, n: int) -> float:
-        if i + 1 < n:
-            return sum(closes[: i + 1]) / float(i + 1)
-        w = closes[i - n + 1 : i + 1]
-        return sum(w) / float(n)
-
-    prev = 0
-    for i in range(len(closes)):
-        f = sma(i, fast)
-        s = sma(i, slow)
-        cur = 1 if f > s else -1 if f < s else 0
-        if i == 0:
-            prev = cur
-            continue
-        if prev <= 0 and cur > 0:
-            sig[i] = 1
-        elif prev >= 0 and cur < 0:
-            sig[i] = -1
-        prev = cur
 
-    return sig
+def sma_cross(candles: List[Candle], params: Dict[str, Any]) -> List[int]:
+    fast, slow = _sma_windows(params)
+    closes = np.fromiter((c.close for c in candles), dtype=np.float64, count=len(candles))
+    return cross_signals(rolling_mean(closes, fast), rolling_mean(closes, slow)).tolist()
+
+
+class RollingMean:
+    """
+    Streaming ``rolling_mean``: O(1) per value.
+
+    Keeps the same centred running total and the last ``n`` totals, so every
+    value it returns is bit-identical to the batch result for that position.
+    """
+
+    def __init__(self, n: int) -> None:
+        self.n = max(1, int(n))
+        self._base: Optional[float] = None
+        self._total = 0.0
+        self._totals: Deque[float] = deque()
+        self._count = 0
+
+    def update(self, value: float) -> float:
+        v = float(value)
+        if self._base is None:
+            self._base = v
+        self._total += v - self._base
+        self._totals.append(self._total)
+        self._count += 1
+        if len(self._totals) > self.n + 1:
+            self._totals.popleft()
+        window = self._total - self._totals[0] if self._count > self.n else self._total
+        return window / float(min(self._count, self.n)) + self._base
+
+
+class SmaCrossState:
+    """
+    Incremental ``sma_cross``: feed closes one at a time, get the signal for that bar.
+
+    Useful for live candles, where recomputing the whole series per tick is wasted work.
+    """
+
+    def __init__(self, params: Dict[str, Any]) -> None:
+        fast, slow = _sma_windows(params)
+        self._fast = RollingMean(fast)
+        self._slow = RollingMean(slow)
+        self._prev: Optional[int] = None
+
+    def update(self, close: float) -> int:
+        f = self._fast.update(close)
+        s = self._slow.update(close)
+        cur = _side(f, s)
+        prev, self._prev = self._prev, cur
+        if prev is None:
+            return 0
+        if prev <= 0 and cur > 0:
+            return 1
+        if prev >= 0 and cur < 0:
+            return -1
+        return 0
 
 
 def get_strategy(name: str):
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import itertools
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from core.executor import map_with_initializer
+
+from .data import Candle, load_candles
+from .strategies import get_strategy
+from .vector_engine import candles_to_arrays, compute_metrics_arrays, simulate_arrays
+
+MAX_COMBINATIONS = 10_000
+# Metrics of compute_metrics_arrays a sweep can be ranked by (higher first)
+RANK_METRICS = ("total_return", "final_balance", "max_drawdown", "trades", "win_rate")
+
+# Per-worker copy of the candles, set once by the pool initializer so every
+# combination reuses the same data instead of pickling it per task.
+_worker_state: Dict[str, Any] = {}
+
+
+def _is_scalar(value: Any) -> bool:
+    return value is None or isinstance(value, (bool, int, float, str))
+
+
+def _axis_values(name: str, spec: Any) -> List[Any]:
+    if isinstance(spec, dict):
+        start = spec.get("start")
+        stop = spec.get("stop")
+        step = spec.get("step", 1)
+        if start is None or stop is None:
+            raise ValueError(f"grid[{name}] range needs start and stop")
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (start, stop, step)):
+            raise ValueError(f"grid[{name}] range start, stop and step must be numbers")
+        if not step or (stop - start) * step < 0:
+            raise ValueError(f"grid[{name}] step must move from start towards stop")
+        values: List[Any] = []
+        v = start
+        # stop is inclusive; the epsilon keeps float steps from dropping the last point
+        eps = abs(step) * 1e-9
+        while (step > 0 and v <= stop + eps) or (step < 0 and v >= stop - eps):
+            values.append(v)
+            v = v + step
+        return values
+    if isinstance(spec, (list, tuple)):
+        if not all(_is_scalar(v) for v in spec):
+            raise ValueError(f"grid[{name}] values must be scalars")
+        return list(spec)
+    if not _is_scalar(spec):
+        raise ValueError(f"grid[{name}] must be a list, a scalar or a start/stop/step range")
+    return [spec]
+
+
+def expand_grid(grid: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Expand a parameter grid into the list of combinations.
+
+    Each axis is either a list of values, a scalar, or an inclusive range
+    ``{"start": 5, "stop": 20, "step": 5}``.
+    """
+    if not grid:
+        return [{}]
+    names = list(grid.keys())
+    axes = [_axis_values(n, grid[n]) for n in names]
+    total = 1
+    for a in axes:
+        total *= len(a)
+    if total > MAX_COMBINATIONS:
+        raise ValueError(f"grid expands to {total} combinations (max {MAX_COMBINATIONS})")
+    return [dict(zip(names, combo)) for combo in itertools.product(*axes)]
+
+
+def _init_worker(candles: List[Candle], strategy: str, base_params: Dict[str, Any], engine_args: Dict[str, float]) -> None:
+    _worker_state["candles"] = candles
+    _worker_state["cols"] = candles_to_arrays(candles)
+    _worker_state["strategy"] = strategy
+    _worker_state["base_params"] = base_params
+    _worker_state["engine_args"] = engine_args
+
+
+def _run_combo(combo: Dict[str, Any]) -> Dict[str, Any]:
+    params = dict(_worker_state["base_params"])
+    params.update(combo)
+    args = _worker_state["engine_args"]
+    cols = _worker_state["cols"]
+    try:
+        signals = get_strategy(_worker_state["strategy"])(_worker_state["candles"], params)
+        equity, trades = simulate_arrays(
+            cols["ts"], cols["close"], signals, args["initial_balance"], args["fee_rate"], args["slippage"]
+        )
+        metrics = compute_metrics_arrays(equity, trades, args["initial_balance"])
+        return {"params": combo, "metrics": metrics, "error": None}
+    except Exception as e:
+        return {"params": combo, "metrics": None, "error": str(e)}
+
+
+def check_rank_by(rank_by: str) -> None:
+    if rank_by not in RANK_METRICS:
+        raise ValueError(f"rank_by must be one of {', '.join(RANK_METRICS)}, got {rank_by!r}")
+
+
+def rank_results(results: List[Dict[str, Any]], rank_by: str, descending: bool = True) -> List[Dict[str, Any]]:
+    check_rank_by(rank_by)
+    ok = [r for r in results if r.get("metrics") is not None]
+    failed = [r for r in results if r.get("metrics") is None]
+    ok.sort(key=lambda r: float(r["metrics"][rank_by]), reverse=descending)
+    ranked = ok + failed
+    for i, r in enumerate(ranked, start=1):
+        r["rank"] = i
+    return ranked
+
+
+def run_sweep_on_candles(
+    candles: List[Candle],
+    strategy: str,
+    combos: Sequence[Dict[str, Any]],
+    initial_balance: float,
+    fee_rate: float,
+    slippage: float,
+    base_params: Optional[Dict[str, Any]] = None,
+    max_workers: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate every combination on the same candles.
+
+    Combinations are spread over a process pool (one candle copy per worker);
+    ``max_workers=1`` (or a single combination) runs inline.
+    """
+    if not candles:
+        raise RuntimeError("No candles")
+    base = dict(base_params or {})
+    engine_args = {
+        "initial_balance": float(initial_balance),
+        "fee_rate": float(fee_rate),
+        "slippage": float(slippage),
+    }
+    total = len(combos)
+    results: List[Dict[str, Any]] = []
+    runs = map_with_initializer(
+        _run_combo,
+        combos,
+        _init_worker,
+        (candles, strategy, base, engine_args),
+        max_workers=max_workers,
+        worker_state=_worker_state,
+    )
+    for r in runs:
+        results.append(r)
+        if on_progress is not None:
+            on_progress(len(results), total)
+    return results
+
+
+def load_sweep_candles(
+    symbol: str, timeframe: str, start: Optional[str], end: Optional[str], params: Dict[str, Any]
+) -> List[Candle]:
+    return load_candles(symbol=symbol, timeframe=timeframe, start=start, end=end, limit=int(params.get("limit", 5000)))
+
+
+def sweep_report(
+    results: List[Dict[str, Any]],
+    candles: int,
+    symbol: str,
+    timeframe: str,
+    strategy: str,
+    params: Dict[str, Any],
+    grid: Dict[str, Any],
+    rank_by: str = "total_return",
+    top: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Rank the evaluated combinations and wrap them with the sweep's metadata."""
+    ranked = rank_results(results, rank_by)
+    if top:
+        ranked = ranked[: int(top)]
+    return {
+        "results": ranked,
+        "meta": {
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "strategy": strategy,
+            "params": params,
+            "grid": grid,
+            "rank_by": rank_by,
+            "combinations": len(results),
+            "candles": candles,
+        },
+    }
+
+
+def run_sweep(
+    symbol: str,
+    timeframe: str,
+    start: Optional[str],
+    end: Optional[str],
+    strategy: str,
+    grid: Dict[str, Any],
+    initial_balance: float,
+    fee_rate: float,
+    slippage: float,
+    params: Optional[Dict[str, Any]] = None,
+    rank_by: str = "total_return",
+    top: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    base = dict(params or {})
+    combos = expand_grid(grid)
+    candles = load_sweep_candles(symbol, timeframe, start, end, base)
+    results = run_sweep_on_candles(
+        candles,
+        strategy,
+        combos,
+        initial_balance,
+        fee_rate,
+        slippage,
+        base_params=base,
+        max_workers=max_workers,
+        on_progress=on_progress,
+    )
+    return sweep_report(results, len(candles), symbol, timeframe, strategy, base, grid, rank_by, top)
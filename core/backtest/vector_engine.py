@@ -0,0 +1,260 @@
+"""
+NumPy-backed backtest engine.
+
+Produces the same equity curve, trades and metrics as ``engine.run_backtest``
+(the scalar reference), but works on contiguous column arrays: the per-bar
+work is done with array operations and Python only touches the bars where the
+position actually changes.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .data import Candle
+from .engine import Trade
+from .progress import PROGRESS_CHUNK, ProgressFn
+
+COLUMNS = ("ts", "open", "high", "low", "close", "volume")
+
+
+def candles_to_arrays(candles: Sequence[Candle]) -> Dict[str, np.ndarray]:
+    n = len(candles)
+    out: Dict[str, np.ndarray] = {"ts": np.fromiter((c.ts for c in candles), dtype=np.int64, count=n)}
+    for name in COLUMNS[1:]:
+        out[name] = np.fromiter((getattr(c, name) for c in candles), dtype=np.float64, count=n)
+    return out
+
+
+def _fill_buy(cash: float, price_close: float, fr: float, sl: float) -> Optional[Tuple[float, float, float, float]]:
+    # Mirrors engine.run_backtest._buy operation for operation so results are bit-identical.
+    buy_price = float(price_close) * (1.0 + sl)
+    if buy_price <= 0.0:
+        return None
+    denom = buy_price * (1.0 + fr)
+    qty = (cash / denom) if denom > 0.0 else 0.0
+    if qty <= 0.0:
+        return None
+
+    cost = qty * buy_price
+    f = abs(float(cost)) * fr
+    total = cost + f
+
+    if total > cash and total > 0.0:
+        scale = (cash / total) * (1.0 - 1e-9)
+        qty *= scale
+        cost = qty * buy_price
+        f = abs(float(cost)) * fr
+        total = cost + f
+
+    if qty > 0.0 and total <= (cash + 1e-6):
+        return cash - total, qty, buy_price, f
+    return None
+
+
+def _collapse_events(idx: np.ndarray, vals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Keep only signals that flip the position (flat -> long -> flat ...), assuming every buy fills.
+    prev = np.empty_like(vals)
+    prev[0] = -1
+    prev[1:] = vals[:-1]
+    keep = vals != prev
+    return idx[keep], vals[keep]
+
+
+def _close_position(
+    cash: float,
+    position_qty: float,
+    entry_price: float,
+    entry_ts: int,
+    entry_fee: float,
+    price_close: float,
+    ts_i: int,
+    fr: float,
+    sl: float,
+) -> Tuple[float, Trade]:
+    sell_price = float(price_close) * (1.0 - sl)
+    proceeds = position_qty * sell_price
+    f = abs(float(proceeds)) * fr
+    cash += (proceeds - f)
+
+    pnl = (sell_price - entry_price) * position_qty - (entry_fee + f)
+    pnl_pct = (sell_price / entry_price - 1.0) if entry_price > 0.0 else 0.0
+    trade = Trade(
+        entry_ts=int(entry_ts),
+        exit_ts=int(ts_i),
+        entry_price=float(entry_price),
+        exit_price=float(sell_price),
+        qty=float(position_qty),
+        entry_fee=float(entry_fee),
+        exit_fee=float(f),
+        pnl=float(pnl),
+        pnl_pct=float(pnl_pct),
+    )
+    return cash, trade
+
+
+def _simulate(
+    ts: np.ndarray,
+    close: np.ndarray,
+    idx: np.ndarray,
+    vals: np.ndarray,
+    initial_balance: float,
+    fr: float,
+    sl: float,
+    strict: bool,
+    on_progress: Optional[ProgressFn] = None,
+) -> Optional[Tuple[List[int], List[float], List[float], List[Trade], float, float, float, int, float]]:
+    cash = float(initial_balance)
+    position_qty = 0.0
+    entry_price = 0.0
+    entry_ts = 0
+    entry_fee = 0.0
+
+    change_idx: List[int] = []
+    seg_cash: List[float] = []
+    seg_qty: List[float] = []
+    trades: List[Trade] = []
+
+    n_events = int(idx.shape[0])
+    for k, (i, s) in enumerate(zip(idx.tolist(), vals.tolist())):
+        if on_progress is not None and k % PROGRESS_CHUNK == 0:
+            on_progress(k / n_events)
+        if s > 0:
+            if position_qty != 0.0:
+                continue
+            fill = _fill_buy(cash, float(close[i]), fr, sl)
+            if fill is None:
+                if strict:
+                    return None
+                continue
+            cash, position_qty, entry_price, entry_fee = fill
+            entry_ts = int(ts[i])
+        else:
+            if position_qty <= 0.0:
+                continue
+            cash, trade = _close_position(cash, position_qty, entry_price, entry_ts, entry_fee, float(close[i]), int(ts[i]), fr, sl)
+            trades.append(trade)
+            position_qty = 0.0
+            entry_price = 0.0
+            entry_ts = 0
+            entry_fee = 0.0
+        change_idx.append(i)
+        seg_cash.append(cash)
+        seg_qty.append(position_qty)
+
+    return change_idx, seg_cash, seg_qty, trades, cash, position_qty, entry_price, entry_ts, entry_fee
+
+
+def simulate_arrays(
+    ts: np.ndarray,
+    close: np.ndarray,
+    signals: Any,
+    initial_balance: float,
+    fee_rate: float,
+    slippage: float,
+    on_progress: Optional[ProgressFn] = None,
+) -> Tuple[np.ndarray, List[Trade]]:
+    """
+    Run the long-only fill model over column arrays.
+
+    Fills happen at ``close`` like the scalar engine. Returns the equity array
+    (one value per bar, after the forced close) and the list of trades.
+    """
+    ts = np.ascontiguousarray(ts, dtype=np.int64)
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    n = int(close.shape[0])
+    if n == 0:
+        raise RuntimeError("No candles")
+    sig = np.asarray(signals)
+    if sig.shape[0] != n or ts.shape[0] != n:
+        raise RuntimeError("signals length mismatch candles length")
+
+    sig = sig.astype(np.int64)
+    fr = float(fee_rate)
+    sl = float(slippage)
+
+    all_idx = np.flatnonzero(sig)
+    all_vals = np.sign(sig[all_idx])
+    if all_idx.size:
+        idx, vals = _collapse_events(all_idx, all_vals)
+    else:
+        idx, vals = all_idx, all_vals
+
+    state = _simulate(ts, close, idx, vals, initial_balance, fr, sl, strict=True, on_progress=on_progress)
+    if state is None:
+        # A buy did not fill (zero cash or non-positive price): the collapsed event list no
+        # longer matches the position path, so replay every non-zero signal instead.
+        state = _simulate(ts, close, all_idx, all_vals, initial_balance, fr, sl, strict=False, on_progress=on_progress)
+    change_idx, seg_cash, seg_qty, trades, cash, position_qty, entry_price, entry_ts, entry_fee = state
+
+    marker = np.zeros(n, dtype=np.int64)
+    marker[np.asarray(change_idx, dtype=np.int64)] = np.arange(1, len(change_idx) + 1, dtype=np.int64)
+    seg = np.maximum.accumulate(marker)
+    cash_by_seg = np.asarray([float(initial_balance)] + seg_cash, dtype=np.float64)
+    qty_by_seg = np.asarray([0.0] + seg_qty, dtype=np.float64)
+    equity = cash_by_seg[seg] + qty_by_seg[seg] * close
+
+    # forced close at end if still holding
+    if position_qty > 0.0:
+        cash, trade = _close_position(cash, position_qty, entry_price, entry_ts, entry_fee, float(close[-1]), int(ts[-1]), fr, sl)
+        trades.append(trade)
+        equity[-1] = cash
+
+    if on_progress is not None:
+        on_progress(1.0)
+    return equity, trades
+
+
+def compute_metrics_arrays(equity: np.ndarray, trades: List[Trade], initial_balance: float) -> Dict[str, Any]:
+    """Array version of ``engine.compute_metrics`` with identical output."""
+    if equity.size == 0:
+        return {
+            "initial_balance": float(initial_balance),
+            "final_balance": float(initial_balance),
+            "total_return": 0.0,
+            "max_drawdown": 0.0,
+            "trades": 0,
+            "win_rate": 0.0,
+        }
+
+    final = float(equity[-1])
+    total_return = (final / float(initial_balance) - 1.0) if initial_balance > 0 else 0.0
+
+    peak = np.maximum.accumulate(equity)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd = np.where(peak > 0, equity / peak - 1.0, 0.0)
+    max_dd = min(0.0, float(dd.min()))
+
+    wins = sum(1 for t in trades if t.pnl > 0)
+    win_rate = (wins / len(trades)) if trades else 0.0
+
+    return {
+        "initial_balance": float(initial_balance),
+        "final_balance": final,
+        "total_return": float(total_return),
+        "max_drawdown": float(max_dd),
+        "trades": int(len(trades)),
+        "win_rate": float(win_rate),
+    }
+
+
+def run_backtest_vectorized(
+    ts: np.ndarray,
+    close: np.ndarray,
+    signals: Any,
+    initial_balance: float,
+    fee_rate: float,
+    slippage: float,
+    on_progress: Optional[ProgressFn] = None,
+) -> Dict[str, Any]:
+    """Drop-in replacement for ``run_backtest`` that takes column arrays instead of candles."""
+    ts = np.ascontiguousarray(ts, dtype=np.int64)
+    equity, trades = simulate_arrays(ts, close, signals, initial_balance, fee_rate, slippage, on_progress=on_progress)
+    metrics = compute_metrics_arrays(equity, trades, float(initial_balance))
+    return {
+        "equity_curve": [{"ts": t, "equity": e} for t, e in zip(ts.tolist(), equity.tolist())],
+        "trades": [t.__dict__ for t in trades],
+        "metrics": metrics,
+    }
@@ -3,10 +3,9 @@ Binance Exchange Provider
 Implementation of ExchangeProvider for Binance exchange
 """
 
-import asyncio
-import requests
 from typing import List, Dict, Any, Optional
 from core.exchange.exchange_provider import ExchangeProvider
+from core.exchange.http_client import get_http
 
 # Binance URLs
 BINANCE_BASE_URL = "https://api.binance.com"
@@ -81,13 +80,7 @@ class BinanceExchangeProvider(ExchangeProvider):
         }
         
         try:
-            # Run in executor to avoid blocking
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.get(url, params=params, timeout=10)
-            )
-            data = response.json()
+            data = await get_http().aget_json(url, params=params)
             
             if isinstance(data, dict) and "code" in data:
                 # Error response
@@ -4,10 +4,9 @@ Implementation of ExchangeProvider for Bybit exchange
 """
 
 import os
-import asyncio
-import requests
 from typing import List, Dict, Any, Optional
 from core.exchange.exchange_provider import ExchangeProvider
+from core.exchange.http_client import get_http
 
 # Bybit Testnet URL
 BYBIT_BASE_URL = os.getenv("BYBIT_TESTNET_URL", "https://api-testnet.bybit.com")
@@ -72,13 +71,7 @@ class BybitExchangeProvider(ExchangeProvider):
         }
         
         try:
-            # Run in executor to avoid blocking
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.get(url, params=params, timeout=10)
-            )
-            data = response.json()
+            data = await get_http().aget_json(url, params=params)
             
             if "result" not in data or "list" not in data["result"]:
                 return []
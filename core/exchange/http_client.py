@@ -0,0 +1,151 @@
+"""
+Shared HTTP client layer for exchange access
+
+One pooled keep-alive client per process (sync) and per event loop (async),
+with HTTP/2 when ``h2`` is installed, per-host concurrency limits and common
+timeouts. Every exchange path goes through here instead of opening a fresh
+TCP+TLS connection per request.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+HTTP_TIMEOUT = float(os.getenv("EXCHANGE_HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("EXCHANGE_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("EXCHANGE_HTTP_MAX_CONNECTIONS", "32"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("EXCHANGE_HTTP_PER_HOST", "8"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("EXCHANGE_HTTP_KEEPALIVE", "30"))
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _client_kwargs() -> Dict[str, Any]:
+    return {
+        "timeout": httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "http2": HTTP2_AVAILABLE,
+        "headers": {"User-Agent": "cryptobot/1.0"},
+    }
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc
+
+
+class _LoopState:
+    def __init__(self) -> None:
+        self.client = httpx.AsyncClient(**_client_kwargs())
+        self.host_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+class ExchangeHTTP:
+    """
+    Process-wide pooled HTTP access.
+
+    ``httpx.AsyncClient`` connections belong to the loop that opened them, so
+    async clients (and their per-host semaphores) are kept per event loop; the
+    sync client is shared by all threads.
+    """
+
+    def __init__(self, per_host_limit: int = HTTP_PER_HOST_LIMIT) -> None:
+        self.per_host_limit = max(1, int(per_host_limit))
+        self._lock = threading.Lock()
+        self._sync: Optional[httpx.Client] = None
+        self._sync_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState]" = weakref.WeakKeyDictionary()
+
+    # ---------- sync ----------
+    def sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync is None or self._sync.is_closed:
+                self._sync = httpx.Client(**_client_kwargs())
+            return self._sync
+
+    @contextmanager
+    def _sync_slot(self, url: str) -> Iterator[None]:
+        host = _host(url)
+        with self._lock:
+            slot = self._sync_slots.get(host)
+            if slot is None:
+                slot = self._sync_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+        with slot:
+            yield
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> httpx.Response:
+        kwargs: Dict[str, Any] = {"params": params}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        with self._sync_slot(url):
+            return self.sync_client().get(url, **kwargs)
+
+    def get_json(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+        return self.get(url, params=params, timeout=timeout).json()
+
+    # ---------- async ----------
+    def _loop_state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loops.get(loop)
+            if state is None or state.client.is_closed:
+                state = self._loops[loop] = _LoopState()
+            return state
+
+    def async_client(self) -> httpx.AsyncClient:
+        return self._loop_state().client
+
+    @asynccontextmanager
+    async def _async_slot(self, state: _LoopState, url: str) -> AsyncIterator[None]:
+        host = _host(url)
+        slot = state.host_slots.get(host)
+        if slot is None:
+            slot = state.host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        async with slot:
+            yield
+
+    async def aget(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> httpx.Response:
+        state = self._loop_state()
+        kwargs: Dict[str, Any] = {"params": params}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        async with self._async_slot(state, url):
+            return await state.client.get(url, **kwargs)
+
+    async def aget_json(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+        response = await self.aget(url, params=params, timeout=timeout)
+        return response.json()
+
+    # ---------- lifecycle ----------
+    async def aclose(self) -> None:
+        """Close the current loop's async client and the shared sync client."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        with self._lock:
+            state = self._loops.pop(loop, None) if loop is not None else None
+            sync, self._sync = self._sync, None
+        if state is not None:
+            await state.client.aclose()
+        if sync is not None:
+            sync.close()
+
+
+_default = ExchangeHTTP()
+
+
+def get_http() -> ExchangeHTTP:
+    return _default
@@ -0,0 +1,196 @@
+"""
+Executors for CPU-bound work called from async handlers.
+
+Everything the server runs on the uvicorn event loop blocks every other
+request and websocket until it returns, so NumPy, scikit-learn and backtest
+calls are handed to one of two shared pools:
+
+* ``run_in_thread`` -- short NumPy / scikit-learn work. Their kernels release
+  the GIL, so a thread keeps the loop responsive without pickling anything.
+* ``run_in_process`` -- heavy work that is mostly Python (model training,
+  backtests). ``fn`` and its arguments must be picklable; the pool uses
+  spawn, since it is created from a threaded server.
+
+Both pools keep counters (in flight, queue depth, wait and run time) that
+``executor_stats`` reports.
+
+Batch jobs that ship one large payload to every worker (sweeps, walk-forward
+folds, the backtest scheduler) need a pool initializer, so they get their
+own pools from ``spawn_pool`` / ``map_with_initializer`` instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+THREAD_WORKERS = int(os.getenv("EXECUTOR_THREAD_WORKERS", "0")) or min(32, (os.cpu_count() or 1) + 4)
+PROCESS_WORKERS = int(os.getenv("EXECUTOR_PROCESS_WORKERS", "0")) or (os.cpu_count() or 1)
+
+# Pools are created from server threads, and forking a threaded process is unsafe
+SPAWN = multiprocessing.get_context("spawn")
+
+
+def spawn_pool(
+    max_workers: int,
+    initializer: Optional[Callable[..., None]] = None,
+    initargs: Tuple[Any, ...] = (),
+) -> ProcessPoolExecutor:
+    """A process pool of spawned workers, each set up once by ``initializer(*initargs)``."""
+    return ProcessPoolExecutor(
+        max_workers=max(1, int(max_workers)), mp_context=SPAWN, initializer=initializer, initargs=initargs
+    )
+
+
+def map_with_initializer(
+    fn: Callable[[T], R],
+    items: Sequence[T],
+    initializer: Callable[..., None],
+    initargs: Tuple[Any, ...] = (),
+    max_workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    worker_state: Optional[Dict[str, Any]] = None,
+) -> Iterator[R]:
+    """
+    ``fn`` over ``items`` in order, on a private spawn pool whose workers run
+    ``initializer(*initargs)`` once (so the shared payload is pickled once per
+    worker, not per item). ``chunksize`` defaults to about eight chunks per
+    worker. With one worker the items run inline after calling
+    ``initializer`` here; ``worker_state``, the module dict it fills, is then
+    cleared so the payload is not kept alive in this process.
+    """
+    workers = max(1, min(int(max_workers or PROCESS_WORKERS), len(items)))
+    if workers == 1:
+        initializer(*initargs)
+        try:
+            yield from map(fn, items)
+        finally:
+            if worker_state is not None:
+                worker_state.clear()
+        return
+    with spawn_pool(workers, initializer, initargs) as pool:
+        yield from pool.map(fn, items, chunksize=chunksize or max(1, len(items) // (workers * 8)))
+
+
+def _timed(fn: Callable[..., T], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[float, float, T]:
+    # Runs in the worker; wall-clock stamps are comparable across processes
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, time.time(), result
+
+
+class WorkPool:
+    """A lazily created executor plus the counters behind ``stats``."""
+
+    def __init__(self, name: str, max_workers: int, factory: Callable[[int], Executor]) -> None:
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+
+    def _get(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._factory(self.max_workers)
+            return self._executor
+
+    def _done(self, executor: Executor, submitted_at: float, future: Future) -> None:
+        exc = None if future.cancelled() else future.exception()
+        with self._lock:
+            self.in_flight -= 1
+            if future.cancelled() or exc is not None:
+                self.failed += 1
+                if isinstance(exc, BrokenProcessPool) and self._executor is executor:
+                    # A worker died; the next call starts a fresh pool
+                    self._executor = None
+                return
+            started, finished, _ = future.result()
+            self.completed += 1
+            self.wait_seconds += max(0.0, started - submitted_at)
+            self.run_seconds += max(0.0, finished - started)
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> Future:
+        executor = self._get()
+        submitted_at = time.time()
+        future = executor.submit(_timed, fn, args, kwargs)
+        with self._lock:
+            self.submitted += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        future.add_done_callback(functools.partial(self._done, executor, submitted_at))
+        return future
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``fn(*args, **kwargs)`` on the pool and await its result."""
+        _, _, result = await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self.completed
+            return {
+                "max_workers": self.max_workers,
+                "started": self._executor is not None,
+                "in_flight": self.in_flight,
+                # FIFO pools: everything beyond the worker count is waiting
+                "queue_depth": max(0, self.in_flight - self.max_workers),
+                "peak_in_flight": self.peak_in_flight,
+                "submitted": self.submitted,
+                "completed": done,
+                "failed": self.failed,
+                "avg_wait_ms": round(self.wait_seconds / done * 1000.0, 3) if done else 0.0,
+                "avg_run_ms": round(self.run_seconds / done * 1000.0, 3) if done else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+threads = WorkPool(
+    "thread",
+    THREAD_WORKERS,
+    lambda n: ThreadPoolExecutor(max_workers=n, thread_name_prefix="cpu"),
+)
+processes = WorkPool(
+    "process",
+    PROCESS_WORKERS,
+    spawn_pool,
+)
+
+
+async def run_in_thread(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return await threads.run(fn, *args, **kwargs)
+
+
+async def run_in_process(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return await processes.run(fn, *args, **kwargs)
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    return {pool.name: pool.stats() for pool in (threads, processes)}
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    threads.shutdown(wait=wait)
+    processes.shutdown(wait=wait)
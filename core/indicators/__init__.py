@@ -0,0 +1,43 @@
+"""Vectorized technical indicators shared by strategies, ML features and the AI assistant."""
+
+from .cache import IndicatorCache, Indicators, get_indicators
+from .kernels import (
+    atr,
+    bollinger,
+    ema,
+    macd,
+    mfi,
+    obv,
+    rolling_max,
+    rolling_mean,
+    rolling_min,
+    rolling_std,
+    rolling_sum,
+    rsi,
+    stochastic_k,
+    true_range,
+    volume_ratio,
+    williams_r,
+)
+
+__all__ = [
+    "IndicatorCache",
+    "Indicators",
+    "get_indicators",
+    "atr",
+    "bollinger",
+    "ema",
+    "macd",
+    "mfi",
+    "obv",
+    "rolling_max",
+    "rolling_mean",
+    "rolling_min",
+    "rolling_std",
+    "rolling_sum",
+    "rsi",
+    "stochastic_k",
+    "true_range",
+    "volume_ratio",
+    "williams_r",
+]
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import kernels
+
+FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def _column(candles: Sequence[Any], name: str) -> np.ndarray:
+    if not candles:
+        return np.empty(0)
+    if isinstance(candles[0], Mapping):
+        return np.fromiter((float(c.get(name, 0.0) or 0.0) for c in candles), dtype=np.float64, count=len(candles))
+    return np.fromiter((float(getattr(c, name, 0.0) or 0.0) for c in candles), dtype=np.float64, count=len(candles))
+
+
+def _is_columns(candles: Any) -> bool:
+    return isinstance(candles, Mapping) and "close" in candles and "time" in candles
+
+
+def _last_ts(candles: Sequence[Any]) -> Any:
+    if _is_columns(candles):
+        times = candles["time"]
+        return int(times[-1]) if len(times) else None
+    if not candles:
+        return None
+    last = candles[-1]
+    if isinstance(last, Mapping):
+        return last.get("time", last.get("ts", last.get("timestamp")))
+    return getattr(last, "ts", getattr(last, "time", None))
+
+
+class Indicators:
+    """
+    Indicator series over one set of candles, computed on first use and memoized.
+
+    Accepts candle dicts or objects with open/high/low/close/volume. Each
+    method returns the full series; ``[-1]`` is the value on the last bar.
+    """
+
+    def __init__(self, candles: Sequence[Any] = (), columns: Optional[Mapping[str, np.ndarray]] = None) -> None:
+        if columns is not None:
+            self._cols = {k: np.asarray(columns[k], dtype=np.float64) for k in FIELDS if k in columns}
+        else:
+            self._cols = {k: _column(candles, k) for k in FIELDS}
+        self._memo: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return int(self._cols["close"].shape[0])
+
+    def column(self, name: str) -> np.ndarray:
+        return self._cols[name]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self._cols["close"]
+
+    @property
+    def high(self) -> np.ndarray:
+        return self._cols["high"]
+
+    @property
+    def low(self) -> np.ndarray:
+        return self._cols["low"]
+
+    @property
+    def volume(self) -> np.ndarray:
+        return self._cols["volume"]
+
+    def _get(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+        value = fn()
+        with self._lock:
+            return self._memo.setdefault(key, value)
+
+    def sma(self, period: int, field: str = "close") -> np.ndarray:
+        return self._get(("sma", period, field), lambda: kernels.rolling_mean(self._cols[field], period))
+
+    def ema(self, period: int, field: str = "close") -> np.ndarray:
+        return self._get(("ema", period, field), lambda: kernels.ema(self._cols[field], period))
+
+    def rsi(self, period: int = 14) -> np.ndarray:
+        return self._get(("rsi", period), lambda: kernels.rsi(self.close, period))
+
+    def macd(self, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        def compute() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            line = self.ema(fast) - self.ema(slow)
+            sig = kernels.ema(line, signal)
+            return line, sig, line - sig
+
+        return self._get(("macd", fast, slow, signal), compute)
+
+    def bollinger(self, period: int = 20, k: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        def compute() -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+            mid = self.sma(period)
+            std = kernels.rolling_std(self.close, period)
+            return mid, mid + k * std, mid - k * std, std
+
+        return self._get(("bollinger", period, k), compute)
+
+    def atr(self, period: int = 14) -> np.ndarray:
+        return self._get(("atr", period), lambda: kernels.atr(self.high, self.low, self.close, period))
+
+    def stochastic_k(self, period: int = 14) -> np.ndarray:
+        return self._get(("stoch", period), lambda: kernels.stochastic_k(self.high, self.low, self.close, period))
+
+    def williams_r(self, period: int = 14) -> np.ndarray:
+        return self._get(("willr", period), lambda: kernels.williams_r(self.high, self.low, self.close, period))
+
+    def obv(self) -> np.ndarray:
+        return self._get(("obv",), lambda: kernels.obv(self.close, self.volume))
+
+    def mfi(self, period: int = 14) -> np.ndarray:
+        return self._get(("mfi", period), lambda: kernels.mfi(self.high, self.low, self.close, self.volume, period))
+
+    def volume_ratio(self, period: int = 20) -> np.ndarray:
+        return self._get(("vol_ratio", period), lambda: kernels.volume_ratio(self.volume, period))
+
+    def rolling_max(self, period: int, field: str = "high") -> np.ndarray:
+        return self._get(("max", period, field), lambda: kernels.rolling_max(self._cols[field], period))
+
+    def rolling_min(self, period: int, field: str = "low") -> np.ndarray:
+        return self._get(("min", period, field), lambda: kernels.rolling_min(self._cols[field], period))
+
+
+def _last_bar(candles: Any) -> Tuple[float, ...]:
+    # The forming bar keeps its ts while its prices move, so they are part of the key
+    if _is_columns(candles):
+        return tuple(float(candles[k][-1]) if k in candles else 0.0 for k in FIELDS)
+    last = candles[-1]
+    if isinstance(last, Mapping):
+        return tuple(float(last.get(k, 0.0) or 0.0) for k in FIELDS)
+    return tuple(float(getattr(last, k, 0.0) or 0.0) for k in FIELDS)
+
+
+def _timeframe_key(timeframe: Optional[str]) -> str:
+    # "15" (exchange minutes) and "15m" name the same candles
+    tf = str(timeframe or "").strip().lower()
+    return f"{tf}m" if tf.isdigit() else tf
+
+
+class IndicatorCache:
+    """
+    LRU of ``Indicators`` keyed by (symbol, timeframe, last candle ts, bar
+    count, last bar's OHLCV).
+
+    Callers that name the symbol share entries, so repeated analyses of the
+    same candles pay for each indicator once. Updates to the still-forming
+    last bar change the key, so they are never served stale values.
+    """
+
+    def __init__(self, max_entries: int = 128) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self._entries: "OrderedDict[Tuple[Any, ...], Indicators]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, candles: Sequence[Any], symbol: Optional[str] = None, timeframe: Optional[str] = None) -> Indicators:
+        columns = _is_columns(candles)
+        last = _last_ts(candles)
+        if not symbol or last is None:
+            return Indicators(columns=candles) if columns else Indicators(candles)
+        count = len(candles["close"]) if columns else len(candles)
+        key = (symbol.upper(), _timeframe_key(timeframe), last, count, _last_bar(candles))
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return hit
+            self.misses += 1
+        if columns:
+            # Kept past the caller: copy, the columns may be views of a live ring
+            ind = Indicators(columns={k: np.array(candles[k], dtype=np.float64) for k in FIELDS if k in candles})
+        else:
+            ind = Indicators(candles)
+        with self._lock:
+            ind = self._entries.setdefault(key, ind)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return ind
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_default_cache = IndicatorCache()
+
+
+def get_indicators(candles: Sequence[Any], symbol: Optional[str] = None, timeframe: Optional[str] = None) -> Indicators:
+    """
+    Shared ``Indicators`` for these candles (a sequence, or a mapping of
+    columns with ``time``); cached only when ``symbol`` is given.
+    """
+    return _default_cache.get(candles, symbol, timeframe)
@@ -0,0 +1,213 @@
+"""
+Vectorized indicator kernels.
+
+Every function takes whole arrays and returns the full series (one value per
+input bar), so a consumer that needs the latest value reads ``[-1]`` and a
+consumer that walks the history reads the bar it is on. Windows shorter than
+``period`` at the start of a series average what is available (expanding
+window), matching the "mean of the last N, or of everything if shorter"
+convention the last-value helpers used.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from scipy.signal import lfilter
+except ModuleNotFoundError:
+    lfilter = None
+
+
+def _f64(values: Any) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def rolling_mean(values: Any, n: int) -> np.ndarray:
+    """
+    Trailing mean over ``n`` values in O(len) via a cumulative sum.
+
+    Values are centred on the first one before summing so the running total
+    stays small and the window differences keep precision.
+    """
+    x = _f64(values)
+    if x.size == 0:
+        return x.copy()
+    n = max(1, int(n))
+    base = x[0]
+    c = np.cumsum(x - base)
+    sums = c.copy()
+    sums[n:] = c[n:] - c[:-n]
+    counts = np.minimum(np.arange(1, x.size + 1, dtype=np.float64), float(n))
+    return sums / counts + base
+
+
+def rolling_sum(values: Any, n: int) -> np.ndarray:
+    x = _f64(values)
+    counts = np.minimum(np.arange(1, x.size + 1, dtype=np.float64), float(max(1, int(n))))
+    return rolling_mean(x, n) * counts
+
+
+def _rolling_any(mask: Any, n: int) -> np.ndarray:
+    # exact: the cumulative sum of 0/1 values has no rounding, unlike a sum of prices
+    return rolling_sum(np.asarray(mask, dtype=np.float64), n) > 0.5
+
+
+def rolling_std(values: Any, n: int) -> np.ndarray:
+    """Population standard deviation over the trailing window (``np.std`` semantics)."""
+    x = _f64(values)
+    if x.size == 0:
+        return x.copy()
+    centred = x - x[0]
+    mean = rolling_mean(centred, n)
+    var = rolling_mean(centred * centred, n) - mean * mean
+    return np.sqrt(np.maximum(var, 0.0))
+
+
+def _rolling_extreme(values: Any, n: int, fn: Any, accumulate: Any) -> np.ndarray:
+    x = _f64(values)
+    n = max(1, int(n))
+    if x.size == 0:
+        return x.copy()
+    out = np.empty_like(x)
+    head = min(n - 1, x.size)
+    out[:head] = accumulate(x[:head])
+    if x.size >= n:
+        out[n - 1:] = fn(sliding_window_view(x, n), axis=1)
+    return out
+
+
+def rolling_max(values: Any, n: int) -> np.ndarray:
+    return _rolling_extreme(values, n, np.max, np.maximum.accumulate)
+
+
+def rolling_min(values: Any, n: int) -> np.ndarray:
+    return _rolling_extreme(values, n, np.min, np.minimum.accumulate)
+
+
+def ema(values: Any, period: int) -> np.ndarray:
+    """
+    Exponential moving average seeded with the first value.
+
+    ``alpha = 2 / (period + 1)``; runs as a C-level linear filter when SciPy is
+    available.
+    """
+    x = _f64(values)
+    if x.size == 0:
+        return x.copy()
+    alpha = 2.0 / (int(period) + 1.0)
+    if lfilter is not None:
+        out, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * x[0]])
+        return out
+    out = np.empty_like(x)
+    acc = x[0]
+    for i, v in enumerate(x.tolist()):
+        acc = alpha * v + (1.0 - alpha) * acc
+        out[i] = acc
+    return out
+
+
+def rsi(close: Any, period: int = 14) -> np.ndarray:
+    """
+    RSI from simple averages of gains and losses over ``period`` bars.
+
+    The first bar has no change and reads 50.
+    """
+    c = _f64(close)
+    out = np.full(c.size, 50.0)
+    if c.size < 2:
+        return out
+    deltas = np.diff(c)
+    # windows without a gain (loss) read exactly 0, not the cumulative-sum residue
+    avg_gain = np.where(_rolling_any(deltas > 0, period), rolling_mean(np.where(deltas > 0, deltas, 0.0), period), 0.0)
+    avg_loss = np.where(_rolling_any(deltas < 0, period), rolling_mean(np.where(deltas < 0, -deltas, 0.0), period), 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    value = np.where(avg_loss == 0, np.where(avg_gain > 0, 100.0, 50.0), value)
+    out[1:] = value
+    return out
+
+
+def macd(close: Any, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD line, signal line (EMA of the MACD line) and histogram."""
+    line = ema(close, fast) - ema(close, slow)
+    sig = ema(line, signal)
+    return line, sig, line - sig
+
+
+def bollinger(close: Any, period: int = 20, k: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Middle, upper and lower band plus the rolling (population) std."""
+    mid = rolling_mean(close, period)
+    std = rolling_std(close, period)
+    return mid, mid + k * std, mid - k * std, std
+
+
+def true_range(high: Any, low: Any, close: Any) -> np.ndarray:
+    """True range; the first bar (no previous close) is ``high - low``."""
+    h, lo, c = _f64(high), _f64(low), _f64(close)
+    tr = h - lo
+    if c.size > 1:
+        prev = c[:-1]
+        tr[1:] = np.maximum(tr[1:], np.maximum(np.abs(h[1:] - prev), np.abs(lo[1:] - prev)))
+    return tr
+
+
+def atr(high: Any, low: Any, close: Any, period: int = 14) -> np.ndarray:
+    """Simple average of the true range over ``period`` bars, starting from the second bar."""
+    tr = true_range(high, low, close)
+    out = np.zeros(tr.size)
+    if tr.size > 1:
+        out[1:] = rolling_mean(tr[1:], period)
+    return out
+
+
+def stochastic_k(high: Any, low: Any, close: Any, period: int = 14) -> np.ndarray:
+    hh, ll = rolling_max(high, period), rolling_min(low, period)
+    rng = hh - ll
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = (_f64(close) - ll) / rng * 100.0
+    return np.where(rng == 0, 50.0, k)
+
+
+def williams_r(high: Any, low: Any, close: Any, period: int = 14) -> np.ndarray:
+    hh, ll = rolling_max(high, period), rolling_min(low, period)
+    rng = hh - ll
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = (hh - _f64(close)) / rng * -100.0
+    return np.where(rng == 0, -50.0, r)
+
+
+def obv(close: Any, volume: Any) -> np.ndarray:
+    """On-balance volume, 0 on the first bar."""
+    c, v = _f64(close), _f64(volume)
+    out = np.zeros(c.size)
+    if c.size > 1:
+        out[1:] = np.cumsum(np.sign(np.diff(c)) * v[1:])
+    return out
+
+
+def mfi(high: Any, low: Any, close: Any, volume: Any, period: int = 14) -> np.ndarray:
+    """Money flow index; flow on a bar whose typical price did not rise counts as negative."""
+    tp = (_f64(high) + _f64(low) + _f64(close)) / 3.0
+    flow = tp * _f64(volume)
+    out = np.full(tp.size, 100.0)
+    if tp.size < 2:
+        return out
+    up = np.diff(tp) > 0
+    pos = np.where(_rolling_any(up, period), rolling_sum(np.where(up, flow[1:], 0.0), period), 0.0)
+    neg = np.where(_rolling_any(~up, period), rolling_sum(np.where(up, 0.0, flow[1:]), period), 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = 100.0 - 100.0 / (1.0 + pos / neg)
+    out[1:] = np.where(neg == 0, 100.0, value)
+    return out
+
+
+def volume_ratio(volume: Any, period: int = 20) -> np.ndarray:
+    v = _f64(volume)
+    avg = rolling_mean(v, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = v / avg
+    return np.where(avg == 0, 1.0, r)
@@ -1,5 +1,6 @@
 """Market data service layer for CryptoBot Pro."""
 
 from .models import OHLCV  # noqa: F401
-from .service import MarketDataService  # noqa: F401
+from .service import MarketDataService, get_market_data_service  # noqa: F401
 from .bybit_provider import BybitMarketDataProvider  # noqa: F401
+from .frame import CandleFrame  # noqa: F401
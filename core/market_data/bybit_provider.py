@@ -1,32 +1,55 @@
 from __future__ import annotations
 from typing import Sequence
-import asyncio
 import logging
 
-from core.services.download_bybit import download_klines
+from core.services.download_bybit import download_klines_async
 from .models import OHLCV
 from .provider_base import MarketDataProvider
+from .singleflight import SingleFlight
 
 log = logging.getLogger(__name__)
 
+# Bybit's kline intervals that web.bybit_client maps by name
+BYBIT_TIMEFRAMES = frozenset({"1m", "3m", "5m", "15m", "30m", "1h", "2h", "4h", "12h", "1d"})
+
+# Anything above this is a millisecond timestamp (seconds reach it in year 5138)
+_MS_THRESHOLD = 100_000_000_000
+
+
 class BybitMarketDataProvider(MarketDataProvider):
     """Robust Bybit OHLCV provider — supports dict and list formats."""
 
+    native_timeframes = BYBIT_TIMEFRAMES
+    # Shared by every instance: identical concurrent requests share one download
+    flights = SingleFlight()
+
     async def get_ohlcv(
         self,
         symbol: str,
         timeframe: str,
         limit: int = 500,
         since: int | None = None,
+        end: int | None = None,
     ) -> Sequence[OHLCV]:
+        key = ("bybit", symbol.upper(), timeframe, limit, since, end)
+        candles = await self.flights.do(key, lambda: self._fetch_ohlcv(symbol, timeframe, limit, since, end))
+        return list(candles)
 
-        loop = asyncio.get_event_loop()
+    async def _fetch_ohlcv(
+        self,
+        symbol: str,
+        timeframe: str,
+        limit: int,
+        since: int | None,
+        end: int | None,
+    ) -> Sequence[OHLCV]:
 
         try:
-            raw = await loop.run_in_executor(None, download_klines, symbol, timeframe, limit)
+            raw = await download_klines_async(symbol, timeframe, limit, end=end)
         except Exception as e:
-            log.error(f"Bybit provider failed to fetch klines: {e}", exc_info=True)
-            return []
+            # Raised, not []: an empty page means "no older history" to the series
+            log.error(f"Bybit provider failed to fetch klines: {e}")
+            raise
 
         if not raw:
             log.warning(f"No candles from Bybit for {symbol} {timeframe}")
@@ -58,6 +81,9 @@ class BybitMarketDataProvider(MarketDataProvider):
                     log.warning(f"Unsupported candle format idx={idx}: {c}")
                     continue
 
+                if t > _MS_THRESHOLD:
+                    t //= 1000
+
                 normalized.append(
                     OHLCV(
                         time=t,
@@ -1,40 +1,167 @@
 from __future__ import annotations
 
+import heapq
+import itertools
+import os
+import sys
+import threading
 import time
 from collections import OrderedDict
-from typing import Hashable, Optional, Sequence
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Tuple
 
+import numpy as np
+
+from .frame import CandleFrame
 from .models import OHLCV
 
+DEFAULT_TTL_SECONDS = float(os.getenv("MARKET_DATA_CACHE_TTL", "30"))
+DEFAULT_MAX_BYTES = int(os.getenv("MARKET_DATA_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def _ohlcv_bytes() -> int:
+    sample = OHLCV(time=1_700_000_000, open=1.5, high=2.5, low=0.5, close=1.25, volume=10.0)
+    fields = vars(sample)
+    return sys.getsizeof(sample) + sys.getsizeof(fields) + sum(sys.getsizeof(v) for v in fields.values())
+
+
+OHLCV_BYTES = _ohlcv_bytes()
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory held by a cached value, in bytes."""
+    if isinstance(value, (np.ndarray, CandleFrame)):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        size = sys.getsizeof(value)
+        if value and isinstance(value[0], OHLCV):
+            return size + len(value) * OHLCV_BYTES
+        return size + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+    size: int
+
 
 class MarketDataCache:
-    """Simple in-memory TTL cache for OHLCV responses."""
+    """
+    In-memory TTL + LRU cache for market data responses.
+
+    Entries expire ``ttl_seconds`` after they are set; expiry is tracked in a
+    min-heap, so a lookup only pops what is actually due instead of scanning
+    every entry. The cache is bounded by the estimated bytes it holds (and
+    optionally an entry count): least recently used entries are evicted
+    first. Hit, miss, expiry and eviction counts are kept for ``stats``.
+    """
 
-    def __init__(self, ttl_seconds: int = 30, max_items: int = 32):
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_items: Optional[int] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
         self.ttl_seconds = ttl_seconds
         self.max_items = max_items
-        self._store: "OrderedDict[Hashable, tuple[float, Sequence[OHLCV]]]" = OrderedDict()
+        self.max_bytes = max_bytes
+        self._store: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._expiry: List[Tuple[float, int, Hashable]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
 
-    def _purge_expired(self) -> None:
+    def _drop(self, key: Hashable) -> None:
+        entry = self._store.pop(key)
+        self.bytes -= entry.size
+
+    def _expire(self, now: float) -> None:
+        heap = self._expiry
+        while heap and heap[0][0] <= now:
+            expires_at, _, key = heapq.heappop(heap)
+            entry = self._store.get(key)
+            # Skip heap records left behind by a replaced or evicted entry
+            if entry is not None and entry.expires_at == expires_at:
+                self._drop(key)
+                self.expirations += 1
+        # Replaced entries leave records behind; rebuild before they dominate the heap
+        if len(heap) > 2 * len(self._store) + 64:
+            self._expiry = [(e.expires_at, next(self._seq), k) for k, e in self._store.items()]
+            heapq.heapify(self._expiry)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            self._expire(time.time())
+            entry = self._store.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._store.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        size = estimate_size(value)
         now = time.time()
-        expired_keys = [
-            key for key, (ts, _) in self._store.items() if now - ts > self.ttl_seconds
-        ]
-        for key in expired_keys:
-            self._store.pop(key, None)
-
-    def get(self, key: Hashable) -> Optional[Sequence[OHLCV]]:
-        self._purge_expired()
-        if key not in self._store:
-            return None
-        ts, value = self._store.pop(key)
-        self._store[key] = (ts, value)  # move to end (LRU)
-        return value
-
-    def set(self, key: Hashable, value: Sequence[OHLCV]) -> None:
-        self._purge_expired()
-        if key in self._store:
-            self._store.pop(key)
-        elif len(self._store) >= self.max_items:
-            self._store.popitem(last=False)
-        self._store[key] = (time.time(), value)
+        expires_at = now + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._expire(now)
+            if key in self._store:
+                self._drop(key)
+            if size > self.max_bytes:
+                return  # would evict everything else and still not fit
+            self._store[key] = _Entry(value, expires_at, size)
+            self.bytes += size
+            heapq.heappush(self._expiry, (expires_at, next(self._seq), key))
+            while self._store and (
+                self.bytes > self.max_bytes or (self.max_items is not None and len(self._store) > self.max_items)
+            ):
+                self._drop(next(iter(self._store)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._store.clear()
+            self._expiry.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire(time.time())
+            lookups = self.hits + self.misses
+            return {
+                "items": len(self._store),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "max_items": self.max_items,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
+
+
+_shared_cache: Optional[MarketDataCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_market_data_cache() -> MarketDataCache:
+    """The process-wide cache used by the shared MarketDataService."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = MarketDataCache()
+        return _shared_cache
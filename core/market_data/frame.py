@@ -0,0 +1,188 @@
+"""
+Columnar candles.
+
+``CandleFrame`` holds candles as six NumPy arrays (``ts`` int64 seconds,
+``open``/``high``/``low``/``close``/``volume`` float64) instead of one object
+per bar. Slicing returns frames of views, and the per-bar objects and dicts
+the rest of the stack uses are only built at the edges, once: ``from_records``
+reads any of the candle types (``OHLCV``, both backtest ``Candle`` types, the
+dashboard ``CandleData`` and pydantic ``Candle``, plain dicts) and
+``to_records`` / ``to_objects`` produce them.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Type, TypeVar, Union
+
+import numpy as np
+
+from .models import OHLCV
+
+try:
+    import pandas as pd
+except ModuleNotFoundError:  # optional: only needed for to_dataframe
+    pd = None
+
+FIELDS = ("ts", "open", "high", "low", "close", "volume")
+PRICE_FIELDS = FIELDS[1:]
+# Millisecond timestamps are normalized to seconds
+_MS_THRESHOLD = 10_000_000_000
+
+T = TypeVar("T")
+
+
+def _time_field(cls: Any) -> str:
+    """Name the target type uses for the bar time: ``ts`` or ``time``."""
+    names = getattr(cls, "model_fields", None) or getattr(cls, "__dataclass_fields__", None) or {}
+    return "ts" if "ts" in names and "time" not in names else "time"
+
+
+class CandleFrame:
+    __slots__ = FIELDS
+
+    def __init__(
+        self,
+        ts: Any = (),
+        open: Any = (),
+        high: Any = (),
+        low: Any = (),
+        close: Any = (),
+        volume: Any = None,
+    ) -> None:
+        self.ts = np.asarray(ts, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.zeros(len(self.ts)) if volume is None else np.asarray(volume, dtype=np.float64)
+        n = len(self.ts)
+        if any(len(getattr(self, name)) != n for name in PRICE_FIELDS):
+            raise ValueError("CandleFrame columns must have the same length")
+
+    # ---------- construction ----------
+    @classmethod
+    def from_columns(cls, cols: Mapping[str, Any]) -> "CandleFrame":
+        """
+        Wrap column arrays without copying (when already int64/float64).
+        Accepts ``ts`` or ``time`` for the timestamps, so resampled columns,
+        ring views and the backtest candle store all fit.
+        """
+        ts = cols["ts"] if "ts" in cols else cols["time"]
+        return cls(ts, cols["open"], cols["high"], cols["low"], cols["close"], cols.get("volume"))
+
+    @classmethod
+    def from_records(cls, candles: Sequence[Any]) -> "CandleFrame":
+        """Columns from candle objects or dicts (``time``, ``ts`` or ``timestamp``; ms or s)."""
+        n = len(candles)
+        if not n:
+            return cls()
+        first = candles[0]
+        if isinstance(first, Mapping):
+            key = next((k for k in ("time", "ts", "timestamp") if k in first), "time")
+
+            def get(c: Any, name: str) -> Any:
+                return c.get(name)
+        else:
+            key = "ts" if hasattr(first, "ts") and not hasattr(first, "time") else "time"
+
+            def get(c: Any, name: str) -> Any:
+                return getattr(c, name, None)
+        ts = np.fromiter((int(float(get(c, key))) for c in candles), dtype=np.int64, count=n)
+        if n and ts.max() > _MS_THRESHOLD:
+            ts //= 1000
+        cols = {"ts": ts}
+        for name in PRICE_FIELDS:
+            # Volume is optional on some types (backtest ``Candle``) and feeds
+            cols[name] = np.fromiter((float(get(c, name) or 0.0) for c in candles), dtype=np.float64, count=n)
+        return cls.from_columns(cols)
+
+    # ---------- access ----------
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def __getitem__(self, index: Union[slice, np.ndarray, List[int]]) -> "CandleFrame":
+        """Slices are views into this frame; masks and index arrays copy."""
+        if isinstance(index, (int, np.integer)):
+            raise TypeError("index a CandleFrame with a slice or mask; use to_records() for single bars")
+        return CandleFrame(*(getattr(self, name)[index] for name in FIELDS))
+
+    def tail(self, n: int) -> "CandleFrame":
+        return self[max(len(self) - int(n), 0):]
+
+    def between(self, start: Optional[int] = None, end: Optional[int] = None) -> "CandleFrame":
+        """Bars with ``start <= ts <= end`` (a view; ``ts`` must be ascending)."""
+        lo = 0 if start is None else int(np.searchsorted(self.ts, start, side="left"))
+        hi = len(self) if end is None else int(np.searchsorted(self.ts, end, side="right"))
+        return self[lo:hi]
+
+    def columns(self, time_key: str = "time") -> Dict[str, np.ndarray]:
+        """The column arrays (no copy), with the timestamps under ``time_key``."""
+        out = {name: getattr(self, name) for name in FIELDS}
+        if time_key != "ts":
+            out[time_key] = out.pop("ts")
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in FIELDS)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CandleFrame):
+            return NotImplemented
+        return all(np.array_equal(getattr(self, n), getattr(other, n)) for n in FIELDS)
+
+    def __repr__(self) -> str:
+        span = f"{int(self.ts[0])}..{int(self.ts[-1])}" if len(self) else "empty"
+        return f"CandleFrame({len(self)} bars, {span})"
+
+    # ---------- conversion ----------
+    def to_lists(self, time_key: str = "time") -> Dict[str, list]:
+        """Columnar JSON-ready dict of lists: the cheapest shape to serialize."""
+        return {name: values.tolist() for name, values in self.columns(time_key).items()}
+
+    def to_records(self, time_key: str = "time") -> List[Dict[str, Any]]:
+        """One dict per bar, the shape the candle endpoints return."""
+        keys = (time_key,) + PRICE_FIELDS
+        return [dict(zip(keys, row)) for row in zip(*(getattr(self, name).tolist() for name in FIELDS))]
+
+    def to_objects(self, cls: Type[T]) -> List[T]:
+        """
+        One ``cls`` per bar: ``OHLCV``, either backtest ``Candle``,
+        ``CandleData`` or the dashboard's pydantic ``Candle``.
+        """
+        keys = (_time_field(cls),) + PRICE_FIELDS
+        rows = zip(*(getattr(self, name).tolist() for name in FIELDS))
+        build = getattr(cls, "model_construct", None) or cls  # pydantic: values are already typed
+        return [build(**dict(zip(keys, row))) for row in rows]
+
+    def to_ohlcv(self) -> List[OHLCV]:
+        return [
+            OHLCV(time=t, open=o, high=h, low=lo, close=c, volume=v)
+            for t, o, h, lo, c, v in zip(*(getattr(self, name).tolist() for name in FIELDS))
+        ]
+
+    def to_json(self, orient: str = "records") -> str:
+        """JSON text: ``records`` (list of bar objects) or ``columns`` (dict of arrays)."""
+        if orient == "records":
+            return json.dumps(self.to_records())
+        if orient == "columns":
+            return json.dumps(self.to_lists())
+        raise ValueError(f"Unsupported orient: {orient}")
+
+    def to_dataframe(self) -> Any:
+        """A pandas DataFrame indexed by UTC bar open time (pandas is optional)."""
+        if pd is None:
+            raise RuntimeError("CandleFrame.to_dataframe needs pandas")
+        index = pd.to_datetime(self.ts, unit="s", utc=True)
+        return pd.DataFrame({name: getattr(self, name) for name in PRICE_FIELDS}, index=index)
+
+    @classmethod
+    def from_dataframe(cls, df: Any) -> "CandleFrame":
+        """Inverse of ``to_dataframe``; a ``ts``/``time`` column is used if present, else the index."""
+        if "ts" in df.columns or "time" in df.columns:
+            ts = df["ts" if "ts" in df.columns else "time"].to_numpy()
+        else:
+            ts = df.index.asi8 // 1_000_000_000
+        volume = df["volume"].to_numpy() if "volume" in df.columns else None
+        return cls(ts, *(df[name].to_numpy() for name in PRICE_FIELDS[:-1]), volume)
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import csv
+import heapq
+import json
+import logging
+import os
+import threading
+import uuid
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+HISTORY_FIELDS = ("time", "open", "high", "low", "close", "volume")
+
+
+def parse_time(value: Any) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+        try:
+            return int(float(value))
+        except ValueError:
+            try:
+                return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+            except ValueError:
+                return None
+    return None
+
+
+def _file_crc32(path: Path) -> str:
+    crc = 0
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            crc = zlib.crc32(block, crc)
+    return f"{crc:08x}"
+
+
+def _read_rows(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open(newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return
+        pos = {name: i for i, name in enumerate(header)}
+        if "time" not in pos:
+            return
+        ti = pos["time"]
+        cols = [(name, pos.get(name)) for name in HISTORY_FIELDS[1:]]
+        for r in reader:
+            if len(r) <= ti:
+                continue
+            t = parse_time(r[ti])
+            if t is None:
+                continue
+            row: Dict[str, Any] = {"time": t}
+            for name, i in cols:
+                v = r[i] if i is not None and i < len(r) else ""
+                row[name] = float(v or 0)
+            yield row
+
+
+def write_history_csv(path: Path, candles: Iterable[Dict[str, Any]]) -> int:
+    """Write candles sorted and de-duplicated by time; returns the row count."""
+    by_time = {int(c["time"]): c for c in candles if "time" in c}
+    if not by_time:
+        return 0
+    tmp = path.with_name(f".{path.name}.tmp_{uuid.uuid4().hex}")
+    with tmp.open("w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(list(HISTORY_FIELDS))
+        for t in sorted(by_time):
+            c = by_time[t]
+            w.writerow([t, c.get("open"), c.get("high"), c.get("low"), c.get("close"), c.get("volume")])
+    os.replace(tmp, path)
+    return len(by_time)
+
+
+class HistoryIndex:
+    """
+    Manifest of the CSV chunks stored for one exchange/symbol/timeframe.
+
+    For each chunk the manifest records the actual time range, row count,
+    CRC32 checksum and whether rows are already in time order; ``size`` and
+    ``mtime`` are used to notice chunks that changed on disk, and a verified
+    refresh also compares the checksum (downloads and compaction verify before
+    trusting the stored ranges). Range queries open only the chunks
+    overlapping the range and stream them through a k-way merge, so ordered
+    data is never re-sorted.
+    """
+
+    # Re-entrant: compact holds it across refresh/register
+    _locks: Dict[str, threading.RLock] = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self.manifest_path = self.directory / MANIFEST_NAME
+        with HistoryIndex._locks_guard:
+            self._lock = HistoryIndex._locks.setdefault(str(self.directory.resolve()), threading.RLock())
+
+    def _read_manifest(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with self.manifest_path.open() as f:
+                data = json.load(f)
+            return {c["file"]: c for c in data.get("chunks", [])}
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            return {}
+
+    def _write_manifest(self, chunks: Dict[str, Dict[str, Any]]) -> None:
+        ordered = sorted(chunks.values(), key=lambda c: (c["start"] is None, c["start"] or 0, c["file"]))
+        tmp = self.manifest_path.with_name(f".{MANIFEST_NAME}.tmp_{uuid.uuid4().hex}")
+        with tmp.open("w") as f:
+            json.dump({"version": 1, "chunks": ordered}, f)
+        os.replace(tmp, self.manifest_path)
+
+    def _scan_chunk(self, path: Path, st: os.stat_result) -> Dict[str, Any]:
+        rows = 0
+        first = last = None
+        ordered = True
+        prev = None
+        for row in _read_rows(path):
+            t = row["time"]
+            if prev is not None and t <= prev:
+                ordered = False
+            prev = t
+            first = t if first is None else min(first, t)
+            last = t if last is None else max(last, t)
+            rows += 1
+        return {
+            "file": path.name,
+            "start": first,
+            "end": last,
+            "rows": rows,
+            "checksum": _file_crc32(path),
+            "sorted": ordered,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+        }
+
+    def refresh(self, verify: bool = False) -> List[Dict[str, Any]]:
+        """
+        Bring the manifest in line with the chunk files on disk and return it.
+
+        ``verify`` also reads every chunk whose size and mtime look unchanged
+        and rescans it if its CRC32 no longer matches (an edit that kept both).
+        """
+        with self._lock:
+            known = self._read_manifest()
+            current: Dict[str, Dict[str, Any]] = {}
+            changed = False
+            if self.directory.exists():
+                for entry in os.scandir(self.directory):
+                    if not entry.is_file() or not entry.name.endswith(".csv") or entry.name.startswith("."):
+                        continue
+                    st = entry.stat()
+                    meta = known.get(entry.name)
+                    if meta and meta.get("size") == st.st_size and meta.get("mtime") == st.st_mtime:
+                        if not verify or meta.get("checksum") == _file_crc32(Path(entry.path)):
+                            current[entry.name] = meta
+                            continue
+                        log.warning("history chunk %s changed on disk (checksum mismatch); rescanning", entry.path)
+                    try:
+                        current[entry.name] = self._scan_chunk(Path(entry.path), st)
+                    except (OSError, ValueError, csv.Error) as e:
+                        log.warning("history chunk %s skipped: %s", entry.path, e)
+                        continue
+                    changed = True
+            if changed or set(current) != set(known):
+                self._write_manifest(current)
+            return sorted(current.values(), key=lambda c: c["file"])
+
+    def register(self, path: Path) -> Dict[str, Any]:
+        """Add or update a single chunk right after it was written."""
+        path = Path(path)
+        with self._lock:
+            chunks = self._read_manifest()
+            meta = self._scan_chunk(path, path.stat())
+            chunks[path.name] = meta
+            self._write_manifest(chunks)
+            return meta
+
+    def chunks_for(self, start_ts: Optional[int], end_ts: Optional[int]) -> List[Dict[str, Any]]:
+        out = []
+        for c in self.refresh():
+            if not c.get("rows"):
+                continue
+            if start_ts is not None and c["end"] < start_ts:
+                continue
+            if end_ts is not None and c["start"] > end_ts:
+                continue
+            out.append(c)
+        return out
+
+    def _chunk_rows(self, meta: Dict[str, Any], start_ts: Optional[int], end_ts: Optional[int]) -> Iterator[Dict[str, Any]]:
+        rows: Iterable[Dict[str, Any]] = _read_rows(self.directory / meta["file"])
+        if not meta.get("sorted", False):
+            rows = sorted(rows, key=lambda r: r["time"])
+        for row in rows:
+            t = row["time"]
+            if start_ts is not None and t < start_ts:
+                continue
+            if end_ts is not None and t > end_ts:
+                break
+            yield row
+
+    def iter_range(self, start_ts: Optional[int], end_ts: Optional[int]) -> Iterator[Dict[str, Any]]:
+        """
+        Stream candles in ``[start_ts, end_ts]`` in time order.
+
+        Where chunks overlap, the row from the chunk whose file name sorts last
+        wins, matching the previous dict-based de-duplication.
+        """
+        return self._merge(self.chunks_for(start_ts, end_ts), start_ts, end_ts)
+
+    def _merge(
+        self, chunks: Sequence[Dict[str, Any]], start_ts: Optional[int], end_ts: Optional[int]
+    ) -> Iterator[Dict[str, Any]]:
+        chunks = sorted(chunks, key=lambda c: c["file"])
+        streams = [self._chunk_rows(c, start_ts, end_ts) for c in chunks]
+        pending: Optional[Dict[str, Any]] = None
+        for row in heapq.merge(*streams, key=lambda r: r["time"]):
+            if pending is not None and pending["time"] != row["time"]:
+                yield pending
+            pending = row
+        if pending is not None:
+            yield pending
+
+    def load(self, start_ts: Optional[int], end_ts: Optional[int]) -> List[Dict[str, Any]]:
+        return list(self.iter_range(start_ts, end_ts))
+
+    def compact(self, step: int, max_rows: int = 200_000) -> int:
+        """
+        Merge chunks that overlap or touch (next start within one bar of the
+        previous end) into a single ``{first}-{last}.csv``, without growing a
+        chunk past ``max_rows``. Returns the number of chunk files removed.
+        """
+        # Under the directory lock: a concurrent register() must not land between
+        # reading a group and deleting its files
+        with self._lock:
+            chunks = sorted((c for c in self.refresh(verify=True) if c.get("rows")), key=lambda c: (c["start"], c["file"]))
+            groups: List[List[Dict[str, Any]]] = []
+            group_end = 0
+            group_rows = 0
+            for c in chunks:
+                if groups and c["start"] <= group_end + step and group_rows + c["rows"] <= max_rows:
+                    groups[-1].append(c)
+                    group_end = max(group_end, c["end"])
+                    group_rows += c["rows"]
+                else:
+                    groups.append([c])
+                    group_end = c["end"]
+                    group_rows = c["rows"]
+
+            removed = 0
+            for group in groups:
+                if len(group) < 2:
+                    continue
+                rows = list(self._merge(group, None, None))
+                target = self.directory / f"{rows[0]['time']}-{rows[-1]['time']}.csv"
+                write_history_csv(target, rows)
+                self.register(target)
+                for c in group:
+                    if c["file"] != target.name:
+                        (self.directory / c["file"]).unlink(missing_ok=True)
+                        removed += 1
+            if removed:
+                self.refresh()
+            return removed
+
+
+def page_windows(start_ts: int, end_ts: int, step: int, limit: int) -> List[Tuple[int, int]]:
+    """Split ``[start_ts, end_ts]`` (seconds, inclusive) into windows of at most ``limit`` bars, in ms."""
+    windows: List[Tuple[int, int]] = []
+    span = step * (limit - 1)
+    cur = start_ts
+    while cur <= end_ts:
+        w_end = min(cur + span, end_ts)
+        windows.append((cur * 1000, w_end * 1000))
+        cur = w_end + step
+    return windows
+
+
+def missing_ranges(
+    chunks: Iterable[Dict[str, Any]], start_ts: int, end_ts: int, step: int
+) -> List[Tuple[int, int]]:
+    """Inclusive ``(start, end)`` ranges inside ``[start_ts, end_ts]`` not covered by any chunk."""
+    covered = sorted((c["start"], c["end"]) for c in chunks if c.get("rows"))
+    gaps: List[Tuple[int, int]] = []
+    cur = start_ts
+    for s, e in covered:
+        if cur > end_ts:
+            break
+        if e < cur:
+            continue
+        if s > end_ts:
+            break
+        if s > cur:
+            gaps.append((cur, min(s - step, end_ts)))
+        cur = max(cur, e + step)
+    if cur <= end_ts:
+        gaps.append((cur, end_ts))
+    return [(a, b) for a, b in gaps if a <= b]
+
+
+def pull_missing(
+    index: HistoryIndex,
+    fetch_page: Callable[[int, int], List[Dict[str, Any]]],
+    start_ts: int,
+    end_ts: int,
+    step: int,
+    limit: int = 1000,
+    on_page: Optional[Callable[[Dict[str, Any]], None]] = None,
+    fetch_pages: Optional[Callable[[List[Tuple[int, int]]], Iterable[List[Dict[str, Any]]]]] = None,
+) -> Dict[str, Any]:
+    """
+    Download only the parts of ``[start_ts, end_ts]`` that are not stored yet.
+
+    The missing ranges are split into page windows up front. ``fetch_page(start_ms,
+    end_ms)`` returns ascending candles with ``time`` in seconds; ``fetch_pages``,
+    when given, receives all windows and must yield their pages in window order
+    (e.g. a concurrent downloader). Every page is written and registered as its
+    own chunk as soon as it arrives, so an interrupted pull resumes from the
+    stored pages on the next call. Adjacent chunks are compacted at the end.
+    """
+    gaps = missing_ranges(index.refresh(verify=True), start_ts, end_ts, step)
+    windows = [w for g in gaps for w in page_windows(g[0], g[1], step, limit)]
+    if fetch_pages is not None:
+        page_iter = iter(fetch_pages(windows))
+    else:
+        page_iter = (fetch_page(w_start, w_end) for w_start, w_end in windows)
+
+    pages = 0
+    fetched = 0
+    for (w_start, w_end), page in zip(windows, page_iter):
+        lo, hi = w_start // 1000, w_end // 1000
+        rows = sorted((r for r in page if lo <= int(r["time"]) <= hi), key=lambda r: r["time"])
+        if not rows:
+            continue
+        path = index.directory / f"{rows[0]['time']}-{rows[-1]['time']}.csv"
+        write_history_csv(path, rows)
+        index.register(path)
+        pages += 1
+        fetched += len(rows)
+        if on_page is not None:
+            on_page({"pages": pages, "fetched": fetched, "last_ts": rows[-1]["time"], "windows": len(windows)})
+    compacted = index.compact(step) if pages else 0
+    return {"gaps": [list(g) for g in gaps], "pages": pages, "fetched": fetched, "compacted": compacted}
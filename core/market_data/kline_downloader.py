@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+from core.exchange.http_client import ExchangeHTTP, get_http
+
+from .history import page_windows
+
+log = logging.getLogger(__name__)
+
+BYBIT_MAINNET_URL = "https://api.bybit.com"
+
+# Bybit allows 600 requests per 5 seconds per IP on public market endpoints;
+# the default keeps half of that as headroom for the rest of the app.
+DEFAULT_RATE_PER_SEC = float(os.getenv("BYBIT_HISTORY_RATE_PER_SEC", "60"))
+DEFAULT_WORKERS = int(os.getenv("BYBIT_HISTORY_WORKERS", "4"))
+
+RATE_LIMIT_RET_CODES = frozenset({10006, 10018})
+RETRY_HTTP_STATUSES = frozenset({429, 502, 503, 504})
+
+
+class BybitAPIError(Exception):
+    def __init__(self, message: str, ret_code: Optional[int] = None, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.ret_code = ret_code
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def rate_limited(self) -> bool:
+        return self.ret_code in RATE_LIMIT_RET_CODES or self.status == 429
+
+    @property
+    def retryable(self) -> bool:
+        return self.rate_limited or self.status in RETRY_HTTP_STATUSES
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, up to ``capacity`` banked."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until ``tokens`` are available; returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def drain(self, seconds: float) -> None:
+        """Push the bucket into debt so nobody sends for ``seconds`` (server asked us to back off)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+def map_bybit_interval(tf: str) -> str:
+    tf = tf.lower().strip()
+    if tf.endswith("m"):
+        return tf[:-1] or "1"
+    if tf.endswith("h"):
+        return str(int(tf[:-1] or "1") * 60)
+    if tf.endswith("d"):
+        return "D"
+    if tf.endswith("w"):
+        return "W"
+    if tf.endswith("mth") or tf == "m":
+        return "M"
+    return tf
+
+
+def parse_kline_list(items: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """Bybit v5 ``result.list`` (newest first, ms) -> ascending candles with ``time`` in seconds."""
+    candles = []
+    for it in reversed(list(items)):
+        try:
+            candles.append({
+                "time": int(it[0]) // 1000,
+                "open": float(it[1]),
+                "high": float(it[2]),
+                "low": float(it[3]),
+                "close": float(it[4]),
+                "volume": float(it[5]),
+            })
+        except (IndexError, TypeError, ValueError):
+            continue
+    return candles
+
+
+class BybitKlineDownloader:
+    """
+    Paged ``/v5/market/kline`` downloader.
+
+    All page windows are computed up front and fetched on a small thread pool
+    sharing the process-wide pooled HTTP client. Every request first takes a
+    token from a shared bucket; rate-limit answers (HTTP 429, retCode
+    10006/10018) and transient 5xx are retried with exponential backoff,
+    honouring the reset time Bybit sends back. Pages are yielded in window
+    order regardless of completion order.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BYBIT_MAINNET_URL,
+        rate_per_sec: float = DEFAULT_RATE_PER_SEC,
+        burst: Optional[float] = None,
+        max_workers: int = DEFAULT_WORKERS,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        max_backoff: float = 10.0,
+        timeout: float = 10.0,
+        http: Optional[ExchangeHTTP] = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.bucket = TokenBucket(rate_per_sec, burst)
+        self.max_workers = max(1, int(max_workers))
+        self.max_retries = int(max_retries)
+        self.backoff = float(backoff)
+        self.max_backoff = float(max_backoff)
+        self.timeout = float(timeout)
+        self.http = http or get_http()
+        self.stats = {"requests": 0, "retries": 0, "throttled_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str, value: float = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += value
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                pass
+        reset_ms = response.headers.get("X-Bapi-Limit-Reset-Timestamp")
+        if reset_ms:
+            try:
+                return max(0.0, int(reset_ms) / 1000.0 - time.time())
+            except ValueError:
+                pass
+        return None
+
+    def _request_page(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        url = f"{self.base_url}/v5/market/kline"
+        self._count("throttled_seconds", self.bucket.acquire())
+        self._count("requests")
+        r = self.http.get(url, params=params, timeout=self.timeout)
+        if r.status_code != 200:
+            raise BybitAPIError(
+                f"http_error {r.status_code} url={url} params={params}",
+                status=r.status_code,
+                retry_after=self._retry_after(r),
+            )
+        j = r.json()
+        if j.get("retCode") != 0 or "result" not in j or "list" not in j["result"]:
+            raise BybitAPIError(
+                f"bybit_error retCode={j.get('retCode')} msg={j.get('retMsg')} url={url} params={params}",
+                ret_code=j.get("retCode"),
+                retry_after=self._retry_after(r),
+            )
+        return parse_kline_list(j["result"]["list"])
+
+    def fetch_page(
+        self, symbol: str, timeframe: str, start_ms: int, end_ms: int, limit: int = 1000, category: str = "linear"
+    ) -> List[Dict[str, Any]]:
+        params = {
+            "category": category,
+            "symbol": symbol,
+            "interval": map_bybit_interval(timeframe),
+            "limit": limit,
+            "start": start_ms,
+            "end": end_ms,
+        }
+        attempt = 0
+        while True:
+            try:
+                return self._request_page(params)
+            except (BybitAPIError, httpx.TransportError) as e:
+                retryable = e.retryable if isinstance(e, BybitAPIError) else True
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+                hint = getattr(e, "retry_after", None)
+                if hint is not None:
+                    delay = max(delay, min(hint, self.max_backoff))
+                if isinstance(e, BybitAPIError) and e.rate_limited:
+                    # everyone backs off, not just this worker
+                    self.bucket.drain(delay)
+                log.warning("kline page retry %s in %.2fs: %s", attempt + 1, delay, e)
+                self._count("retries")
+                attempt += 1
+                time.sleep(delay)
+
+    def iter_pages(
+        self,
+        symbol: str,
+        timeframe: str,
+        windows: Sequence[Tuple[int, int]],
+        limit: int = 1000,
+        category: str = "linear",
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Fetch ``windows`` concurrently and yield each page's candles in window order."""
+        if not windows:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(windows)), thread_name_prefix="kline") as pool:
+            pending: Deque[Future] = deque()
+            it = iter(windows)
+            # keep a bounded number of pages in flight so memory stays flat on long ranges
+            for w in it:
+                pending.append(pool.submit(self.fetch_page, symbol, timeframe, w[0], w[1], limit, category))
+                if len(pending) >= self.max_workers * 2:
+                    break
+            try:
+                while pending:
+                    page = pending.popleft().result()
+                    nxt = next(it, None)
+                    if nxt is not None:
+                        pending.append(pool.submit(self.fetch_page, symbol, timeframe, nxt[0], nxt[1], limit, category))
+                    yield page
+            finally:
+                for f in pending:
+                    f.cancel()
+
+    def download(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_ts: int,
+        end_ts: int,
+        step: int,
+        limit: int = 1000,
+        category: str = "linear",
+    ) -> List[Dict[str, Any]]:
+        """All candles in ``[start_ts, end_ts]`` (seconds), ascending and de-duplicated."""
+        out: List[Dict[str, Any]] = []
+        last = None
+        for page in self.iter_pages(symbol, timeframe, page_windows(start_ts, end_ts, step, limit), limit, category):
+            for c in page:
+                if last is not None and c["time"] <= last:
+                    continue
+                out.append(c)
+                last = c["time"]
+        return out
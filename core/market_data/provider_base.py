@@ -10,6 +10,8 @@ class MarketDataProvider(ABC):
     """Abstract provider for fetching raw OHLCV candles."""
 
     native_timeframes: Set[str] = frozenset({"1m"})
+    # Most candles one get_ohlcv call can return
+    max_page_size: int = 1000
 
     @abstractmethod
     async def get_ohlcv(
@@ -18,13 +20,40 @@ class MarketDataProvider(ABC):
         timeframe: str,
         limit: int = 500,
         since: int | None = None,
+        end: int | None = None,
     ) -> Sequence[OHLCV]:
         """
         Fetch OHLCV candles for the requested timeframe.
 
-        Providers should return ascending candles (oldest -> newest).
+        ``end`` (unix seconds, inclusive) asks for the ``limit`` candles up to
+        that time instead of the latest ones. Providers should return
+        ascending candles (oldest -> newest).
         """
 
+    async def get_ohlcv_paged(
+        self, symbol: str, timeframe: str, limit: int, end: int | None = None
+    ) -> list[OHLCV]:
+        """
+        The latest ``limit`` candles (up to ``end`` if given), paging
+        backwards in ``max_page_size`` requests. Stops early when the
+        exchange has no older data.
+        """
+        pages: list[list[OHLCV]] = []
+        remaining = limit
+        while remaining > 0:
+            size = min(remaining, self.max_page_size)
+            page = list(await self.get_ohlcv(symbol=symbol, timeframe=timeframe, limit=size, end=end))
+            if end is not None:
+                page = [c for c in page if c.time <= end]
+            if not page:
+                break
+            pages.append(page[-remaining:])
+            remaining -= len(pages[-1])
+            if len(page) < size:
+                break
+            end = page[0].time - 1
+        return [c for page in reversed(pages) for c in page]
+
     def supports_timeframe(self, timeframe: str) -> bool:
         """Return True if provider can natively serve the timeframe."""
         return timeframe in self.native_timeframes
@@ -0,0 +1,98 @@
+"""
+Vectorized OHLCV resampling.
+
+Candles are handled as columns (``time``/``open``/``high``/``low``/``close``/
+``volume`` NumPy arrays) and aggregated into epoch-aligned buckets with
+``ufunc.reduceat``, so resampling 100k base bars costs a few array passes
+instead of one Python object per bar.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from .models import OHLCV
+
+COLUMNS = ("time", "open", "high", "low", "close", "volume")
+
+Columns = Dict[str, np.ndarray]
+
+
+def to_columns(candles: Sequence[OHLCV]) -> Columns:
+    n = len(candles)
+    cols: Columns = {"time": np.fromiter((c.time for c in candles), dtype=np.int64, count=n)}
+    for name in COLUMNS[1:]:
+        cols[name] = np.fromiter((getattr(c, name) for c in candles), dtype=np.float64, count=n)
+    return cols
+
+
+def to_ohlcv(cols: Columns) -> list[OHLCV]:
+    return [
+        OHLCV(time=t, open=o, high=h, low=low, close=c, volume=v)
+        for t, o, h, low, c, v in zip(*(cols[name].tolist() for name in COLUMNS))
+    ]
+
+
+def normalize(cols: Columns) -> Columns:
+    """Sort by time and drop duplicate timestamps (the later row wins)."""
+    t = cols["time"]
+    order = np.argsort(t, kind="stable")
+    t = t[order]
+    keep = np.ones(len(t), dtype=bool)
+    keep[:-1] = t[1:] != t[:-1]
+    idx = order[keep]
+    return {name: cols[name][idx] for name in COLUMNS}
+
+
+def resample(cols: Columns, bucket_seconds: int, base_seconds: int = 60, now: Optional[float] = None) -> Columns:
+    """
+    Aggregate ``base_seconds`` candles into ``bucket_seconds`` buckets.
+
+    ``bucket_seconds`` must be a multiple of ``base_seconds``. Buckets are
+    aligned to the epoch, like exchange klines. Besides the OHLCV columns
+    the result has ``count`` (base bars per bucket) and ``complete``: the
+    first bucket is incomplete if the data starts after its open, the last
+    one if the data ends before its close (the still-forming bar). Interior
+    buckets are always complete; a gap there is a gap on the exchange.
+
+    Coverage alone cannot tell a forming bar from a closed one when the
+    bucket is the base timeframe (one bar covers it either way): given
+    ``now``, the last bucket is also incomplete until ``now`` reaches its close.
+    """
+    if base_seconds <= 0 or bucket_seconds <= 0 or bucket_seconds % base_seconds:
+        raise ValueError(f"bucket of {bucket_seconds}s is not a multiple of the {base_seconds}s base")
+    cols = normalize(cols)
+    t = cols["time"]
+    n = len(t)
+    if n == 0:
+        empty = {name: cols[name][:0] for name in COLUMNS}
+        empty.update(count=np.zeros(0, dtype=np.int64), complete=np.zeros(0, dtype=bool))
+        return empty
+
+    bucket = t - t % bucket_seconds
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], n]
+    opens = bucket[starts]
+
+    complete = np.ones(len(starts), dtype=bool)
+    complete[0] = t[0] == opens[0]
+    complete[-1] &= t[-1] + base_seconds >= opens[-1] + bucket_seconds
+    if now is not None:
+        complete[-1] &= now >= opens[-1] + bucket_seconds
+
+    return {
+        "time": opens,
+        "open": cols["open"][starts],
+        "high": np.maximum.reduceat(cols["high"], starts),
+        "low": np.minimum.reduceat(cols["low"], starts),
+        "close": cols["close"][ends - 1],
+        "volume": np.add.reduceat(cols["volume"], starts),
+        "count": ends - starts,
+        "complete": complete,
+    }
+
+
+def tail(cols: Columns, limit: int) -> Columns:
+    return {name: values[-limit:] if limit > 0 else values[:0] for name, values in cols.items()}
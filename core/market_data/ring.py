@@ -0,0 +1,222 @@
+"""
+Resident recent candles per (exchange, symbol, timeframe).
+
+``CandleRing`` is a fixed-capacity ring of candle columns. Every value is
+written twice, at ``i`` and ``i + capacity``, so the latest ``n`` candles are
+always one contiguous slice: ``view(n)`` hands out read-only NumPy views with
+no copying or parsing. A view stays intact until ``capacity - n`` further bars
+are appended; only the forming (last) bar is updated in place.
+
+``RecentCandles`` keeps a ring per key warm with a refresher task that pulls
+the bars closed since the last refresh from the ``MarketDataService`` (which
+resolves them from its base series, not the network). Readers such as the AI
+endpoints share one resident copy instead of each downloading and parsing
+their own few hundred candles.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+import numpy as np
+
+from .resample import COLUMNS, Columns, normalize
+from .service import get_market_data_service, timeframe_to_seconds
+from .singleflight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = int(os.getenv("MARKET_DATA_RING_CAPACITY", "1000"))
+REFRESH_SECONDS = float(os.getenv("MARKET_DATA_RING_REFRESH_SECONDS", "5"))
+# Rings nobody read for this long stop being refreshed and are dropped
+IDLE_SECONDS = float(os.getenv("MARKET_DATA_RING_IDLE_SECONDS", "900"))
+
+Key = Tuple[str, str, str]
+
+
+class CandleRing:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self._cols: Columns = {
+            name: np.zeros(2 * self.capacity, dtype=np.int64 if name == "time" else np.float64) for name in COLUMNS
+        }
+        # Bars ever written; the latest one sits at (written - 1) % capacity
+        self.written = 0
+        self.refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return min(self.written, self.capacity)
+
+    @property
+    def last_time(self) -> Optional[int]:
+        if not self.written:
+            return None
+        return int(self._cols["time"][(self.written - 1) % self.capacity])
+
+    def extend(self, cols: Columns) -> int:
+        """
+        Apply candles (any order): the bar matching the last one replaces it,
+        newer ones are appended, older ones are ignored. Returns bars appended.
+        """
+        cols = normalize(cols)
+        t = cols["time"]
+        last = self.last_time
+        if last is not None:
+            start = int(np.searchsorted(t, last, side="left"))
+            if start < len(t) and t[start] == last:
+                slot = (self.written - 1) % self.capacity
+                for name in COLUMNS:
+                    self._cols[name][slot] = self._cols[name][slot + self.capacity] = cols[name][start]
+                start += 1
+            cols = {name: values[start:] for name, values in cols.items()}
+        # More new bars than fit: only the newest ``capacity`` survive anyway
+        cols = {name: values[-self.capacity:] for name, values in cols.items()}
+        count = len(cols["time"])
+        if count:
+            slots = (self.written + np.arange(count)) % self.capacity
+            for name in COLUMNS:
+                self._cols[name][slots] = cols[name]
+                self._cols[name][slots + self.capacity] = cols[name]
+            self.written += count
+        return count
+
+    def view(self, n: Optional[int] = None) -> Columns:
+        """The latest ``n`` candles (all held if None) as read-only column views."""
+        size = len(self)
+        n = size if n is None else max(0, min(int(n), size))
+        end = (self.written - 1) % self.capacity + self.capacity + 1 if self.written else 0
+        out = {}
+        for name, values in self._cols.items():
+            part = values[end - n:end]
+            part.flags.writeable = False
+            out[name] = part
+        return out
+
+    def clear(self) -> None:
+        self.written = 0
+        self.refreshed_at = None
+
+
+class RecentCandles:
+    def __init__(
+        self,
+        service: Any = None,
+        capacity: int = DEFAULT_CAPACITY,
+        refresh_seconds: float = REFRESH_SECONDS,
+        idle_seconds: float = IDLE_SECONDS,
+    ) -> None:
+        self._service = service
+        self.capacity = capacity
+        self.refresh_seconds = refresh_seconds
+        self.idle_seconds = idle_seconds
+        self.rings: Dict[Key, CandleRing] = {}
+        self._read_at: Dict[Key, float] = {}
+        self._refresher: Optional[asyncio.Task] = None
+        self.flights = SingleFlight()
+        self.reads = 0
+        self.loads = 0
+        self.refreshes = 0
+
+    @property
+    def service(self) -> Any:
+        if self._service is None:
+            self._service = get_market_data_service()
+        return self._service
+
+    async def window(self, exchange: str, symbol: str, timeframe: str, limit: int) -> Columns:
+        """
+        The latest ``limit`` candles as read-only column views (the last one
+        is the forming bar). Views share memory with the ring: copy anything
+        kept beyond the current computation.
+        """
+        if limit > self.capacity:
+            # Deeper than any ring: a one-off read, not worth keeping resident
+            return (await self.service.get_frame(exchange, symbol, timeframe, limit=limit)).columns()
+        key = (exchange.lower(), symbol.upper(), timeframe)
+        ring = self.rings.get(key)
+        if ring is None:
+            ring = self.rings[key] = CandleRing(self.capacity)
+        self.reads += 1
+        self._read_at[key] = time.time()
+        if ring.refreshed_at is None or time.time() - ring.refreshed_at >= self.refresh_seconds:
+            # Cold, or the refresher has not come round yet
+            await self.flights.do(key, lambda: self._refresh(key, ring))
+        self._ensure_refresher()
+        return ring.view(limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rings": len(self.rings),
+            "capacity": self.capacity,
+            "bytes": sum(sum(v.nbytes for v in ring._cols.values()) for ring in self.rings.values()),
+            "reads": self.reads,
+            "loads": self.loads,
+            "refreshes": self.refreshes,
+            "refresher": self._refresher is not None and not self._refresher.done(),
+        }
+
+    async def stop(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+
+    async def _refresh(self, key: Key, ring: CandleRing) -> None:
+        exchange, symbol, timeframe = key
+        now = time.time()
+        step = timeframe_to_seconds(timeframe)
+        last = ring.last_time
+        # Bars opened since the last one held, plus that one (it may have been forming)
+        missing = None if last is None else int((now - last) // step) + 2
+        if missing is None or missing > ring.capacity:
+            self.loads += 1
+            frame = await self.service.get_frame(exchange, symbol, timeframe, limit=ring.capacity)
+            ring.clear()
+        else:
+            self.refreshes += 1
+            frame = await self.service.get_frame(exchange, symbol, timeframe, limit=missing)
+            if len(frame) and last is not None and frame.ts[0] > last:
+                # Fewer bars came back than were asked for: do not stitch across a gap
+                self.loads += 1
+                frame = await self.service.get_frame(exchange, symbol, timeframe, limit=ring.capacity)
+                ring.clear()
+        if len(frame):
+            ring.extend(frame.columns())
+        ring.refreshed_at = now
+
+    def _ensure_refresher(self) -> None:
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        while self.rings:
+            await asyncio.sleep(self.refresh_seconds)
+            now = time.time()
+            idle: Set[Key] = {k for k in self.rings if now - self._read_at.get(k, 0.0) >= self.idle_seconds}
+            for key in idle:
+                del self.rings[key]
+                self._read_at.pop(key, None)
+            results = await asyncio.gather(
+                *(self.flights.do(key, lambda key=key, ring=ring: self._refresh(key, ring)) for key, ring in self.rings.items()),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    log.warning("Recent candles refresh failed: %s", result)
+
+
+_shared_recent: Optional[RecentCandles] = None
+
+
+def get_recent_candles() -> RecentCandles:
+    """The process-wide RecentCandles over the shared MarketDataService."""
+    global _shared_recent
+    if _shared_recent is None:
+        _shared_recent = RecentCandles()
+    return _shared_recent
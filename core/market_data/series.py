@@ -0,0 +1,96 @@
+"""
+Base candle series kept per (exchange, symbol, base timeframe).
+
+A series holds one contiguous, ascending run of base candles as columns and
+grows in both directions: new bars are merged in at the tail as they close,
+and older history is prepended when a request needs more depth. ``revision``
+changes whenever the recent data does (a prepend does not: tails already
+served stay the same), so results derived from the series can be cached
+until then.
+"""
+
+from __future__ import annotations
+
+import itertools
+import time
+from typing import Optional
+
+import numpy as np
+
+from .resample import COLUMNS, Columns, normalize
+
+# Revisions are unique across all series, so derived results from different
+# series (or services) can share one cache without colliding
+_revisions = itertools.count(1)
+
+
+class CandleSeries:
+    def __init__(self, base_seconds: int, max_candles: int, max_age: float = 60.0) -> None:
+        self.base_seconds = int(base_seconds)
+        self.max_candles = int(max_candles)
+        self.max_age = float(max_age)
+        self.cols: Columns = {
+            name: np.zeros(0, dtype=np.int64 if name == "time" else np.float64) for name in COLUMNS
+        }
+        self.revision = next(_revisions)
+        self.fetched_at: Optional[float] = None
+        # Last time a request read the series; idle ones are evicted by the service
+        self.read_at: Optional[float] = None
+        # Deepest history any caller asked for; refreshes fetch up to this
+        self.wanted = 0
+        # The exchange returned less history than asked for: there is no more
+        self.exhausted = False
+
+    def __len__(self) -> int:
+        return len(self.cols["time"])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self.cols.values())
+
+    @property
+    def first_time(self) -> Optional[int]:
+        return int(self.cols["time"][0]) if len(self) else None
+
+    @property
+    def last_time(self) -> Optional[int]:
+        return int(self.cols["time"][-1]) if len(self) else None
+
+    def stale(self, now: Optional[float] = None) -> bool:
+        """True once a new base bar has opened since the last fetch (or ``max_age`` passed)."""
+        if self.fetched_at is None:
+            return True
+        now = time.time() if now is None else now
+        bar_end = (self.fetched_at // self.base_seconds + 1) * self.base_seconds
+        return now >= bar_end or now - self.fetched_at >= self.max_age
+
+    def missing_bars(self, now: Optional[float] = None) -> int:
+        """Base bars to fetch to bring the tail up to date, the forming bar included."""
+        if not len(self):
+            return 0
+        now = time.time() if now is None else now
+        return max(1, int((now - self.last_time) // self.base_seconds) + 1)
+
+    def merge(self, cols: Columns) -> None:
+        """Merge a contiguous run of candles; it replaces the stored bars in its time range."""
+        new = normalize(cols)
+        if not len(new["time"]):
+            return
+        old = self.cols
+        lo = np.searchsorted(old["time"], new["time"][0], side="left")
+        hi = np.searchsorted(old["time"], new["time"][-1], side="right")
+        merged = {name: np.concatenate([old[name][:lo], new[name], old[name][hi:]]) for name in COLUMNS}
+        if len(merged["time"]) > self.max_candles:
+            merged = {name: values[-self.max_candles:] for name, values in merged.items()}
+        self.cols = merged
+        # Prepending older history leaves every tail already served unchanged
+        if not len(old["time"]) or new["time"][-1] >= old["time"][0]:
+            self.revision = next(_revisions)
+
+    def reset(self) -> None:
+        self.cols = {name: values[:0] for name, values in self.cols.items()}
+        self.exhausted = False
+        self.revision = next(_revisions)
+
+    def tail(self, count: int) -> Columns:
+        return {name: values[-count:] for name, values in self.cols.items()}
@@ -1,17 +1,29 @@
 from __future__ import annotations
 
 import logging
-from typing import Dict, List, Sequence
+import os
+import time
+from typing import Any, Dict, Sequence, Tuple
 
 from .bybit_provider import BybitMarketDataProvider
-from .cache import MarketDataCache
+from .cache import MarketDataCache, get_market_data_cache
 from .models import OHLCV
 from .provider_base import MarketDataProvider
+from .frame import FIELDS, CandleFrame
+from .resample import COLUMNS, Columns, resample, tail, to_columns
+from .series import CandleSeries
+from .singleflight import SingleFlight
 
 log = logging.getLogger(__name__)
 
 BASE_TIMEFRAME_SECONDS = 60  # 1m raw resolution
 BASE_TIMEFRAME_STR = "1m"
+# Upper bound on base candles paged in for one resampled request (and kept per series)
+MAX_BASE_CANDLES = int(os.getenv("MARKET_DATA_MAX_BASE_CANDLES", "50000"))
+# A series refetches its tail when a new base bar opens, or after this many seconds
+SERIES_MAX_AGE = float(os.getenv("MARKET_DATA_REFRESH_SECONDS", "60"))
+# Series no request read for this long are dropped (each can hold MAX_BASE_CANDLES)
+SERIES_IDLE_SECONDS = float(os.getenv("MARKET_DATA_SERIES_IDLE_SECONDS", "900"))
 
 
 def timeframe_to_seconds(value: str) -> int:
@@ -53,8 +65,13 @@ class MarketDataService:
         cache: MarketDataCache | None = None,
         providers: Dict[str, MarketDataProvider] | None = None,
     ):
-        self.cache = cache or MarketDataCache()
+        # Derived (resampled) responses, keyed by the revision of their base series
+        self.cache = cache or get_market_data_cache()
         self.providers = providers or {"bybit": BybitMarketDataProvider()}
+        self.series: Dict[Tuple[str, str, str], CandleSeries] = {}
+        self.flights = SingleFlight()
+        # Optional MarketDataHub streaming live klines into the base series
+        self.hub: Any = None
 
     def get_provider(self, exchange: str) -> MarketDataProvider:
         try:
@@ -70,7 +87,38 @@ class MarketDataService:
         limit: int = 500,
         mode: str = "live",
         use_native_timeframe: bool = True,
+        include_partial: bool = True,
     ) -> list[OHLCV]:
+        """The latest ``limit`` candles of ``timeframe`` as ``OHLCV`` objects; see ``get_frame``."""
+        frame = await self.get_frame(
+            exchange, symbol, timeframe, limit, mode, use_native_timeframe, include_partial
+        )
+        return frame.to_ohlcv()
+
+    async def get_frame(
+        self,
+        exchange: str,
+        symbol: str,
+        timeframe: str,
+        limit: int = 500,
+        mode: str = "live",
+        use_native_timeframe: bool = True,
+        include_partial: bool = True,
+    ) -> CandleFrame:
+        """
+        The latest ``limit`` candles of ``timeframe`` as a read-only ``CandleFrame``.
+
+        Every timeframe is resampled from a base series of native candles
+        kept per (exchange, symbol, base timeframe): the finest native
+        timeframe that divides the request and fits ``limit`` buckets in
+        ``MAX_BASE_CANDLES``: at the default limit of 500, 1m through 1h share
+        one 1m series, fetched at most once per base bar, while 4h (120k 1m
+        bars) resamples a 3m series. A series only fetches
+        the bars that closed since its last refresh, plus older history when
+        a request needs more depth. Resampled results are cached until the
+        series changes. The last candle is the still-forming one unless
+        ``include_partial`` is False.
+        """
         log.info(
             "MarketDataService.get_candles exchange=%s symbol=%s timeframe=%s limit=%s mode=%s",
             exchange,
@@ -81,77 +129,203 @@ class MarketDataService:
         )
         provider = self.get_provider(exchange)
         tf_seconds = timeframe_to_seconds(timeframe)
+        base_timeframe, base_seconds = self._base_timeframe(provider, tf_seconds, use_native_timeframe, limit)
+        ratio = tf_seconds // base_seconds
+        # One extra bucket: the oldest one is usually cut off mid-way and dropped
+        raw_limit = (limit + 1) * ratio
+        if raw_limit > MAX_BASE_CANDLES:
+            log.warning(
+                "%s %s x %s needs %s %s candles; capped at %s, fewer candles will be returned",
+                symbol,
+                timeframe,
+                limit,
+                raw_limit,
+                base_timeframe,
+                MAX_BASE_CANDLES,
+            )
+            raw_limit = MAX_BASE_CANDLES
 
-        if tf_seconds < BASE_TIMEFRAME_SECONDS:
-            raise ValueError("Requested timeframe is below 1m resolution")
+        series = await self._refresh_series(provider, exchange, symbol, base_timeframe, base_seconds, raw_limit)
+        # Only symbols the exchange knows; the hub drops watches nobody renews
+        if self.hub is not None and len(series) and self.hub.supports(exchange, base_timeframe):
+            self.hub.watch(exchange, symbol, base_timeframe)
+        now = time.time()
+        # Without the forming bar the result also changes when a bucket closes
+        closed_through = None if include_partial else int(now // tf_seconds)
+        cache_key = (exchange.lower(), symbol.upper(), base_timeframe, series.revision, tf_seconds, limit, closed_through)
+        frame = self.cache.get(cache_key)
+        if frame is None:
+            frame = self._aggregate(series.tail(raw_limit), tf_seconds, limit, base_seconds, include_partial, now)
+            # Shared by every caller until the series changes
+            for name in FIELDS:
+                getattr(frame, name).flags.writeable = False
+            self.cache.set(cache_key, frame)
+        return frame
 
-        if use_native_timeframe and provider.supports_timeframe(timeframe):
-            candles = await provider.get_ohlcv(symbol=symbol, timeframe=timeframe, limit=limit)
-            return list(candles)[-limit:]
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters, request coalescing for series refreshes and provider downloads, live stream counters."""
+        providers = {
+            name: provider.flights.stats()
+            for name, provider in self.providers.items()
+            if isinstance(getattr(provider, "flights", None), SingleFlight)
+        }
+        stats = {
+            "cache": self.cache.stats(),
+            "series": {"count": len(self.series), "bytes": sum(s.nbytes for s in self.series.values())},
+            "series_refresh": self.flights.stats(),
+            "provider_fetch": providers,
+        }
+        if self.hub is not None:
+            stats["stream"] = self.hub.stats()
+        return stats
 
-        if tf_seconds % BASE_TIMEFRAME_SECONDS != 0:
-            raise ValueError("Timeframe must be divisible by 1m for aggregation")
+    def get_series(self, exchange: str, symbol: str, base_timeframe: str) -> CandleSeries:
+        key = (exchange.lower(), symbol.upper(), base_timeframe)
+        now = time.time()
+        self._evict_idle(now)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = CandleSeries(
+                timeframe_to_seconds(base_timeframe), MAX_BASE_CANDLES, max_age=SERIES_MAX_AGE
+            )
+        series.read_at = now
+        return series
 
-        ratio = tf_seconds // BASE_TIMEFRAME_SECONDS
-        raw_limit = min(max(limit * ratio * 2, ratio * 2), 2000)
-        cache_key = (exchange.lower(), symbol.upper(), BASE_TIMEFRAME_STR, raw_limit)
-        raw = self.cache.get(cache_key)
-        if raw is None:
-            log.debug(
-                "Cache miss for %s %s timeframe=%s limit=%s",
-                exchange,
-                symbol,
-                BASE_TIMEFRAME_STR,
-                raw_limit,
+    def _evict_idle(self, now: float) -> None:
+        # Streamed updates do not count as reads: the hub drops idle watches too
+        idle = [k for k, s in self.series.items() if s.read_at is not None and now - s.read_at >= SERIES_IDLE_SECONDS]
+        for key in idle:
+            del self.series[key]
+
+    def ingest(self, exchange: str, symbol: str, base_timeframe: str, candle: OHLCV) -> bool:
+        """
+        Merge a streamed base candle into its series.
+
+        Only extends a series that is already loaded and contiguous with the
+        candle; a gap (e.g. after a dropped stream) is left for the next REST
+        refresh to fill. An accepted candle counts as a fetch, so the series
+        stays fresh without polling while the stream is up.
+        """
+        series = self.series.get((exchange.lower(), symbol.upper(), base_timeframe))
+        if series is None or not len(series):
+            return False
+        if candle.time < series.first_time or candle.time > series.last_time + series.base_seconds:
+            return False
+        series.merge(to_columns([candle]))
+        series.fetched_at = time.time()
+        return True
+
+    async def _refresh_series(
+        self,
+        provider: MarketDataProvider,
+        exchange: str,
+        symbol: str,
+        base_timeframe: str,
+        base_seconds: int,
+        need: int,
+    ) -> CandleSeries:
+        series = self.get_series(exchange, symbol, base_timeframe)
+        series.wanted = max(series.wanted, need)
+        key = (exchange.lower(), symbol.upper(), base_timeframe)
+        # Concurrent callers join the refresh already running for the series.
+        # A refresh fetches the deepest history wanted when it starts, so a
+        # caller that arrived later and needs more depth goes once more.
+        for _ in range(2):
+            if not (series.stale(time.time()) or (len(series) < need and not series.exhausted)):
+                break
+            await self.flights.do(
+                key, lambda: self._update_series(provider, series, exchange, symbol, base_timeframe)
             )
-            raw = await provider.get_ohlcv(symbol=symbol, timeframe=BASE_TIMEFRAME_STR, limit=raw_limit)
-            self.cache.set(cache_key, raw)
-
-        aggregated = self._aggregate(raw, tf_seconds, limit)
-        return aggregated
-
-    def _aggregate(self, candles: Sequence[OHLCV], bucket_seconds: int, limit: int) -> list[OHLCV]:
-        aggregated: List[OHLCV] = []
-        current_bucket_start = None
-        current = None
-
-        for candle in sorted(candles, key=lambda c: c.time):
-            bucket_start = (candle.time // bucket_seconds) * bucket_seconds
-
-            if current_bucket_start is None:
-                current_bucket_start = bucket_start
-                current = OHLCV(
-                    time=bucket_start,
-                    open=candle.open,
-                    high=candle.high,
-                    low=candle.low,
-                    close=candle.close,
-                    volume=candle.volume,
-                )
-                continue
+        return series
+
+    async def _update_series(
+        self,
+        provider: MarketDataProvider,
+        series: CandleSeries,
+        exchange: str,
+        symbol: str,
+        base_timeframe: str,
+    ) -> None:
+        need = series.wanted
+        now = time.time()
+        if series.stale(now):
+            missing = series.missing_bars(now)
+            if not len(series) or missing >= need:
+                # Cold, or so far behind that the gap is all we would keep
+                if len(series):
+                    series.reset()
+                log.debug("Series fill %s %s %s x %s", exchange, symbol, base_timeframe, need)
+                fresh = await provider.get_ohlcv_paged(symbol=symbol, timeframe=base_timeframe, limit=need)
+                series.exhausted = len(fresh) < need
+            else:
+                log.debug("Series update %s %s %s +%s", exchange, symbol, base_timeframe, missing)
+                fresh = await provider.get_ohlcv_paged(symbol=symbol, timeframe=base_timeframe, limit=missing)
+            series.fetched_at = now
+            if fresh:
+                series.merge(to_columns(fresh))
+
+        if len(series) < need and not series.exhausted:
+            want = need - len(series)
+            log.debug("Series backfill %s %s %s x %s", exchange, symbol, base_timeframe, want)
+            older = await provider.get_ohlcv_paged(
+                symbol=symbol, timeframe=base_timeframe, limit=want, end=series.first_time - 1
+            )
+            series.exhausted = len(older) < want
+            if older:
+                series.merge(to_columns(older))
 
-            if bucket_start != current_bucket_start:
-                aggregated.append(current)
-                current_bucket_start = bucket_start
-                current = OHLCV(
-                    time=bucket_start,
-                    open=candle.open,
-                    high=candle.high,
-                    low=candle.low,
-                    close=candle.close,
-                    volume=candle.volume,
-                )
+    @staticmethod
+    def _base_timeframe(
+        provider: MarketDataProvider, tf_seconds: int, allow_same: bool = True, limit: int = 500
+    ) -> tuple[str, int]:
+        """
+        The native timeframe of ``provider`` to resample ``tf_seconds`` from:
+        the finest divisor for which ``limit`` buckets fit in
+        ``MAX_BASE_CANDLES``, else the coarsest divisor.
+        """
+        divisors: list[tuple[int, str]] = []
+        for name in provider.native_timeframes:
+            try:
+                seconds = timeframe_to_seconds(name)
+            except ValueError:
+                continue
+            if tf_seconds % seconds or (seconds == tf_seconds and not allow_same):
                 continue
+            divisors.append((seconds, name))
+        if not divisors:
+            finest = min(provider.native_timeframes, key=timeframe_to_seconds, default="1m")
+            raise ValueError(f"Timeframe of {tf_seconds}s is not a multiple of {finest}")
+        divisors.sort()
+        for seconds, name in divisors:
+            if (limit + 1) * (tf_seconds // seconds) <= MAX_BASE_CANDLES:
+                return name, seconds
+        seconds, name = divisors[-1]
+        return name, seconds
+
+    def _aggregate(
+        self,
+        candles: Sequence[OHLCV] | Columns,
+        bucket_seconds: int,
+        limit: int,
+        base_seconds: int = BASE_TIMEFRAME_SECONDS,
+        include_partial: bool = True,
+        now: float | None = None,
+    ) -> CandleFrame:
+        cols = candles if isinstance(candles, dict) else to_columns(candles)
+        cols = resample(cols, bucket_seconds, base_seconds, now)
+        # Leading bucket with missing data is dropped; the forming one only on request
+        keep = cols["complete"]
+        if include_partial and len(keep):
+            keep[-1] = True
+        return CandleFrame.from_columns(tail({name: cols[name][keep] for name in COLUMNS}, limit))
 
-            current.high = max(current.high, candle.high)
-            current.low = min(current.low, candle.low)
-            current.close = candle.close
-            current.volume += candle.volume
 
-        if current is not None:
-            aggregated.append(current)
+_shared_service: MarketDataService | None = None
 
-        if len(aggregated) > limit:
-            aggregated = aggregated[-limit:]
 
-        return aggregated
+def get_market_data_service() -> MarketDataService:
+    """The process-wide MarketDataService; share it so its series and cache are reused."""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = MarketDataService()
+    return _shared_service
@@ -0,0 +1,48 @@
+"""
+In-flight request deduplication.
+
+``SingleFlight.do(key, fn)`` runs ``fn()`` once per key at a time: callers
+that arrive while a call for the same key is running await that call's
+result instead of starting their own. The shared call runs as its own task,
+so a caller that is cancelled does not cancel it for the others.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is not None and not task.done():
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._finished(key, t))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here, so a failure nobody awaited is not logged as lost
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.calls + self.coalesced
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,395 @@
+"""
+Live kline streaming from exchange websockets.
+
+``MarketDataHub`` keeps one websocket per exchange and subscribes each
+(symbol, timeframe) topic once, however many consumers want it. Every kline
+push updates a bounded buffer of recent candles, is fanned out to the
+subscribed queues (``/ws/candles`` clients), and is merged into the
+``MarketDataService`` base series so REST refreshes are only needed to fill
+gaps (after a reconnect, or for history deeper than the stream has seen).
+Topics the service watches for its series are dropped again once nobody
+has asked for that series for ``watch_idle_seconds``.
+
+The transport is pluggable: ``connect(url)`` returns an object with async
+``send(text)``, ``recv() -> text`` and ``close()``. The default uses the
+optional ``websockets`` package; tests pass an in-process stub.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from web.bybit_client import BASE_URL as BYBIT_REST_URL
+
+from .kline_downloader import map_bybit_interval
+from .models import OHLCV
+
+log = logging.getLogger(__name__)
+
+
+def bybit_ws_url(rest_url: str) -> str:
+    """The public linear kline stream on the same network (testnet or mainnet) as ``rest_url``."""
+    host = "stream-testnet.bybit.com" if "testnet" in rest_url else "stream.bybit.com"
+    return f"wss://{host}/v5/public/linear"
+
+
+# Streamed bars are merged into series filled over REST, so both must be the same network
+BYBIT_WS_URL = os.getenv("BYBIT_WS_URL") or bybit_ws_url(BYBIT_REST_URL)
+BINANCE_WS_URL = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443/ws")
+# Recent candles kept per (exchange, symbol, timeframe)
+DEFAULT_CAPACITY = int(os.getenv("MARKET_DATA_STREAM_CAPACITY", "1000"))
+# Updates queued per subscriber before the oldest are dropped
+QUEUE_SIZE = 256
+# Watched topics not watched again for this long are unsubscribed
+WATCH_IDLE_SECONDS = float(os.getenv("MARKET_DATA_STREAM_WATCH_IDLE_SECONDS", "900"))
+PING_INTERVAL = 20.0
+MAX_BACKOFF = 30.0
+
+Key = Tuple[str, str, str]
+KlineEvent = Tuple[str, str, OHLCV, bool]  # symbol, timeframe, candle, closed
+
+
+class KlineFeed:
+    """Exchange specifics: topic names, (un)subscribe and ping frames, message parsing."""
+
+    url: str = ""
+    timeframes: frozenset = frozenset()
+
+    def topic(self, symbol: str, timeframe: str) -> str:
+        raise NotImplementedError
+
+    def subscribe_message(self, topics: List[str], subscribe: bool = True) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def ping_message(self) -> Optional[Dict[str, Any]]:
+        return None
+
+    def parse(self, message: Dict[str, Any]) -> List[KlineEvent]:
+        raise NotImplementedError
+
+
+class BybitKlineFeed(KlineFeed):
+    timeframes = frozenset({"1m", "3m", "5m", "15m", "30m", "1h", "2h", "4h", "6h", "12h", "1d"})
+
+    def __init__(self, url: str = BYBIT_WS_URL) -> None:
+        self.url = url
+        self._timeframe_of = {map_bybit_interval(tf): tf for tf in self.timeframes}
+
+    def topic(self, symbol: str, timeframe: str) -> str:
+        return f"kline.{map_bybit_interval(timeframe)}.{symbol.upper()}"
+
+    def subscribe_message(self, topics: List[str], subscribe: bool = True) -> Dict[str, Any]:
+        return {"op": "subscribe" if subscribe else "unsubscribe", "args": topics}
+
+    def ping_message(self) -> Optional[Dict[str, Any]]:
+        return {"op": "ping"}
+
+    def parse(self, message: Dict[str, Any]) -> List[KlineEvent]:
+        topic = message.get("topic") or ""
+        if not topic.startswith("kline."):
+            return []
+        _, interval, symbol = topic.split(".", 2)
+        timeframe = self._timeframe_of.get(interval)
+        if timeframe is None:
+            return []
+        return [
+            (
+                symbol,
+                timeframe,
+                OHLCV(
+                    time=int(k["start"]) // 1000,
+                    open=float(k["open"]),
+                    high=float(k["high"]),
+                    low=float(k["low"]),
+                    close=float(k["close"]),
+                    volume=float(k.get("volume", 0.0)),
+                ),
+                bool(k.get("confirm")),
+            )
+            for k in message.get("data") or []
+        ]
+
+
+class BinanceKlineFeed(KlineFeed):
+    timeframes = frozenset({"1m", "3m", "5m", "15m", "30m", "1h", "2h", "4h", "6h", "8h", "12h", "1d", "3d", "1w"})
+
+    def __init__(self, url: str = BINANCE_WS_URL) -> None:
+        self.url = url
+        self._ids = 0
+
+    def topic(self, symbol: str, timeframe: str) -> str:
+        return f"{symbol.lower()}@kline_{timeframe}"
+
+    def subscribe_message(self, topics: List[str], subscribe: bool = True) -> Dict[str, Any]:
+        self._ids += 1
+        return {"method": "SUBSCRIBE" if subscribe else "UNSUBSCRIBE", "params": topics, "id": self._ids}
+
+    def parse(self, message: Dict[str, Any]) -> List[KlineEvent]:
+        if message.get("e") != "kline":
+            return []
+        k = message["k"]
+        candle = OHLCV(
+            time=int(k["t"]) // 1000,
+            open=float(k["o"]),
+            high=float(k["h"]),
+            low=float(k["l"]),
+            close=float(k["c"]),
+            volume=float(k.get("v", 0.0)),
+        )
+        return [(str(message.get("s") or k["s"]).upper(), k["i"], candle, bool(k.get("x")))]
+
+
+async def websocket_connect(url: str) -> Any:
+    try:
+        import websockets
+    except ModuleNotFoundError as e:
+        raise RuntimeError("market data streaming needs the 'websockets' package") from e
+    # Exchange-level pings are sent by the hub
+    return await websockets.connect(url, ping_interval=None, max_queue=1024)
+
+
+@dataclass(eq=False)
+class Subscription:
+    key: Key
+    queue: "asyncio.Queue[Dict[str, Any]]" = field(default_factory=lambda: asyncio.Queue(QUEUE_SIZE))
+    dropped: int = 0
+
+
+class MarketDataHub:
+    def __init__(
+        self,
+        feeds: Optional[Dict[str, KlineFeed]] = None,
+        connect: Callable[[str], Awaitable[Any]] = websocket_connect,
+        service: Any = None,
+        capacity: int = DEFAULT_CAPACITY,
+        watch_idle_seconds: float = WATCH_IDLE_SECONDS,
+    ) -> None:
+        self.feeds = feeds if feeds is not None else {"bybit": BybitKlineFeed(), "binance": BinanceKlineFeed()}
+        self._connect = connect
+        self.service = service
+        self.capacity = capacity
+        self.watch_idle_seconds = watch_idle_seconds
+        self._buffers: Dict[Key, Deque[OHLCV]] = {}
+        self._subscribers: Dict[Key, Set[Subscription]] = {}
+        # Topics kept subscribed without a client (series of the MarketDataService),
+        # with the last time each was watched
+        self._watched: Dict[Key, float] = {}
+        self._conns: Dict[str, Any] = {}
+        self._runners: Dict[str, asyncio.Task] = {}
+        self._pending: Set[asyncio.Task] = set()
+        self._closed = False
+        self.messages = 0
+        self.updates = 0
+        self.reconnects = 0
+
+    # ---------- consumers ----------
+    def supports(self, exchange: str, timeframe: str) -> bool:
+        feed = self.feeds.get(exchange.lower())
+        return feed is not None and timeframe in feed.timeframes
+
+    def subscribe(self, exchange: str, symbol: str, timeframe: str) -> Subscription:
+        """A queue of kline updates for the topic; subscribes upstream on first use."""
+        key = self._key(exchange, symbol, timeframe)
+        sub = Subscription(key)
+        self._subscribers.setdefault(key, set()).add(sub)
+        self._activate(key)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subscribers.get(sub.key)
+        if subs is None:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self._subscribers[sub.key]
+            if sub.key not in self._watched:
+                self._deactivate(sub.key)
+
+    def watch(self, exchange: str, symbol: str, timeframe: str) -> None:
+        """
+        Keep the topic streaming into the buffer and service with no client
+        attached, until it has not been watched for ``watch_idle_seconds``.
+        """
+        key = self._key(exchange, symbol, timeframe)
+        now = time.time()
+        self._expire_watches(now)
+        new = key not in self._watched
+        self._watched[key] = now
+        if new:
+            self._activate(key)
+
+    def recent(self, exchange: str, symbol: str, timeframe: str, limit: Optional[int] = None) -> List[OHLCV]:
+        buf = self._buffers.get(self._key(exchange, symbol, timeframe))
+        if not buf:
+            return []
+        candles = list(buf)
+        return candles[-limit:] if limit else candles
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": sorted(self._conns),
+            "topics": len(self._topics_all()),
+            "watched": len(self._watched),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "messages": self.messages,
+            "updates": self.updates,
+            "reconnects": self.reconnects,
+            "dropped": sum(sub.dropped for subs in self._subscribers.values() for sub in subs),
+        }
+
+    async def stop(self) -> None:
+        self._closed = True
+        tasks = list(self._runners.values()) + list(self._pending)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._runners.clear()
+
+    # ---------- internals ----------
+    def _key(self, exchange: str, symbol: str, timeframe: str) -> Key:
+        exchange = exchange.lower()
+        if not self.supports(exchange, timeframe):
+            raise ValueError(f"No kline stream for {exchange} {timeframe}")
+        return exchange, symbol.upper(), timeframe
+
+    def _topics_all(self) -> Set[Key]:
+        return set(self._subscribers) | set(self._watched)
+
+    def _expire_watches(self, now: float) -> None:
+        idle = [k for k, at in self._watched.items() if now - at >= self.watch_idle_seconds]
+        for key in idle:
+            del self._watched[key]
+            if key not in self._subscribers:
+                self._deactivate(key)
+
+    def _deactivate(self, key: Key) -> None:
+        self._buffers.pop(key, None)
+        self._send_topics(key[0], [key], subscribe=False)
+
+    def _activate(self, key: Key) -> None:
+        exchange = key[0]
+        runner = self._runners.get(exchange)
+        if runner is None or runner.done():
+            self._closed = False
+            # The runner subscribes every active topic when it connects
+            self._runners[exchange] = asyncio.ensure_future(self._run(exchange))
+        else:
+            self._send_topics(exchange, [key], subscribe=True)
+
+    def _send_topics(self, exchange: str, keys: Iterable[Key], subscribe: bool) -> None:
+        conn = self._conns.get(exchange)
+        if conn is None:
+            return  # sent on (re)connect
+        feed = self.feeds[exchange]
+        message = feed.subscribe_message([feed.topic(k[1], k[2]) for k in keys], subscribe)
+        task = asyncio.ensure_future(conn.send(json.dumps(message)))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _run(self, exchange: str) -> None:
+        feed = self.feeds[exchange]
+        delay = 1.0
+        while not self._closed:
+            try:
+                conn = await self._connect(feed.url)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("Kline stream connect to %s failed: %s", exchange, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_BACKOFF)
+                continue
+            self._conns[exchange] = conn
+            recv: Optional[asyncio.Future] = None
+            try:
+                keys = [k for k in self._topics_all() if k[0] == exchange]
+                if keys:
+                    message = feed.subscribe_message([feed.topic(k[1], k[2]) for k in keys])
+                    await conn.send(json.dumps(message))
+                delay = 1.0
+                while True:
+                    # One pending recv across ping timeouts (wait_for would cancel
+                    # it, and can swallow our own cancellation on 3.11)
+                    if recv is None:
+                        recv = asyncio.ensure_future(conn.recv())
+                    done, _ = await asyncio.wait({recv}, timeout=PING_INTERVAL)
+                    if not done:
+                        self._expire_watches(time.time())
+                        ping = feed.ping_message()
+                        if ping is not None:
+                            await conn.send(json.dumps(ping))
+                        continue
+                    raw, recv = recv.result(), None
+                    self._handle(exchange, feed, raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("Kline stream %s dropped: %s", exchange, e)
+                self.reconnects += 1
+            finally:
+                if recv is not None:
+                    recv.cancel()
+                self._conns.pop(exchange, None)
+                try:
+                    await conn.close()
+                except Exception:
+                    pass
+            if not self._closed:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_BACKOFF)
+
+    def _handle(self, exchange: str, feed: KlineFeed, raw: Any) -> None:
+        self.messages += 1
+        try:
+            message = json.loads(raw)
+            events = feed.parse(message) if isinstance(message, dict) else []
+        except (ValueError, KeyError, TypeError) as e:
+            log.warning("Bad kline message from %s: %s", exchange, e)
+            return
+        for symbol, timeframe, candle, closed in events:
+            self._publish((exchange, symbol.upper(), timeframe), candle, closed)
+
+    def _publish(self, key: Key, candle: OHLCV, closed: bool) -> None:
+        self.updates += 1
+        buf = self._buffers.get(key)
+        if buf is None:
+            buf = self._buffers[key] = deque(maxlen=self.capacity)
+        if buf and buf[-1].time == candle.time:
+            buf[-1] = candle
+        elif not buf or buf[-1].time < candle.time:
+            buf.append(candle)
+        else:
+            return  # late update for an older bar
+
+        if self.service is not None:
+            self.service.ingest(*key, candle)
+
+        event = {
+            "type": "kline",
+            "exchange": key[0],
+            "symbol": key[1],
+            "timeframe": key[2],
+            "closed": closed,
+            "candle": {
+                "time": candle.time,
+                "open": candle.open,
+                "high": candle.high,
+                "low": candle.low,
+                "close": candle.close,
+                "volume": candle.volume,
+            },
+            "ts": time.time(),
+        }
+        for sub in self._subscribers.get(key, ()):
+            if sub.queue.full():
+                # A slow client loses its oldest updates, not everyone else's
+                sub.queue.get_nowait()
+                sub.dropped += 1
+            sub.queue.put_nowait(event)
@@ -0,0 +1,228 @@
+"""
+Batch feature extraction for AdvancedMLStrategy.
+
+``feature_matrix`` returns one row per sliding window of ``window`` candles,
+numerically equivalent to calling ``AdvancedMLStrategy.extract_features`` on
+each window in turn. Windows are strided views of the columns and every
+feature is a row-wise reduction over them, processed in blocks so memory
+stays flat on long histories. The EMA-based features (MACD histogram,
+Keltner mid-line) are seeded at the start of each window, which makes them a
+fixed linear combination of the window's closes; those weights are computed
+once per window length.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Mapping
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from core.indicators import kernels
+
+N_FEATURES = 32
+MIN_WINDOW = 50
+BLOCK_ROWS = 4096
+
+
+@lru_cache(maxsize=8)
+def _last_value_weights(kind: str, window: int) -> np.ndarray:
+    # response of the last bar to a unit close at each position of the window
+    basis = np.eye(window)
+    if kind == "macd":
+        w = [kernels.macd(row)[2][-1] for row in basis]
+    elif kind == "ema20":
+        w = [kernels.ema(row, 20)[-1] for row in basis]
+    else:
+        raise ValueError(kind)
+    return np.asarray(w)
+
+
+def _last_peaks(mask: np.ndarray) -> tuple:
+    """Column index of the last and second-to-last True per row (-1 if absent)."""
+    idx = np.arange(mask.shape[1])
+    last = np.where(mask, idx, -1).max(axis=1)
+    prev = np.where(mask & (idx < last[:, None]), idx, -1).max(axis=1)
+    return last, prev
+
+
+def _double_extreme(x: np.ndarray, tops: bool) -> np.ndarray:
+    recent = x[:, -20:]
+    inner = recent[:, 1:-1]
+    if tops:
+        mask = (inner > recent[:, :-2]) & (inner > recent[:, 2:])
+    else:
+        mask = (inner < recent[:, :-2]) & (inner < recent[:, 2:])
+    last, prev = _last_peaks(mask)
+    rows = np.arange(x.shape[0])
+    p2 = inner[rows, last]
+    p1 = inner[rows, prev]
+    return np.where((prev >= 0) & (np.abs(p1 - p2) / p1 < 0.02), 1.0, 0.0)
+
+
+def _block(C: np.ndarray, H: np.ndarray, L: np.ndarray, V: np.ndarray) -> np.ndarray:
+    m, w = C.shape
+    out = np.empty((m, N_FEATURES))
+    close = C[:, -1]
+    d = np.diff(C, axis=1)
+    prev_close = C[:, :-1]
+    returns = d / prev_close
+    tr = np.maximum(H[:, 1:] - L[:, 1:], np.maximum(np.abs(H[:, 1:] - prev_close), np.abs(L[:, 1:] - prev_close)))
+    atr14 = tr[:, -14:].mean(axis=1)
+    tp = (H + L + C) / 3
+
+    # RSI
+    ag = np.where(d > 0, d, 0.0)[:, -14:].mean(axis=1)
+    al = np.where(d < 0, -d, 0.0)[:, -14:].mean(axis=1)
+    out[:, 0] = np.where(al == 0, np.where(ag > 0, 100.0, 50.0), 100 - 100 / (1 + ag / al))
+    # MACD histogram
+    out[:, 1] = C @ _last_value_weights("macd", w)
+    # Bollinger position
+    last20 = C[:, -20:]
+    mid, std = last20.mean(axis=1), last20.std(axis=1)
+    upper, lower = mid + 2 * std, mid - 2 * std
+    out[:, 2] = np.where(upper == lower, 0.5, (close - lower) / (upper - lower))
+    # Stochastic %K / Williams %R
+    hh, ll = H[:, -14:].max(axis=1), L[:, -14:].min(axis=1)
+    rng = hh - ll
+    out[:, 3] = np.where(rng == 0, 50.0, (close - ll) / rng * 100.0)
+    out[:, 9] = np.where(rng == 0, -50.0, (hh - close) / rng * -100.0)
+    # ATR
+    out[:, 4] = atr14
+    # OBV trend
+    ob = np.cumsum(np.sign(d) * V[:, 1:], axis=1)
+    out[:, 5] = (ob[:, -1] - ob.mean(axis=1)) / (ob.std(axis=1) + 1e-10)
+    # VWAP deviation
+    vwap = (tp * V).sum(axis=1) / V.sum(axis=1)
+    out[:, 6] = np.where(vwap == 0, 0.0, (close - vwap) / vwap * 100)
+    # Momentum / ROC
+    out[:, 7] = (close / C[:, -11] - 1) * 100
+    out[:, 8] = ((close - C[:, -13]) / C[:, -13]) * 100
+
+    # Volume ratio
+    avg_v = V[:, -20:].mean(axis=1)
+    out[:, 10] = np.where(avg_v == 0, 1.0, V[:, -1] / avg_v)
+    # MFI
+    flow = tp * V
+    up = np.diff(tp, axis=1) > 0
+    pos = np.where(up, flow[:, 1:], 0.0)[:, -14:].sum(axis=1)
+    neg = np.where(up, 0.0, flow[:, 1:])[:, -14:].sum(axis=1)
+    out[:, 11] = np.where(neg == 0, 100.0, 100 - 100 / (1 + pos / neg))
+    # Accumulation / distribution
+    hl = H - L
+    mfm = np.where(hl != 0, ((C - L) - (H - C)) / np.where(hl != 0, hl, 1.0), 0.0)
+    out[:, 12] = (mfm * V).sum(axis=1) / (V.sum(axis=1) + 1e-10)
+    # Volume-weighted momentum
+    vwm = (C * V)[:, -10:].sum(axis=1) / V[:, -10:].sum(axis=1)
+    base = C[:, -10]
+    out[:, 13] = np.where(base == 0, 0.0, (vwm / base - 1) * 100)
+
+    # Volatility
+    out[:, 14] = returns[:, -20:].std(axis=1) * np.sqrt(365 * 96) * 100
+    # Keltner position
+    ema20 = C @ _last_value_weights("ema20", w)
+    atr20 = tr[:, -20:].mean(axis=1)
+    k_upper, k_lower = ema20 + 2 * atr20, ema20 - 2 * atr20
+    out[:, 15] = np.where(k_upper == k_lower, 0.5, (close - k_lower) / (k_upper - k_lower))
+    # Donchian position
+    d_upper, d_lower = H[:, -20:].max(axis=1), L[:, -20:].min(axis=1)
+    out[:, 16] = np.where(d_upper == d_lower, 0.5, (close - d_lower) / (d_upper - d_lower))
+    # ATR percent
+    out[:, 17] = np.where(close == 0, 0.0, atr14 / close * 100)
+
+    # Double top / bottom
+    out[:, 18] = _double_extreme(H, tops=True)
+    out[:, 19] = _double_extreme(L, tops=False)
+    # Head and shoulders
+    recent = C[:, -30:]
+    left, head, right = recent[:, :10].max(axis=1), recent[:, 10:20].max(axis=1), recent[:, 20:].max(axis=1)
+    out[:, 20] = np.where((head > left) & (head > right) & (np.abs(left - right) / left < 0.05), 1.0, 0.0)
+    # Triangle
+    rh, rl = H[:, -20:], L[:, -20:]
+    early = rh[:, :5].mean(axis=1) - rl[:, :5].mean(axis=1)
+    late = rh[:, -5:].mean(axis=1) - rl[:, -5:].mean(axis=1)
+    out[:, 21] = np.where((early > 0) & (late > 0), np.clip(1 - late / early, 0, 1), 0.0)
+    # Fractal dimension (box counting at 2 and 4 boxes)
+    mn, mx = recent.min(axis=1), recent.max(axis=1)
+    flat = mx == mn
+    norm = (recent - mn[:, None]) / np.where(flat, 1.0, mx - mn)[:, None]
+    boxes_2 = sum((np.floor(norm * 2) == k).any(axis=1) for k in range(3))
+    boxes_4 = sum((np.floor(norm * 4) == k).any(axis=1) for k in range(5))
+    fractal = np.where(boxes_4 > boxes_2, np.log(boxes_4 / np.maximum(boxes_2, 1)) / np.log(2), 1.5)
+    out[:, 22] = np.where(flat, 1.5, fractal)
+    # Hurst exponent over the last 100 closes
+    if w >= 100:
+        r100 = returns[:, -99:]
+        s = r100.std(axis=1)
+        cs = np.cumsum(r100 - r100.mean(axis=1)[:, None], axis=1)
+        rs = (cs.max(axis=1) - cs.min(axis=1)) / np.where(s == 0, 1.0, s)
+        out[:, 23] = np.where(s == 0, 0.5, np.clip(np.log(rs) / np.log(99 / 2), 0, 1))
+    else:
+        out[:, 23] = 0.5
+
+    # Market regime
+    n_pos, n_neg = (returns > 0).sum(axis=1), (returns < 0).sum(axis=1)
+    out[:, 24] = np.where((n_pos == 0) | (n_neg == 0), 1.0, np.abs(n_pos - n_neg) / returns.shape[1])
+    # Trend strength: least-squares slope over the last 20 closes
+    x = np.arange(20) - 9.5
+    out[:, 25] = (last20 @ x / (x @ x)) / last20.mean(axis=1) * 100
+    # Support / resistance distance
+    hi, lo = H[:, 10:-1], L[:, 10:-1]
+    peaks = (hi > H[:, 9:-2]) & (hi > H[:, 11:])
+    troughs = (lo < L[:, 9:-2]) & (lo < L[:, 11:])
+    res = np.where(peaks & (hi > close[:, None]), hi, np.inf).min(axis=1)
+    sup = np.where(troughs & (lo < close[:, None]), lo, -np.inf).max(axis=1)
+    res = np.where(np.isinf(res), close * 1.1, res)
+    sup = np.where(np.isinf(sup), close * 0.9, sup)
+    out[:, 26] = np.where(res != sup, (close - sup) / np.where(res != sup, res - sup, 1.0), 0.5)
+    # Pivot position
+    pivot = (H[:, -2] + L[:, -2] + C[:, -2]) / 3
+    out[:, 27] = (close - pivot) / pivot * 100
+
+    # Corwin-Schultz style spread proxy
+    e = np.exp(np.sqrt(2 * np.log(H[:, -20:] / L[:, -20:])))
+    out[:, 28] = (2 * (e - 1) / (1 + e)).mean(axis=1)
+    # Kyle's lambda
+    sv = V[:, 1:] * np.sign(returns)
+    sv_std = sv.std(axis=1)
+    n = returns.shape[1]
+    cov = ((returns - returns.mean(axis=1)[:, None]) * (sv - sv.mean(axis=1)[:, None])).sum(axis=1) / (n - 1)
+    out[:, 29] = np.where(sv_std == 0, 0.0, cov / np.where(sv_std == 0, 1.0, sv_std ** 2) * 1e6)
+    # Amihud illiquidity: mean of the last 20 bars with positive dollar volume
+    dv = C[:, 1:] * V[:, 1:]
+    valid = dv > 0
+    ratio = np.where(valid, np.abs(returns) / np.where(valid, dv, 1.0), 0.0)
+    from_end = np.cumsum(valid[:, ::-1], axis=1)[:, ::-1]
+    take = valid & (from_end <= 20)
+    count = take.sum(axis=1)
+    out[:, 30] = np.where(count > 0, np.where(take, ratio, 0.0).sum(axis=1) / np.maximum(count, 1) * 1e6, 0.0)
+    # Roll's implied spread
+    a, b = d[:, :-1], d[:, 1:]
+    roll_cov = ((a - a.mean(axis=1)[:, None]) * (b - b.mean(axis=1)[:, None])).sum(axis=1) / (a.shape[1] - 1)
+    spread = 2 * np.sqrt(np.where(roll_cov < 0, -roll_cov, 0.0)) / last20.mean(axis=1) * 100
+    out[:, 31] = np.where(roll_cov >= 0, 0.0, spread)
+    return out
+
+
+def feature_matrix(columns: Mapping[str, np.ndarray], window: int = 51, block_rows: int = BLOCK_ROWS) -> np.ndarray:
+    """
+    ``(n - window + 1, 32)`` features; row ``i`` describes candles ``[i, i + window)``.
+
+    ``columns`` needs ``close``, ``high``, ``low`` and ``volume`` arrays of
+    equal length.
+    """
+    window = int(window)
+    if window < MIN_WINDOW:
+        raise ValueError(f"window must be at least {MIN_WINDOW} candles")
+    C, H, L, V = (np.asarray(columns[k], dtype=np.float64) for k in ("close", "high", "low", "volume"))
+    rows = C.shape[0] - window + 1
+    if rows <= 0:
+        return np.empty((0, N_FEATURES))
+    views = [sliding_window_view(x, window) for x in (C, H, L, V)]
+    out = np.empty((rows, N_FEATURES))
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for start in range(0, rows, block_rows):
+            stop = min(rows, start + block_rows)
+            out[start:stop] = _block(*(v[start:stop] for v in views))
+    return out
@@ -0,0 +1,401 @@
+"""
+Incremental feature state for live ML inference.
+
+A ``FeatureStream`` holds the last ``window`` candles of one (symbol,
+timeframe) plus running sums and monotonic min/max queues for the rolling
+parts of the 32 AdvancedMLStrategy features, so a closed candle costs O(1)
+updates and one pass over small Python lists instead of a refetch and a full
+recompute. Rows match ``feature_matrix`` (and so ``extract_features`` on the
+same window) within floating-point noise; the EMA features are seeded at the
+window start like in training, which makes them a dot product with fixed
+weights.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .feature_matrix import MIN_WINDOW, N_FEATURES, _last_value_weights
+
+
+def _bar(candle: Any) -> Tuple[Any, float, float, float, float]:
+    if isinstance(candle, Mapping):
+        get = candle.get
+    else:
+        def get(name: str, default: Any = None) -> Any:
+            return getattr(candle, name, default)
+    ts = get("time", get("ts", get("timestamp")))
+    return ts, float(get("close") or 0.0), float(get("high") or 0.0), float(get("low") or 0.0), float(get("volume") or 0.0)
+
+
+def _div(a: float, b: float) -> float:
+    # numpy semantics for the degenerate windows the batch path produces
+    if b == 0:
+        return math.nan if a == 0 or math.isnan(a) else math.copysign(math.inf, a)
+    return a / b
+
+
+def _mean(xs: Sequence[float]) -> float:
+    return sum(xs) / len(xs)
+
+
+def _std(xs: Sequence[float]) -> float:
+    m = _mean(xs)
+    return math.sqrt(sum((x - m) * (x - m) for x in xs) / len(xs))
+
+
+def _cov(a: Sequence[float], b: Sequence[float]) -> float:
+    ma, mb = _mean(a), _mean(b)
+    return sum((x - ma) * (y - mb) for x, y in zip(a, b)) / (len(a) - 1)
+
+
+def _sign(x: float) -> float:
+    return (x > 0) - (x < 0)
+
+
+class _RunningSum:
+    """Sum of the last ``n`` values; reads exactly 0 when they all are."""
+
+    __slots__ = ("n", "items", "total", "nonzero", "_pushes")
+
+    def __init__(self, n: int) -> None:
+        self.n = n
+        self.items: Deque[float] = deque()
+        self.total = 0.0
+        self.nonzero = 0
+        self._pushes = 0
+
+    def push(self, x: float) -> None:
+        self.items.append(x)
+        self.total += x
+        self.nonzero += x != 0
+        if len(self.items) > self.n:
+            old = self.items.popleft()
+            self.total -= old
+            self.nonzero -= old != 0
+        self._pushes += 1
+        if self._pushes >= self.n:
+            # bound the drift of adding and subtracting
+            self.total = sum(self.items)
+            self._pushes = 0
+
+    @property
+    def sum(self) -> float:
+        return self.total if self.nonzero else 0.0
+
+
+class _RollingExtreme:
+    """Max (or min) of the last ``n`` values via a monotonic deque."""
+
+    __slots__ = ("n", "sign", "q", "i")
+
+    def __init__(self, n: int, maximum: bool) -> None:
+        self.n = n
+        self.sign = 1.0 if maximum else -1.0
+        self.q: Deque[Tuple[int, float]] = deque()
+        self.i = 0
+
+    def push(self, x: float) -> None:
+        key = self.sign * x
+        while self.q and self.sign * self.q[-1][1] <= key:
+            self.q.pop()
+        self.q.append((self.i, x))
+        if self.q[0][0] <= self.i - self.n:
+            self.q.popleft()
+        self.i += 1
+
+    @property
+    def value(self) -> float:
+        return self.q[0][1]
+
+
+def _double_extreme(recent: List[float], tops: bool) -> float:
+    peaks = []
+    for i in range(1, len(recent) - 1):
+        a, b, c = recent[i - 1], recent[i], recent[i + 1]
+        if (b > a and b > c) if tops else (b < a and b < c):
+            peaks.append(b)
+    if len(peaks) >= 2:
+        p1, p2 = peaks[-2], peaks[-1]
+        if _div(abs(p1 - p2), p1) < 0.02:
+            return 1.0
+    return 0.0
+
+
+class FeatureStream:
+    """
+    Rolling feature state over the last ``window`` candles of one series.
+
+    ``update`` takes candles in time order: a newer candle is appended in
+    O(1), one with the same time as the last replaces it (the bar is still
+    forming) and rebuilds the state from the buffered window, older ones are
+    ignored. ``latest`` is the feature row for the current window once
+    ``window`` candles have been seen.
+    """
+
+    def __init__(self, window: int = 51) -> None:
+        window = int(window)
+        if window < MIN_WINDOW:
+            raise ValueError(f"window must be at least {MIN_WINDOW} candles")
+        self.window = window
+        self._w_macd = _last_value_weights("macd", window).tolist()
+        self._w_ema20 = _last_value_weights("ema20", window).tolist()
+        self.reset()
+
+    def reset(self) -> None:
+        w = self.window
+        self.last_time: Any = None
+        self._latest: Optional[np.ndarray] = None
+        # raw bars
+        self.closes: Deque[float] = deque(maxlen=w)
+        self.highs: Deque[float] = deque(maxlen=w)
+        self.lows: Deque[float] = deque(maxlen=w)
+        self.volumes: Deque[float] = deque(maxlen=w)
+        self.times: Deque[Any] = deque(maxlen=w)
+        # per-bar values that need the previous bar (bars 1..w-1 of the window)
+        self.deltas: Deque[float] = deque(maxlen=w - 1)
+        self.returns: Deque[float] = deque(maxlen=w - 1)
+        self.signed_volumes: Deque[float] = deque(maxlen=w - 1)
+        # running aggregates
+        self.gains14, self.losses14 = _RunningSum(14), _RunningSum(14)
+        self.tr14, self.tr20 = _RunningSum(14), _RunningSum(20)
+        self.mf_pos14, self.mf_neg14 = _RunningSum(14), _RunningSum(14)
+        self.up_returns, self.down_returns = _RunningSum(w - 1), _RunningSum(w - 1)
+        self.tpv, self.vol = _RunningSum(w), _RunningSum(w)
+        self.ad = _RunningSum(w)
+        self.vol20, self.spread20 = _RunningSum(20), _RunningSum(20)
+        self.cv10, self.vol10 = _RunningSum(10), _RunningSum(10)
+        self.high14, self.low14 = _RollingExtreme(14, True), _RollingExtreme(14, False)
+        self.high20, self.low20 = _RollingExtreme(20, True), _RollingExtreme(20, False)
+
+    @property
+    def ready(self) -> bool:
+        return len(self.closes) == self.window
+
+    @property
+    def latest(self) -> Optional[np.ndarray]:
+        return self._latest
+
+    def seed(self, candles: Sequence[Any]) -> Optional[np.ndarray]:
+        """Start over from ``candles`` (only the last ``window`` matter)."""
+        self.reset()
+        for candle in candles[-self.window:]:
+            self._push(*_bar(candle))
+        self._latest = self._compute() if self.ready else None
+        return self._latest
+
+    def update(self, candle: Any) -> Optional[np.ndarray]:
+        ts, c, h, lo, v = _bar(candle)
+        if self.last_time is not None and ts is not None:
+            if ts < self.last_time:
+                return self._latest
+            if ts == self.last_time:
+                if (c, h, lo, v) == (self.closes[-1], self.highs[-1], self.lows[-1], self.volumes[-1]):
+                    return self._latest
+                bars = list(zip(self.times, self.closes, self.highs, self.lows, self.volumes))
+                bars[-1] = (ts, c, h, lo, v)
+                self.reset()
+                for bar in bars:
+                    self._push(*bar)
+                self._latest = self._compute() if self.ready else None
+                return self._latest
+        self._push(ts, c, h, lo, v)
+        self._latest = self._compute() if self.ready else None
+        return self._latest
+
+    def _push(self, ts: Any, c: float, h: float, lo: float, v: float) -> None:
+        tp = (h + lo + c) / 3
+        if self.closes:
+            pc = self.closes[-1]
+            ptp = (self.highs[-1] + self.lows[-1] + pc) / 3
+            d = c - pc
+            r = _div(d, pc)
+            self.deltas.append(d)
+            self.returns.append(r)
+            self.signed_volumes.append(_sign(d) * v)
+            self.gains14.push(d if d > 0 else 0.0)
+            self.losses14.push(-d if d < 0 else 0.0)
+            tr = max(h - lo, max(abs(h - pc), abs(lo - pc)))
+            self.tr14.push(tr)
+            self.tr20.push(tr)
+            flow = tp * v
+            up = tp > ptp
+            self.mf_pos14.push(flow if up else 0.0)
+            self.mf_neg14.push(0.0 if up else flow)
+            self.up_returns.push(1.0 if r > 0 else 0.0)
+            self.down_returns.push(1.0 if r < 0 else 0.0)
+        self.closes.append(c)
+        self.highs.append(h)
+        self.lows.append(lo)
+        self.volumes.append(v)
+        self.times.append(ts)
+        self.last_time = ts
+        hl = h - lo
+        mfm = ((c - lo) - (h - c)) / hl if hl != 0 else 0.0
+        self.tpv.push(tp * v)
+        self.vol.push(v)
+        self.ad.push(mfm * v)
+        self.vol20.push(v)
+        self.vol10.push(v)
+        self.cv10.push(c * v)
+        e = math.exp(math.sqrt(2 * math.log(h / lo))) if h > 0 and lo > 0 and h >= lo else math.nan
+        self.spread20.push(2 * (e - 1) / (1 + e))
+        self.high14.push(h)
+        self.low14.push(lo)
+        self.high20.push(h)
+        self.low20.push(lo)
+
+    def _compute(self) -> np.ndarray:
+        C, H, L = list(self.closes), list(self.highs), list(self.lows)
+        close = C[-1]
+        out = [0.0] * N_FEATURES
+
+        ag, al = self.gains14.sum / 14, self.losses14.sum / 14
+        out[0] = (100.0 if ag > 0 else 50.0) if al == 0 else 100 - 100 / (1 + ag / al)
+        out[1] = sum(w * c for w, c in zip(self._w_macd, C))
+        last20 = C[-20:]
+        mid, std = _mean(last20), _std(last20)
+        upper, lower = mid + 2 * std, mid - 2 * std
+        out[2] = 0.5 if upper == lower else _div(close - lower, upper - lower)
+        hh, ll = self.high14.value, self.low14.value
+        rng = hh - ll
+        out[3] = 50.0 if rng == 0 else (close - ll) / rng * 100.0
+        atr14 = self.tr14.sum / 14
+        out[4] = atr14
+        ob: List[float] = []
+        acc = 0.0
+        for sv in self.signed_volumes:
+            acc += sv
+            ob.append(acc)
+        out[5] = (ob[-1] - _mean(ob)) / (_std(ob) + 1e-10)
+        vwap = _div(self.tpv.sum, self.vol.sum)
+        out[6] = 0.0 if vwap == 0 else _div(close - vwap, vwap) * 100
+        out[7] = (_div(close, C[-11]) - 1) * 100
+        out[8] = _div(close - C[-13], C[-13]) * 100
+        out[9] = -50.0 if rng == 0 else (hh - close) / rng * -100.0
+
+        avg_v = self.vol20.sum / 20
+        out[10] = 1.0 if avg_v == 0 else self.volumes[-1] / avg_v
+        pos, neg = self.mf_pos14.sum, self.mf_neg14.sum
+        out[11] = 100.0 if neg == 0 else 100 - 100 / (1 + pos / neg)
+        out[12] = self.ad.sum / (self.vol.sum + 1e-10)
+        vwm = _div(self.cv10.sum, self.vol10.sum)
+        base = C[-10]
+        out[13] = 0.0 if base == 0 else (vwm / base - 1) * 100
+
+        returns = list(self.returns)
+        out[14] = _std(returns[-20:]) * math.sqrt(365 * 96) * 100
+        ema20 = sum(w * c for w, c in zip(self._w_ema20, C))
+        atr20 = self.tr20.sum / 20
+        k_upper, k_lower = ema20 + 2 * atr20, ema20 - 2 * atr20
+        out[15] = 0.5 if k_upper == k_lower else (close - k_lower) / (k_upper - k_lower)
+        d_upper, d_lower = self.high20.value, self.low20.value
+        out[16] = 0.5 if d_upper == d_lower else (close - d_lower) / (d_upper - d_lower)
+        out[17] = 0.0 if close == 0 else atr14 / close * 100
+
+        out[18] = _double_extreme(H[-20:], tops=True)
+        out[19] = _double_extreme(L[-20:], tops=False)
+        recent = C[-30:]
+        left, head, right = max(recent[:10]), max(recent[10:20]), max(recent[20:])
+        out[20] = 1.0 if head > left and head > right and _div(abs(left - right), left) < 0.05 else 0.0
+        rh, rl = H[-20:], L[-20:]
+        early = _mean(rh[:5]) - _mean(rl[:5])
+        late = _mean(rh[-5:]) - _mean(rl[-5:])
+        out[21] = max(0.0, min(1.0, 1 - late / early)) if early > 0 and late > 0 else 0.0
+        mn, mx = min(recent), max(recent)
+        if mx == mn:
+            out[22] = 1.5
+        else:
+            boxes_2 = len({math.floor((p - mn) / (mx - mn) * 2) for p in recent})
+            boxes_4 = len({math.floor((p - mn) / (mx - mn) * 4) for p in recent})
+            out[22] = math.log(boxes_4 / boxes_2) / math.log(2) if boxes_4 > boxes_2 else 1.5
+        out[23] = 0.5
+        if self.window >= 100:
+            r100 = returns[-99:]
+            s = _std(r100)
+            if s != 0:
+                m = _mean(r100)
+                acc, lo_cs, hi_cs = 0.0, math.inf, -math.inf
+                for r in r100:
+                    acc += r - m
+                    lo_cs, hi_cs = min(lo_cs, acc), max(hi_cs, acc)
+                rs = (hi_cs - lo_cs) / s
+                out[23] = max(0.0, min(1.0, math.log(rs) / math.log(99 / 2))) if rs > 0 else 0.0
+
+        n_up, n_down = self.up_returns.sum, self.down_returns.sum
+        out[24] = 1.0 if n_up == 0 or n_down == 0 else abs(n_up - n_down) / len(returns)
+        n = len(last20)
+        xm = (n - 1) / 2
+        sxx = sum((i - xm) ** 2 for i in range(n))
+        slope = sum((i - xm) * p for i, p in enumerate(last20)) / sxx
+        out[25] = slope / mid * 100
+        resistance, support = math.inf, -math.inf
+        for i in range(10, len(H) - 1):
+            if H[i] > H[i - 1] and H[i] > H[i + 1] and H[i] > close:
+                resistance = min(resistance, H[i])
+            if L[i] < L[i - 1] and L[i] < L[i + 1] and L[i] < close:
+                support = max(support, L[i])
+        if math.isinf(resistance):
+            resistance = close * 1.1
+        if math.isinf(support):
+            support = close * 0.9
+        out[26] = (close - support) / (resistance - support) if resistance != support else 0.5
+        pivot = (H[-2] + L[-2] + C[-2]) / 3
+        out[27] = _div(close - pivot, pivot) * 100
+
+        out[28] = self.spread20.sum / 20
+        svs = list(self.signed_volumes)
+        sv_std = _std(svs)
+        out[29] = 0.0 if sv_std == 0 else _cov(returns, svs) / (sv_std * sv_std) * 1e6
+        illiquidity = []
+        for r, c, v in zip(returns, C[1:], list(self.volumes)[1:]):
+            dv = c * v
+            if dv > 0:
+                illiquidity.append(abs(r) / dv)
+        out[30] = _mean(illiquidity[-20:]) * 1e6 if illiquidity else 0.0
+        deltas = list(self.deltas)
+        roll_cov = _cov(deltas[:-1], deltas[1:])
+        out[31] = 0.0 if roll_cov >= 0 else 2 * math.sqrt(-roll_cov) / mid * 100
+        return np.asarray(out, dtype=np.float64)
+
+
+class FeatureStreams:
+    """``FeatureStream`` per (symbol, timeframe), created on first use."""
+
+    def __init__(self, window: int = 51) -> None:
+        self.window = window
+        self._streams: Dict[Tuple[str, str], FeatureStream] = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str, timeframe: str) -> FeatureStream:
+        key = (symbol, str(timeframe))
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None:
+                stream = self._streams[key] = FeatureStream(self.window)
+            return stream
+
+    def ingest(self, symbol: str, timeframe: str, candles: Sequence[Any]) -> Optional[np.ndarray]:
+        """
+        Feed freshly fetched candles (ascending) and return the latest row.
+
+        Candles that continue the stream are applied incrementally. If they
+        start after the stream's last bar (a gap, or a cold stream) the
+        stream is re-seeded from them, which needs at least ``window``
+        candles; ``None`` means the caller should fetch a longer history.
+        """
+        stream = self.get(symbol, timeframe)
+        if not candles:
+            return stream.latest
+        first_ts = _bar(candles[0])[0]
+        with self._lock:
+            if not stream.ready or stream.last_time is None or first_ts is None or first_ts > stream.last_time:
+                return stream.seed(candles)
+            for candle in candles:
+                stream.update(candle)
+            return stream.latest
@@ -3,25 +3,90 @@ ML Service for Training and Prediction
 Handles model training, prediction, and online learning
 """
 
+import asyncio
 import os
-from typing import Dict, List, Optional, Any
+import time
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 import logging
+import numpy as np
 from core.ml.ml_strategy import AdvancedMLStrategy
-from web.bybit_client import get_klines
+from core.executor import run_in_process, run_in_thread
+from core.ml.registry import ModelRegistry, ModelVersion
+from web.bybit_client import get_klines, get_klines_async
 
 log = logging.getLogger(__name__)
 
 MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "models", "anton_model.pkl")
+REGISTRY_DIR = os.path.join(os.path.dirname(MODEL_PATH), "registry")
+# How often predict() checks whether another version was promoted
+RELOAD_CHECK_SECONDS = float(os.getenv("ML_MODEL_RELOAD_CHECK_SECONDS", "5"))
+
+
+def _fit_candidate(X: np.ndarray, y: np.ndarray) -> Tuple[Any, Any, Dict[str, float], float]:
+    """Fit a fresh model (runs in the process pool); returns model, scaler, importance, train accuracy."""
+    candidate = AdvancedMLStrategy()
+    candidate.fit(X, y)
+    accuracy = float(candidate.model.score(candidate.scaler.transform(X), y))
+    return candidate.model, candidate.scaler, candidate.feature_importance, accuracy
+
+
+def _score(model: Any, scaler: Any, X: np.ndarray) -> np.ndarray:
+    return model.predict_proba(scaler.transform(X))
 
 
 class MLService:
     """Service for ML model training and prediction"""
     
-    def __init__(self):
-        self.model = AdvancedMLStrategy(model_path=MODEL_PATH if os.path.exists(MODEL_PATH) else None)
-        self.model_path = MODEL_PATH
-        os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
+    def __init__(self, registry: Optional[ModelRegistry] = None, legacy_path: str = MODEL_PATH):
+        # Nothing is loaded here; the current version is loaded on first use
+        self.model = AdvancedMLStrategy()
+        self.registry = registry or ModelRegistry(REGISTRY_DIR)
+        self.model_path = self.registry.root
+        self.legacy_path = legacy_path
+        self.version: Optional[str] = None
+        self.version_meta: Dict[str, Any] = {}
+        self._checked_at = float("-inf")
+    
+    def _activate(self, loaded: ModelVersion) -> None:
+        # One synchronous swap, so a concurrent prediction sees either version, never a mix
+        self.model.model, self.model.scaler, self.model.feature_importance = (
+            loaded.model, loaded.scaler, loaded.feature_importance
+        )
+        self.version, self.version_meta = loaded.version, loaded.meta
+        log.info(f"ML model version {loaded.version} active")
+    
+    async def reload(self, version: Optional[str] = None) -> Optional[str]:
+        """Load ``version`` (default: the promoted one) off the event loop and switch to it."""
+        if version is None and self.registry.current_version() is None and os.path.exists(self.legacy_path):
+            await asyncio.to_thread(self.registry.import_legacy, self.legacy_path)
+        version = version or self.registry.current_version()
+        if version is None:
+            return None
+        loaded = await asyncio.to_thread(self.registry.load, version)
+        self._activate(loaded)
+        return self.version
+    
+    async def ensure_current(self) -> None:
+        """Hot-reload when a different version has been promoted (checked every few seconds)."""
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        current = self.registry.current_version()
+        if self.version is None or (current is not None and current != self.version):
+            await self.reload()
+    
+    async def promote(self, version: str) -> Optional[str]:
+        self.registry.promote(version)
+        return await self.reload(version)
+    
+    def list_versions(self) -> Dict[str, Any]:
+        return {
+            "current": self.registry.current_version(),
+            "active": self.version,
+            "versions": self.registry.versions(),
+        }
     
     async def train(
         self,
@@ -45,8 +110,8 @@ class MLService:
             Training result dictionary
         """
         try:
-            # Fetch historical data
-            candles = get_klines(symbol=symbol, interval=interval, limit=limit)
+            # Fetch historical data (blocking HTTP client)
+            candles = await run_in_thread(get_klines, symbol=symbol, interval=interval, limit=limit)
             
             if isinstance(candles, dict) and 'error' in candles:
                 return {"error": candles['error']}
@@ -54,31 +119,9 @@ class MLService:
             if len(candles) < 50:
                 return {"error": "Insufficient data for training (need at least 50 candles)"}
             
-            # Prepare features
-            features_list = []
-            labels = []
-            
-            # Extract features from candles
-            for i in range(50, len(candles)):
-                candle_window = candles[i-50:i+1]
-                try:
-                    features = await self.model.extract_features(candle_window)
-                    features_list.append(features)
-                    
-                    # Generate labels based on next candle movement
-                    if i < len(candles) - 1:
-                        current_close = candles[i]['close']
-                        next_close = candles[i+1]['close']
-                        price_change = (next_close - current_close) / current_close
-                        
-                        # Label: 1 for buy (price goes up), 0 for sell (price goes down)
-                        label = 1 if price_change > 0.001 else 0  # 0.1% threshold
-                        labels.append(label)
-                except Exception as e:
-                    log.warning(f"Error extracting features at index {i}: {e}")
-                    continue
+            X, y = await run_in_thread(self._training_set, candles)
             
-            if len(features_list) == 0:
+            if len(X) == 0:
                 return {"error": "Failed to extract features from data"}
             
             # If using backtest data, adjust labels based on trade results
@@ -90,20 +133,38 @@ class MLService:
                         # Winning trade - positive label
                         pass  # Labels already set based on price movement
             
-            # Prepare training data
-            training_data = [{"features": f} for f in features_list[:len(labels)]]
+            # Train a fresh model in a worker process; the one being served is
+            # left alone until the swap
+            model, scaler, feature_importance, train_accuracy = await run_in_process(_fit_candidate, X, y)
             
-            # Train model
-            self.model.train_model(training_data, labels[:len(training_data)])
+            meta = {
+                "feature_names": self.model._get_feature_names(),
+                "window": 51,
+                "symbol": symbol,
+                "interval": interval,
+                "training_range": {
+                    "start": candles[50].get("time"),
+                    "end": candles[-2].get("time"),  # last bar with a label
+                },
+                "metrics": {
+                    "samples": len(X),
+                    "positive_rate": float(y.mean()),
+                    "train_accuracy": train_accuracy,
+                },
+            }
             
-            # Save model
-            self.model.save_model(self.model_path)
+            # Publish and promote a new version, then serve it
+            version = await run_in_thread(self.registry.publish, model, scaler, feature_importance, meta)
+            self._activate(ModelVersion(
+                version, model, scaler, feature_importance, self.registry.meta(version) or meta,
+            ))
             
             return {
                 "status": "success",
                 "message": "Model trained successfully",
-                "samples": len(training_data),
-                "model_path": self.model_path,
+                "samples": len(X),
+                "version": version,
+                "model_path": os.path.join(self.registry.root, version),
                 "timestamp": datetime.now().isoformat()
             }
             
@@ -111,6 +172,22 @@ class MLService:
             log.error(f"Error training model: {e}")
             return {"error": str(e)}
     
+    def _training_set(self, candles: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        # Features for every 51-candle window ending at bar 50..n-1, in one pass
+        features = self.model.extract_feature_matrix(candles, window=51)
+
+        # Label: 1 for buy (next close up more than 0.1%), 0 otherwise
+        closes = np.array([float(c['close']) for c in candles])
+        price_change = np.diff(closes[50:]) / closes[50:-1]
+        labels = (price_change > 0.001).astype(int)
+
+        # Drop windows whose features could not be computed
+        finite = np.isfinite(features).all(axis=1)
+        if not finite.all():
+            log.warning(f"Skipping {int((~finite).sum())} windows with non-finite features")
+        keep = finite[:len(labels)]
+        return features[:len(labels)][keep], labels[keep]
+    
     async def predict(
         self,
         symbol: str = "BTCUSDT",
@@ -129,70 +206,120 @@ class MLService:
             Prediction dictionary with signal and confidence
         """
         try:
-            # Fetch recent candles
-            candles = get_klines(symbol=symbol, interval=interval, limit=limit)
-            
-            if isinstance(candles, dict) and 'error' in candles:
-                return {"error": candles['error']}
-            
-            if len(candles) < 50:
-                return {"error": "Insufficient data for prediction (need at least 50 candles)"}
-            
-            # Extract features from most recent candles
-            recent_candles = candles[-51:]  # Last 51 candles for feature extraction
-            features = await self.model.extract_features(recent_candles)
-            
-            # Scale features
-            if self.model.scaler is None:
+            await self.ensure_current()
+            if self.version is None:
                 return {"error": "Model not trained. Please train the model first."}
             
-            features_scaled = self.model.scaler.transform([features])
-            
-            # Get prediction
-            if self.model.model is None:
-                return {"error": "Model not initialized. Please train the model first."}
+            candles, features, error = await self._live_row(symbol, interval, limit)
+            if error:
+                return {"error": error}
             
-            prediction = self.model.model.predict(features_scaled)[0]
-            probabilities = self.model.model.predict_proba(features_scaled)[0]
+            # Take model and scaler together so a concurrent swap cannot mix versions
+            probabilities = await run_in_thread(_score, self.model.model, self.model.scaler, features.reshape(1, -1))
+            return self._prediction(symbol, interval, probabilities[0], candles[-1]['close'])
             
-            # Get confidence (probability of predicted class)
-            confidence = float(max(probabilities)) * 100
+        except Exception as e:
+            log.error(f"Error making prediction: {e}")
+            return {"error": str(e)}
+    
+    async def predict_batch(self, items: List[Tuple[str, str]], limit: int = 100) -> Dict[str, Any]:
+        """
+        Predictions for many (symbol, interval) pairs in one call.
+        
+        Feature rows are gathered concurrently (each from its own feature
+        stream, so warm symbols only poll a few candles) and scored with a
+        single ``predict_proba`` on the stacked matrix. Results keep the
+        order of ``items``; a pair that failed carries an ``error`` instead.
+        """
+        try:
+            await self.ensure_current()
+            if self.version is None:
+                return {"error": "Model not trained. Please train the model first."}
             
-            # Map prediction to signal
-            signal_map = {1: "BUY", 0: "SELL"}
-            signal = signal_map.get(prediction, "NEUTRAL")
+            gathered = await asyncio.gather(
+                *(self._live_row(symbol, interval, limit) for symbol, interval in items),
+                return_exceptions=True,
+            )
+            results: List[Dict[str, Any]] = []
+            scored: List[int] = []
+            rows: List[np.ndarray] = []
+            for i, ((symbol, interval), got) in enumerate(zip(items, gathered)):
+                if isinstance(got, BaseException):
+                    results.append({"symbol": symbol, "timeframe": interval, "error": str(got)})
+                    continue
+                candles, features, error = got
+                if error:
+                    results.append({"symbol": symbol, "timeframe": interval, "error": error})
+                    continue
+                results.append({"symbol": symbol, "timeframe": interval, "current_price": candles[-1]['close']})
+                scored.append(i)
+                rows.append(features)
             
-            # Get current price
-            current_price = candles[-1]['close']
+            if rows:
+                probabilities = await run_in_thread(_score, self.model.model, self.model.scaler, np.vstack(rows))
+                for i, p in zip(scored, probabilities):
+                    r = results[i]
+                    results[i] = self._prediction(r["symbol"], r["timeframe"], p, r["current_price"])
             
-            return {
-                "symbol": symbol,
-                "timeframe": interval,
-                "signal": signal,
-                "confidence": round(confidence, 2),
-                "current_price": current_price,
-                "timestamp": datetime.now().isoformat(),
-                "probabilities": {
-                    "buy": round(float(probabilities[1] if len(probabilities) > 1 else 0) * 100, 2),
-                    "sell": round(float(probabilities[0] if len(probabilities) > 0 else 0) * 100, 2)
-                }
-            }
+            return {"version": self.version, "count": len(results), "predictions": results}
             
         except Exception as e:
-            log.error(f"Error making prediction: {e}")
+            log.error(f"Error making batch prediction: {e}")
             return {"error": str(e)}
     
+    async def _live_row(self, symbol: str, interval: str, limit: int) -> Tuple[Any, Optional[np.ndarray], Optional[str]]:
+        # Roll the (symbol, interval) feature stream forward; only a cold
+        # stream needs the full history
+        async def fetch(n: int) -> Any:
+            return await get_klines_async(symbol=symbol, interval=interval, limit=n)
+        
+        candles, features = await self.model.live_features(symbol, interval, fetch, history=max(limit, 51))
+        if isinstance(candles, dict) and 'error' in candles:
+            return candles, None, candles['error']
+        if features is None:
+            return candles, None, "Insufficient data for prediction (need at least 51 candles)"
+        return candles, features, None
+    
+    def _prediction(self, symbol: str, interval: str, probabilities: np.ndarray, current_price: float) -> Dict[str, Any]:
+        classes = list(self.model.model.classes_)
+        prediction = classes[int(np.argmax(probabilities))]
+        
+        # Get confidence (probability of predicted class)
+        confidence = float(max(probabilities)) * 100
+        
+        # Map prediction to signal
+        signal_map = {1: "BUY", 0: "SELL"}
+        signal = signal_map.get(prediction, "NEUTRAL")
+        
+        def prob(label: int) -> float:
+            return round(float(probabilities[classes.index(label)]) * 100, 2) if label in classes else 0.0
+        
+        return {
+            "symbol": symbol,
+            "timeframe": interval,
+            "signal": signal,
+            "confidence": round(confidence, 2),
+            "current_price": current_price,
+            "timestamp": datetime.now().isoformat(),
+            "probabilities": {
+                "buy": prob(1),
+                "sell": prob(0)
+            }
+        }
+    
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the current model"""
-        model_exists = os.path.exists(self.model_path)
+        current = self.registry.current_version()
         
         info = {
-            "model_path": self.model_path,
-            "model_exists": model_exists,
-            "model_initialized": self.model.model is not None
+            "model_path": os.path.join(self.registry.root, current) if current else self.registry.root,
+            "model_exists": current is not None,
+            "model_initialized": self.version is not None,
+            "version": self.version,
+            "metadata": self.version_meta,
         }
         
-        if model_exists and self.model.model is not None:
+        if self.version is not None:
             try:
                 metrics = self.model.get_performance_metrics()
                 info.update(metrics)
@@ -200,4 +327,3 @@ class MLService:
                 pass
         
         return info
-
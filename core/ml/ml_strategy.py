@@ -1,5 +1,5 @@
 import numpy as np
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any, Awaitable, Callable
 from datetime import datetime
 from dataclasses import dataclass
 from enum import Enum
@@ -13,7 +13,12 @@ import joblib
 
 import logging
 log = logging.getLogger(__name__)
-from core.services.fetch_bybit_klines import fetch_klines  # noqa: E402
+from core.market_data.resample import to_ohlcv  # noqa: E402
+from core.market_data.ring import get_recent_candles  # noqa: E402
+from core.indicators import Indicators, get_indicators  # noqa: E402
+from core.ml.feature_matrix import feature_matrix  # noqa: E402
+from core.ml.feature_stream import FeatureStreams  # noqa: E402
+from core.executor import run_in_thread  # noqa: E402
 class SignalType(Enum):
     STRONG_BUY = 2
     BUY = 1
@@ -39,12 +44,16 @@ class MLSignal:
 class AdvancedMLStrategy:
     """Machine Learning based trading strategy with advanced features"""
     
+    # Candles fetched per prediction once a symbol's feature stream is warm
+    STREAM_POLL_CANDLES = 3
+    
     def __init__(self, model_path: Optional[str] = None):
         self.model: Optional[RandomForestClassifier] = None
         self.scaler: Optional[StandardScaler] = None
         self.feature_importance: Dict[str, float] = {}
         self.prediction_history: List[Dict] = []
         self.api = None
+        self.streams = FeatureStreams()
         
         if model_path:
             self.load_model(model_path)
@@ -64,35 +73,45 @@ class AdvancedMLStrategy:
         self.scaler = StandardScaler()
         log.info("Initialized new ML model")
     
-    async def extract_features(self, candles: List[Dict]) -> np.ndarray:
-        """Extract advanced features from candles"""
+    async def extract_features(
+        self, candles: List[Dict], symbol: Optional[str] = None, timeframe: Optional[str] = None
+    ) -> np.ndarray:
+        """Extract advanced features from candles (computed on the shared thread pool)"""
+        return await run_in_thread(self.compute_features, candles, symbol, timeframe)
+    
+    def compute_features(
+        self, candles: List[Dict], symbol: Optional[str] = None, timeframe: Optional[str] = None
+    ) -> np.ndarray:
+        """Synchronous ``extract_features``; CPU-bound, keep it off the event loop"""
         if len(candles) < 50:
             raise ValueError("Insufficient data for feature extraction")
         
         features = []
-        closes = np.array([c["close"] for c in candles])
-        highs = np.array([c["high"] for c in candles])
-        lows = np.array([c["low"] for c in candles])
-        volumes = np.array([c["volume"] for c in candles])
+        # Cached per symbol/timeframe when they are known
+        ind = get_indicators(candles, symbol, timeframe)
+        closes = ind.close
+        highs = ind.high
+        lows = ind.low
+        volumes = ind.volume
         
         # Price features
         features.extend([
-            self._calculate_rsi(closes),
-            self._calculate_macd(closes),
-            self._calculate_bollinger_position(closes),
-            self._calculate_stochastic(highs, lows, closes),
-            self._calculate_atr(highs, lows, closes),
-            self._calculate_obv(closes, volumes),
+            self._calculate_rsi(ind),
+            self._calculate_macd(ind),
+            self._calculate_bollinger_position(ind),
+            self._calculate_stochastic(ind),
+            self._calculate_atr(ind),
+            self._calculate_obv(ind),
             self._calculate_vwap(highs, lows, closes, volumes),
             self._calculate_momentum(closes),
             self._calculate_roc(closes),
-            self._calculate_williams_r(highs, lows, closes)
+            self._calculate_williams_r(ind)
         ])
         
         # Volume features
         features.extend([
-            self._calculate_volume_ratio(volumes),
-            self._calculate_money_flow_index(highs, lows, closes, volumes),
+            self._calculate_volume_ratio(ind),
+            self._calculate_money_flow_index(ind),
             self._calculate_accumulation_distribution(highs, lows, closes, volumes),
             self._calculate_volume_weighted_momentum(closes, volumes)
         ])
@@ -100,9 +119,9 @@ class AdvancedMLStrategy:
         # Volatility features
         features.extend([
             self._calculate_volatility(closes),
-            self._calculate_keltner_position(highs, lows, closes),
-            self._calculate_donchian_position(highs, lows, closes),
-            self._calculate_average_true_range_percent(highs, lows, closes)
+            self._calculate_keltner_position(ind),
+            self._calculate_donchian_position(ind),
+            self._calculate_average_true_range_percent(ind)
         ])
         
         # Pattern features
@@ -133,80 +152,70 @@ class AdvancedMLStrategy:
         
         return np.array(features).reshape(1, -1)
     
-    def _calculate_rsi(self, prices: np.ndarray, period: int = 14) -> float:
+    def extract_feature_matrix(self, candles: List[Dict], window: int = 51) -> np.ndarray:
+        """
+        Features for every ``window``-candle sliding window in one pass.
+
+        Row ``i`` equals ``extract_features(candles[i:i + window])``.
+        """
+        if len(candles) < window:
+            raise ValueError("Insufficient data for feature extraction")
+        ind = Indicators(candles)
+        return feature_matrix(
+            {"close": ind.close, "high": ind.high, "low": ind.low, "volume": ind.volume}, window=window
+        )
+    
+    async def live_features(
+        self, symbol: str, timeframe: str, fetch: Callable[[int], Awaitable[Any]], history: int = 200
+    ) -> Tuple[Any, Optional[np.ndarray]]:
+        """
+        Latest feature row from the (symbol, timeframe) feature stream.
+
+        ``fetch(limit)`` returns recent candles. A warm stream only needs the
+        last few to roll forward; a cold one (or one that fell behind) is
+        seeded from ``history`` candles. Returns the candles last fetched and
+        the row, or ``None`` if there was not enough data.
+        """
+        warm = self.streams.get(symbol, timeframe).ready
+        candles = await fetch(self.STREAM_POLL_CANDLES if warm else history)
+        if not isinstance(candles, list):
+            return candles, None
+        row = self.streams.ingest(symbol, timeframe, candles)
+        if row is None and warm:
+            candles = await fetch(history)
+            if not isinstance(candles, list):
+                return candles, None
+            row = self.streams.ingest(symbol, timeframe, candles)
+        return candles, row
+    
+    def _calculate_rsi(self, ind: Indicators, period: int = 14) -> float:
         """Calculate RSI"""
-        deltas = np.diff(prices)
-        gains = deltas.copy()
-        gains[gains < 0] = 0
-        losses = -deltas.copy()
-        losses[losses < 0] = 0
-        
-        avg_gain = np.mean(gains[-period:]) if len(gains) >= period else np.mean(gains)
-        avg_loss = np.mean(losses[-period:]) if len(losses) >= period else np.mean(losses)
-        
-        if avg_loss == 0:
-            return 100 if avg_gain > 0 else 50
-        
-        rs = avg_gain / avg_loss
-        return 100 - (100 / (1 + rs))
+        return float(ind.rsi(period)[-1])
     
-    def _calculate_macd(self, prices: np.ndarray) -> float:
+    def _calculate_macd(self, ind: Indicators) -> float:
         """Calculate MACD histogram"""
-        exp1 = self._ema(prices, 12)
-        exp2 = self._ema(prices, 26)
-        macd = exp1 - exp2
-        signal = self._ema(np.array([macd]), 9)
-        return macd - signal
+        return float(ind.macd()[2][-1])
     
-    def _calculate_bollinger_position(self, prices: np.ndarray, period: int = 20) -> float:
+    def _calculate_bollinger_position(self, ind: Indicators, period: int = 20) -> float:
         """Calculate position within Bollinger Bands"""
-        sma = np.mean(prices[-period:])
-        std = np.std(prices[-period:])
-        upper = sma + (2 * std)
-        lower = sma - (2 * std)
+        _, upper, lower, _ = ind.bollinger(period)
         
-        if upper == lower:
+        if upper[-1] == lower[-1]:
             return 0.5
         
-        return (prices[-1] - lower) / (upper - lower)
+        return (ind.close[-1] - lower[-1]) / (upper[-1] - lower[-1])
     
-    def _calculate_stochastic(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 14) -> float:
+    def _calculate_stochastic(self, ind: Indicators, period: int = 14) -> float:
         """Calculate Stochastic Oscillator"""
-        highest = np.max(highs[-period:])
-        lowest = np.min(lows[-period:])
-        
-        if highest == lowest:
-            return 50
-        
-        k = ((closes[-1] - lowest) / (highest - lowest)) * 100
-        return k
+        return float(ind.stochastic_k(period)[-1])
     
-    def _calculate_atr(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 14) -> float:
+    def _calculate_atr(self, ind: Indicators, period: int = 14) -> float:
         """Calculate Average True Range"""
-        tr = []
-        for i in range(1, len(highs)):
-            tr.append(max(
-                highs[i] - lows[i],
-                abs(highs[i] - closes[i-1]),
-                abs(lows[i] - closes[i-1])
-            ))
-        
-        if not tr:
-            return 0
-        
-        return np.mean(tr[-period:]) if len(tr) >= period else np.mean(tr)
+        return float(ind.atr(period)[-1])
     
-    def _calculate_obv(self, prices: np.ndarray, volumes: np.ndarray) -> float:
+    def _calculate_obv(self, ind: Indicators) -> float:
         """Calculate On-Balance Volume trend"""
-        obv = 0
-        obv_values = []
-        
-        for i in range(1, len(prices)):
-            if prices[i] > prices[i-1]:
-                obv += volumes[i]
-            elif prices[i] < prices[i-1]:
-                obv -= volumes[i]
-            obv_values.append(obv)
+        obv_values = ind.obv()[1:]
         
         if len(obv_values) < 2:
             return 0
@@ -238,44 +247,17 @@ class AdvancedMLStrategy:
         
         return ((prices[-1] - prices[-period-1]) / prices[-period-1]) * 100
     
-    def _calculate_williams_r(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 14) -> float:
+    def _calculate_williams_r(self, ind: Indicators, period: int = 14) -> float:
         """Calculate Williams %R"""
-        highest = np.max(highs[-period:])
-        lowest = np.min(lows[-period:])
-        
-        if highest == lowest:
-            return -50
-        
-        return ((highest - closes[-1]) / (highest - lowest)) * -100
+        return float(ind.williams_r(period)[-1])
     
-    def _calculate_volume_ratio(self, volumes: np.ndarray, period: int = 20) -> float:
+    def _calculate_volume_ratio(self, ind: Indicators, period: int = 20) -> float:
         """Calculate volume ratio to average"""
-        avg_volume = np.mean(volumes[-period:])
-        
-        if avg_volume == 0:
-            return 1
-        
-        return volumes[-1] / avg_volume
+        return float(ind.volume_ratio(period)[-1])
     
-    def _calculate_money_flow_index(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, volumes: np.ndarray, period: int = 14) -> float:
+    def _calculate_money_flow_index(self, ind: Indicators, period: int = 14) -> float:
         """Calculate Money Flow Index"""
-        typical_price = (highs + lows + closes) / 3
-        money_flow = typical_price * volumes
-        
-        positive_flow = 0
-        negative_flow = 0
-        
-        for i in range(1, min(period + 1, len(typical_price))):
-            if typical_price[-i] > typical_price[-i-1]:
-                positive_flow += money_flow[-i]
-            else:
-                negative_flow += money_flow[-i]
-        
-        if negative_flow == 0:
-            return 100
-        
-        money_ratio = positive_flow / negative_flow
-        return 100 - (100 / (1 + money_ratio))
+        return float(ind.mfi(period)[-1])
     
     def _calculate_accumulation_distribution(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, volumes: np.ndarray) -> float:
         """Calculate Accumulation/Distribution line"""
@@ -305,10 +287,10 @@ class AdvancedMLStrategy:
         returns = np.diff(prices) / prices[:-1]
         return np.std(returns[-period:]) * np.sqrt(365 * 96) * 100  # 96 = 15-min periods per day
     
-    def _calculate_keltner_position(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 20) -> float:
+    def _calculate_keltner_position(self, ind: Indicators, period: int = 20) -> float:
         """Calculate position within Keltner Channels"""
-        ema = self._ema(closes, period)
-        atr = self._calculate_atr(highs, lows, closes, period)
+        ema = ind.ema(period)[-1]
+        atr = ind.atr(period)[-1]
         
         upper = ema + (2 * atr)
         lower = ema - (2 * atr)
@@ -316,26 +298,26 @@ class AdvancedMLStrategy:
         if upper == lower:
             return 0.5
         
-        return (closes[-1] - lower) / (upper - lower)
+        return (ind.close[-1] - lower) / (upper - lower)
     
-    def _calculate_donchian_position(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 20) -> float:
+    def _calculate_donchian_position(self, ind: Indicators, period: int = 20) -> float:
         """Calculate position within Donchian Channels"""
-        upper = np.max(highs[-period:])
-        lower = np.min(lows[-period:])
+        upper = ind.rolling_max(period, "high")[-1]
+        lower = ind.rolling_min(period, "low")[-1]
         
         if upper == lower:
             return 0.5
         
-        return (closes[-1] - lower) / (upper - lower)
+        return (ind.close[-1] - lower) / (upper - lower)
     
-    def _calculate_average_true_range_percent(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray) -> float:
+    def _calculate_average_true_range_percent(self, ind: Indicators) -> float:
         """Calculate ATR as percentage of price"""
-        atr = self._calculate_atr(highs, lows, closes)
+        atr = ind.atr(14)[-1]
         
-        if closes[-1] == 0:
+        if ind.close[-1] == 0:
             return 0
         
-        return (atr / closes[-1]) * 100
+        return (atr / ind.close[-1]) * 100
     
     def _detect_double_top(self, highs: np.ndarray, window: int = 20) -> float:
         """Detect double top pattern"""
@@ -596,25 +578,18 @@ class AdvancedMLStrategy:
         
         return spread / np.mean(prices[-20:]) * 100
     
-    def _ema(self, data: np.ndarray, period: int) -> float:
-        """Calculate Exponential Moving Average"""
-        if len(data) < period:
-            return np.mean(data)
-        
-        alpha = 2 / (period + 1)
-        ema = data[0]
-        for price in data[1:]:
-            ema = alpha * price + (1 - alpha) * ema
-        return ema
-    
     async def predict_signal(self, symbol: str) -> MLSignal:
         """Generate ML trading signal"""
         try:
-            # Load candles
-            candles = await fetch_klines(symbol, "15", 200)
+            # Roll the symbol's feature stream forward to the latest candle,
+            # read from the resident ring shared with the other AI readers
+            async def fetch(limit: int) -> Any:
+                return to_ohlcv(await get_recent_candles().window("bybit", symbol, "15m", limit))
             
-            # Extract features
-            features = await self.extract_features(candles)
+            candles, row = await self.live_features(symbol, "15", fetch)
+            if row is None:
+                raise ValueError("Insufficient data for feature extraction")
+            features = row.reshape(1, -1)
             
             # Get feature names for interpretability
             feature_names = self._get_feature_names()
@@ -622,9 +597,7 @@ class AdvancedMLStrategy:
             # Make prediction
             if self.model and hasattr(self.model, 'predict_proba'):
                 # For trained model
-                features_scaled = self.scaler.transform(features) if self.scaler else features
-                probabilities = self.model.predict_proba(features_scaled)[0]
-                prediction = self.model.predict(features_scaled)[0]
+                prediction, probabilities = await run_in_thread(self._model_predict, features)
                 
                 # Get feature importance
                 if hasattr(self.model, 'feature_importances_'):
@@ -641,7 +614,7 @@ class AdvancedMLStrategy:
             confidence = self._calculate_confidence(probabilities)
             
             # Current price
-            current_price = candles[-1]["close"]
+            current_price = candles[-1].close
             
             # Calculate stop loss and take profits
             volatility = features[0][14]  # Volatility feature index
@@ -704,6 +677,12 @@ class AdvancedMLStrategy:
             "Bid_Ask_Spread", "Kyle_Lambda", "Amihud_Illiquidity", "Roll_Measure"
         ]
     
+    def _model_predict(self, features: np.ndarray) -> Tuple[int, np.ndarray]:
+        """Class and probabilities from the trained model for a (1, n) feature row"""
+        features_scaled = self.scaler.transform(features) if self.scaler else features
+        probabilities = self.model.predict_proba(features_scaled)[0]
+        return self.model.classes_[int(np.argmax(probabilities))], probabilities
+    
     def _rule_based_prediction(self, features: np.ndarray) -> Tuple[int, np.ndarray]:
         """Rule-based prediction when ML model is not available"""
         rsi = features[0]
@@ -848,11 +827,14 @@ class AdvancedMLStrategy:
         if not training_data:
             raise ValueError("No training data provided")
         
-        log.info(f"Training model with {len(training_data)} samples")
-        
         # Prepare features
         X = np.array([d["features"] for d in training_data])
         y = np.array(labels)
+        self.fit(X, y)
+    
+    def fit(self, X: np.ndarray, y: np.ndarray):
+        """Train the ML model on a feature matrix (one row per sample)"""
+        log.info(f"Training model with {len(X)} samples")
         
         # Scale features
         X_scaled = self.scaler.fit_transform(X)
@@ -0,0 +1,150 @@
+"""
+Versioned model registry.
+
+Each version is a directory under the registry root holding ``model.joblib``
+(model, scaler and feature importance, dumped uncompressed so numpy arrays
+can be memory-mapped on load) and ``meta.json`` (feature list, training
+range, metrics). ``CURRENT`` names the promoted version. Versions are written
+to a temporary directory and renamed into place, and ``CURRENT`` is replaced
+atomically, so a reader never sees a half-written artifact.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import joblib
+
+ARTIFACT = "model.joblib"
+META = "meta.json"
+CURRENT = "CURRENT"
+
+
+class ModelNotFound(Exception):
+    pass
+
+
+@dataclass
+class ModelVersion:
+    version: str
+    model: Any
+    scaler: Any
+    feature_importance: Dict[str, float]
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+
+def _new_version() -> str:
+    return time.strftime("v%Y%m%d-%H%M%S", time.gmtime()) + "-" + uuid.uuid4().hex[:6]
+
+
+class ModelRegistry:
+    def __init__(self, root: str) -> None:
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    # ---------- write ----------
+    def publish(
+        self,
+        model: Any,
+        scaler: Any,
+        feature_importance: Optional[Dict[str, float]] = None,
+        meta: Optional[Dict[str, Any]] = None,
+        promote: bool = True,
+    ) -> str:
+        """Store a new version; returns its name (and makes it current unless ``promote=False``)."""
+        version = _new_version()
+        tmp = os.path.join(self.root, f".tmp_{version}")
+        os.makedirs(tmp)
+        try:
+            joblib.dump(
+                {"model": model, "scaler": scaler, "feature_importance": dict(feature_importance or {})},
+                os.path.join(tmp, ARTIFACT),
+            )
+            info = dict(meta or {})
+            info.update(version=version, created_at=time.time())
+            with open(os.path.join(tmp, META), "w", encoding="utf-8") as f:
+                json.dump(info, f, ensure_ascii=False, indent=2, default=str)
+            os.rename(tmp, self._path(version))
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        if promote:
+            self.promote(version)
+        return version
+
+    def promote(self, version: str) -> None:
+        if not os.path.isfile(os.path.join(self._path(version), ARTIFACT)):
+            raise ModelNotFound(version)
+        path = os.path.join(self.root, CURRENT)
+        tmp = f"{path}.tmp_{uuid.uuid4().hex}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp, path)
+
+    def import_legacy(self, path: str) -> str:
+        """Publish a single-file ``save_model`` pickle as a new current version."""
+        data = joblib.load(path)
+        meta = dict(data.get("metadata") or {})
+        meta["source"] = os.path.basename(path)
+        return self.publish(data["model"], data["scaler"], data.get("feature_importance"), meta)
+
+    # ---------- read ----------
+    def current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, CURRENT), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def versions(self) -> List[Dict[str, Any]]:
+        """Metadata of every stored version, oldest first."""
+        out = []
+        for name in os.listdir(self.root):
+            if name.startswith(".") or not os.path.isdir(self._path(name)):
+                continue
+            meta = self.meta(name)
+            if meta is not None:
+                out.append(meta)
+        out.sort(key=lambda m: (m.get("created_at", 0.0), m.get("version", "")))
+        return out
+
+    def meta(self, version: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._path(version), META), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def load(self, version: Optional[str] = None, mmap: bool = True) -> ModelVersion:
+        """
+        Load ``version`` (default: the current one).
+
+        With ``mmap`` the numpy arrays inside the artifact are mapped read-only
+        instead of read into memory, so loading is cheap and processes
+        serving the same version share the pages.
+        """
+        version = version or self.current_version()
+        if version is None:
+            raise ModelNotFound("no current model version")
+        artifact = os.path.join(self._path(version), ARTIFACT)
+        if not os.path.isfile(artifact):
+            raise ModelNotFound(version)
+        data = joblib.load(artifact, mmap_mode="r" if mmap else None)
+        return ModelVersion(
+            version=version,
+            model=data["model"],
+            scaler=data["scaler"],
+            feature_importance=data.get("feature_importance") or {},
+            meta=self.meta(version) or {},
+        )
+
+    def _path(self, version: str) -> str:
+        if not version or os.sep in version or "/" in version or version.startswith("."):
+            raise ModelNotFound(version)
+        return os.path.join(self.root, version)
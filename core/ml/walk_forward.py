@@ -0,0 +1,307 @@
+"""
+Walk-forward training and evaluation on local history.
+
+Candles come from the downloaded history store (``data/history``). The
+feature matrix for the whole range is built once with ``feature_matrix``
+and cached on disk as ``.npy`` files keyed by the candle range, so folds and
+later runs slice the same memory-mapped matrix instead of recomputing it.
+Each fold trains a fresh ``AdvancedMLStrategy`` model on everything before
+its test block (expanding window, or the last ``train_size`` samples), then
+scores the block out of sample: classification accuracy and the PnL of
+trading the model's signals through the vector backtest engine. Folds run on
+a process pool whose workers map the cached files.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.backtest.vector_engine import compute_metrics_arrays, simulate_arrays
+from core.executor import map_with_initializer
+from core.market_data.history import HistoryIndex
+
+from .feature_matrix import feature_matrix
+from .ml_strategy import AdvancedMLStrategy
+
+HISTORY_ROOT = os.path.join("data", "history")
+FEATURE_CACHE_DIR = os.path.join("data", "ml", "features")
+# Bump when the feature definitions change so stale cached matrices are not reused.
+FEATURE_VERSION = 1
+
+# Per-worker memory maps of the cached arrays, opened once by the pool initializer.
+_worker_state: Dict[str, Any] = {}
+
+
+def history_columns(
+    symbol: str,
+    timeframe: str,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    exchange: str = "bybit",
+    root: str = HISTORY_ROOT,
+) -> Dict[str, np.ndarray]:
+    """Candle columns (ts/open/high/low/close/volume) from the local history store."""
+    directory = Path(root) / exchange.lower() / symbol.upper() / timeframe
+    if not directory.is_dir():
+        raise RuntimeError(f"No local history for {exchange} {symbol} {timeframe} (expected {directory})")
+    rows = HistoryIndex(directory).load(start_ts, end_ts)
+    if not rows:
+        raise RuntimeError(f"Local history is empty for {exchange} {symbol} {timeframe} in the requested range")
+    out = {"ts": np.fromiter((r["time"] for r in rows), dtype=np.int64, count=len(rows))}
+    for name in ("open", "high", "low", "close", "volume"):
+        out[name] = np.fromiter((r[name] for r in rows), dtype=np.float64, count=len(rows))
+    return out
+
+
+def next_bar_labels(close: np.ndarray, threshold: float = 0.001) -> np.ndarray:
+    """1 where the next close is more than ``threshold`` above this one; the last bar has no label (-1)."""
+    close = np.asarray(close, dtype=np.float64)
+    labels = np.full(close.shape[0], -1, dtype=np.int64)
+    if close.shape[0] > 1:
+        labels[:-1] = (np.diff(close) / close[:-1] > threshold).astype(np.int64)
+    return labels
+
+
+def walk_forward_folds(
+    n_samples: int, n_folds: int, test_size: Optional[int] = None, train_size: Optional[int] = None, min_train: int = 100
+) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """
+    ``[((train_start, train_end), (test_start, test_end)), ...]`` half-open sample ranges.
+
+    Test blocks are consecutive and end at the last sample. Each train range
+    stops one sample before its test block: that sample's label is the first
+    test bar's move.
+    """
+    n_folds = max(1, int(n_folds))
+    test_size = int(test_size or n_samples // (n_folds + 1))
+    if test_size <= 0:
+        raise ValueError("not enough samples for the requested folds")
+    folds = []
+    for k in range(n_folds):
+        test_start = n_samples - (n_folds - k) * test_size
+        train_end = test_start - 1
+        train_start = 0 if not train_size else max(0, train_end - int(train_size))
+        if train_end - train_start < min_train:
+            continue
+        folds.append(((train_start, train_end), (test_start, test_start + test_size)))
+    if not folds:
+        raise ValueError(f"no fold has at least {min_train} training samples")
+    return folds
+
+
+class FeatureCache:
+    """
+    Feature matrices on disk, keyed by symbol, timeframe, window and candle range.
+
+    A cached entry is a directory of ``.npy`` files (features, ts, close)
+    written to a temporary name and renamed into place.
+    """
+
+    def __init__(self, root: str = FEATURE_CACHE_DIR) -> None:
+        self.root = root
+
+    def key(self, symbol: str, timeframe: str, window: int, cols: Dict[str, np.ndarray]) -> str:
+        ts = cols["ts"]
+        raw = json.dumps([FEATURE_VERSION, symbol.upper(), timeframe, int(window), int(ts[0]), int(ts[-1]), int(ts.shape[0])])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get_or_build(self, symbol: str, timeframe: str, window: int, cols: Dict[str, np.ndarray]) -> Tuple[str, bool]:
+        """Directory of the cached arrays for these candles; second item is True on a cache hit."""
+        key = self.key(symbol, timeframe, window, cols)
+        path = self.path(key)
+        if os.path.isfile(os.path.join(path, "features.npy")):
+            return path, True
+        os.makedirs(self.root, exist_ok=True)
+        tmp = os.path.join(self.root, f".tmp_{key}_{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        try:
+            last = window - 1
+            np.save(os.path.join(tmp, "features.npy"), feature_matrix(cols, window))
+            # the sample of feature row r is the bar its window ends on
+            np.save(os.path.join(tmp, "ts.npy"), np.ascontiguousarray(cols["ts"][last:]))
+            np.save(os.path.join(tmp, "close.npy"), np.ascontiguousarray(cols["close"][last:]))
+            os.rename(tmp, path)
+        except FileExistsError:
+            # another run built it first
+            shutil.rmtree(tmp, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        return path, False
+
+    @staticmethod
+    def open(path: str) -> Dict[str, np.ndarray]:
+        return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ("features", "ts", "close")}
+
+
+def _init_worker(cache_path: str, threshold: float, engine_args: Dict[str, float]) -> None:
+    arrays = FeatureCache.open(cache_path)
+    _worker_state["arrays"] = arrays
+    _worker_state["labels"] = next_bar_labels(np.asarray(arrays["close"]), threshold)
+    _worker_state["engine_args"] = engine_args
+
+
+def _run_fold(fold: Tuple[int, Tuple[int, int], Tuple[int, int]]) -> Dict[str, Any]:
+    number, (train_start, train_end), (test_start, test_end) = fold
+    arrays = _worker_state["arrays"]
+    labels = _worker_state["labels"]
+    args = _worker_state["engine_args"]
+    X = np.asarray(arrays["features"][train_start:train_end])
+    y = labels[train_start:train_end]
+    ok = np.isfinite(X).all(axis=1) & (y >= 0)
+    result: Dict[str, Any] = {
+        "fold": number,
+        "train": {"start_ts": int(arrays["ts"][train_start]), "end_ts": int(arrays["ts"][train_end - 1]), "samples": int(ok.sum())},
+        "test": {"start_ts": int(arrays["ts"][test_start]), "end_ts": int(arrays["ts"][test_end - 1]), "samples": test_end - test_start},
+    }
+    try:
+        if np.unique(y[ok]).size < 2:
+            raise ValueError("training labels contain a single class")
+        strategy = AdvancedMLStrategy()
+        # folds already run in parallel; one core per forest
+        strategy.model.set_params(n_jobs=1)
+        strategy.fit(X[ok], y[ok])
+
+        X_test = np.asarray(arrays["features"][test_start:test_end])
+        finite = np.isfinite(X_test).all(axis=1)
+        pred = np.zeros(X_test.shape[0], dtype=np.int64)
+        if finite.any():
+            pred[finite] = strategy.model.predict(strategy.scaler.transform(X_test[finite]))
+        y_test = labels[test_start:test_end]
+        scored = finite & (y_test >= 0)
+
+        # long on a predicted up-move, flat otherwise; bars without features stay flat
+        signals = np.where(finite, np.where(pred == 1, 1, -1), -1)
+        ts = np.asarray(arrays["ts"][test_start:test_end])
+        close = np.asarray(arrays["close"][test_start:test_end])
+        equity, trades = simulate_arrays(ts, close, signals, args["initial_balance"], args["fee_rate"], args["slippage"])
+        metrics = compute_metrics_arrays(equity, trades, args["initial_balance"])
+
+        result["accuracy"] = float((pred[scored] == y_test[scored]).mean()) if scored.any() else None
+        result["predicted_up_rate"] = float(pred[finite].mean()) if finite.any() else 0.0
+        result["actual_up_rate"] = float(y_test[y_test >= 0].mean()) if (y_test >= 0).any() else None
+        result["pnl"] = metrics["final_balance"] - metrics["initial_balance"]
+        result["backtest"] = metrics
+        result["error"] = None
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def _summary(folds: List[Dict[str, Any]], initial_balance: float) -> Dict[str, Any]:
+    ok = [f for f in folds if f.get("error") is None]
+    acc = [f["accuracy"] for f in ok if f.get("accuracy") is not None]
+    growth = 1.0
+    for f in ok:
+        growth *= 1.0 + f["backtest"]["total_return"]
+    return {
+        "folds": len(folds),
+        "failed": len(folds) - len(ok),
+        "mean_accuracy": float(np.mean(acc)) if acc else None,
+        "total_pnl": float(sum(f["pnl"] for f in ok)),
+        # as if each fold's result were reinvested into the next
+        "compounded_return": growth - 1.0 if ok else 0.0,
+        "mean_return": float(np.mean([f["backtest"]["total_return"] for f in ok])) if ok else 0.0,
+        "initial_balance": float(initial_balance),
+    }
+
+
+def run_walk_forward(
+    symbol: str,
+    timeframe: str,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    n_folds: int = 5,
+    test_size: Optional[int] = None,
+    train_size: Optional[int] = None,
+    window: int = 51,
+    threshold: float = 0.001,
+    initial_balance: float = 1000.0,
+    fee_rate: float = 0.0,
+    slippage: float = 0.0,
+    exchange: str = "bybit",
+    columns: Optional[Dict[str, np.ndarray]] = None,
+    cache: Optional[FeatureCache] = None,
+    max_workers: Optional[int] = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Walk-forward evaluation of the ML strategy; returns per-fold results and a summary.
+
+    ``columns`` bypasses the history store (same layout as ``history_columns``).
+    ``max_workers=1`` runs the folds inline.
+    """
+    cols = columns if columns is not None else history_columns(symbol, timeframe, start_ts, end_ts, exchange)
+    if cols["ts"].shape[0] < window + 2:
+        raise ValueError(f"need more than {window + 1} candles, got {cols['ts'].shape[0]}")
+    cache = cache or FeatureCache()
+    cache_path, cache_hit = cache.get_or_build(symbol, timeframe, window, cols)
+    if on_progress is not None:
+        on_progress(0.1)
+
+    # the last sample has no next bar to label
+    n_samples = cols["ts"].shape[0] - window
+    folds = walk_forward_folds(n_samples, n_folds, test_size, train_size)
+    tasks = [(i + 1, train, test) for i, (train, test) in enumerate(folds)]
+    engine_args = {"initial_balance": float(initial_balance), "fee_rate": float(fee_rate), "slippage": float(slippage)}
+
+    results: List[Dict[str, Any]] = []
+    runs = map_with_initializer(
+        _run_fold,
+        tasks,
+        _init_worker,
+        (cache_path, threshold, engine_args),
+        max_workers=max_workers,
+        worker_state=_worker_state,
+    )
+    for r in runs:
+        results.append(r)
+        if on_progress is not None:
+            on_progress(0.1 + 0.9 * len(results) / len(tasks))
+
+    return {
+        "folds": results,
+        "summary": _summary(results, initial_balance),
+        "meta": {
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "candles": int(cols["ts"].shape[0]),
+            "samples": int(n_samples),
+            "window": int(window),
+            "threshold": float(threshold),
+            "train_size": train_size,
+            "test_size": folds[0][1][1] - folds[0][1][0],
+            "feature_cache": {"path": cache_path, "hit": cache_hit},
+        },
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Walk-forward evaluation of the ML strategy on local history")
+    ap.add_argument("symbol")
+    ap.add_argument("timeframe")
+    ap.add_argument("--folds", type=int, default=5)
+    ap.add_argument("--test-size", type=int, default=None)
+    ap.add_argument("--train-size", type=int, default=None)
+    ap.add_argument("--threshold", type=float, default=0.001)
+    ap.add_argument("--fee-rate", type=float, default=0.0)
+    ap.add_argument("--workers", type=int, default=None)
+    a = ap.parse_args()
+    report = run_walk_forward(
+        a.symbol, a.timeframe, n_folds=a.folds, test_size=a.test_size, train_size=a.train_size,
+        threshold=a.threshold, fee_rate=a.fee_rate, max_workers=a.workers,
+    )
+    print(json.dumps(report, indent=2))
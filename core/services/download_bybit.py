@@ -1,36 +1,56 @@
-from web.bybit_client import get_klines
+from web.bybit_client import get_klines, get_klines_async
 import time
 
+
+def _mock_klines(limit):
+    candles = []
+    price = 50000
+    base_time = int(time.time()) - (limit * 60)
+    for i in range(limit):
+        candles.append({
+            "time": base_time + (i * 60),
+            "open": price,
+            "high": price + 50,
+            "low": price - 50,
+            "close": price + 10,
+            "volume": 100.0
+        })
+        price += 10
+    return candles
+
+
+def _check(candles):
+    # Check if we got an error response
+    if isinstance(candles, dict) and 'error' in candles:
+        raise Exception(candles.get('error', 'Unknown error'))
+
+    if not candles or len(candles) == 0:
+        raise Exception("No data returned")
+
+    return candles
+
+
 def download_klines(symbol="BTCUSDT", interval="1m", limit=500):
     """
     Download klines from Bybit Testnet.
     Falls back to mock data if API fails.
     """
     try:
-        candles = get_klines(symbol=symbol, interval=interval, limit=limit)
-        
-        # Check if we got an error response
-        if isinstance(candles, dict) and 'error' in candles:
-            raise Exception(candles.get('error', 'Unknown error'))
-        
-        if not candles or len(candles) == 0:
-            raise Exception("No data returned")
-        
-        return candles
+        return _check(get_klines(symbol=symbol, interval=interval, limit=limit))
     except Exception as e:
         # Fallback to mock data
         print(f"Warning: Bybit API failed ({e}), using mock data")
-        candles = []
-        price = 50000
-        base_time = int(time.time()) - (limit * 60)
-        for i in range(limit):
-            candles.append({
-                "time": base_time + (i * 60),
-                "open": price,
-                "high": price + 50,
-                "low": price - 50,
-                "close": price + 10,
-                "volume": 100.0
-            })
-            price += 10
-        return candles
+        return _mock_klines(limit)
+
+
+async def download_klines_async(symbol="BTCUSDT", interval="1m", limit=500, end=None):
+    """
+    Async download_klines over the shared HTTP client.
+    ``end`` (unix seconds) fetches the candles up to that time.
+    No mock fallback: these candles are merged into the live series, so API
+    errors raise and an empty answer (no history that far back) returns [].
+    """
+    candles = await get_klines_async(symbol=symbol, interval=interval, limit=limit, end=end)
+    if isinstance(candles, dict) and 'error' in candles:
+        raise Exception(candles.get('error', 'Unknown error'))
+    return candles or []
@@ -13,6 +13,7 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
+import importlib.util
 import json
 import random
 import os
@@ -22,8 +23,6 @@ from datetime import datetime, timezone
 import math
 import time
 import numpy as np
-import requests
-import csv
 from pathlib import Path
 
 log = logging.getLogger(__name__)
@@ -48,11 +47,19 @@ def normalize_mode(mode: str) -> str:
 
 from core.backtest.engine import BacktestEngine
 from core.ml.ml_service import MLService
+from core.ml.registry import ModelNotFound
 from core.ai.toni_service import ToniAIService, ToniContext
 from core.risk.risk_manager import RiskManager, RiskLimits
 from core.exchange.factory import create_exchange_provider
-from core.market_data.service import MarketDataService
+from core.exchange.http_client import get_http
+from core.market_data.service import get_market_data_service
+from core.market_data.frame import CandleFrame
+from core.market_data.ring import get_recent_candles
+from core.market_data.stream import MarketDataHub
+from core.market_data.history import HistoryIndex, pull_missing, write_history_csv
+from core.market_data.kline_downloader import BybitKlineDownloader
 from core.dashboard.service import DashboardSnapshot, get_dashboard_snapshot
+from core.executor import executor_stats, run_in_process, run_in_thread, shutdown_executors
 import yaml
 
 # === FASTAPI INITIALIZATION ===
@@ -220,7 +227,13 @@ risk_limits = RiskLimits(
 backtest_engine = BacktestEngine(risk_limits=risk_limits)
 ml_service = MLService()
 global_risk_manager = RiskManager(limits=risk_limits)
-market_data_service = MarketDataService()
+market_data_service = get_market_data_service()
+# Live klines over the exchange websockets keep the candle series fresh without REST polling
+market_data_hub = None
+if os.getenv("MARKET_DATA_STREAM", "1") != "0" and importlib.util.find_spec("websockets") is not None:
+    market_data_hub = MarketDataHub(service=market_data_service)
+    market_data_service.hub = market_data_hub
+recent_candles = get_recent_candles()
 
 # Default exchange provider
 default_exchange = config.get("exchange", {}).get("default", "bybit")
@@ -240,6 +253,24 @@ last_backtest_context = None
 
 # === HISTORY STORAGE HELPERS ===
 history_jobs = {}
+_history_downloader = BybitKlineDownloader()
+
+
+@app.on_event("shutdown")
+async def _close_http_clients() -> None:
+    await get_http().aclose()
+
+
+@app.on_event("shutdown")
+async def _shutdown_executors() -> None:
+    await asyncio.to_thread(shutdown_executors)
+
+
+@app.on_event("shutdown")
+async def _stop_market_data_hub() -> None:
+    if market_data_hub is not None:
+        await market_data_hub.stop()
+    await recent_candles.stop()
 
 def _parse_ts(value):
     if value is None:
@@ -267,104 +298,19 @@ def _history_file(exchange: str, symbol: str, timeframe: str, start_ts: int, end
 def _write_history_csv(path: Path, candles: list[dict]):
     if not candles:
         return
-    candles_sorted = sorted({int(c["time"]): c for c in candles if "time" in c}.values(), key=lambda x: x["time"])
-    with path.open("w", newline="") as f:
-        w = csv.writer(f)
-        w.writerow(["time", "open", "high", "low", "close", "volume"])
-        for c in candles_sorted:
-            w.writerow([c.get("time"), c.get("open"), c.get("high"), c.get("low"), c.get("close"), c.get("volume")])
+    write_history_csv(path, candles)
+    HistoryIndex(path.parent).register(path)
 
 def _load_history(exchange: str, symbol: str, timeframe: str, start_ts: int | None, end_ts: int | None) -> list[dict]:
     dirp = _history_dir(exchange, symbol, timeframe)
     if not dirp.exists():
         return []
-    files = sorted(dirp.glob("*.csv"))
-    rows: list[dict] = []
-    for fp in files:
-        try:
-            parts = fp.stem.split("-")
-            if len(parts) == 2:
-                f_start = int(parts[0])
-                f_end = int(parts[1])
-                if start_ts and f_end < start_ts:
-                    continue
-                if end_ts and f_start > end_ts:
-                    continue
-            with fp.open() as f:
-                reader = csv.DictReader(f)
-                for r in reader:
-                    t = _parse_ts(r.get("time"))
-                    if t is None:
-                        continue
-                    if start_ts and t < start_ts:
-                        continue
-                    if end_ts and t > end_ts:
-                        continue
-                    rows.append({
-                        "time": t,
-                        "open": float(r.get("open", 0)),
-                        "high": float(r.get("high", 0)),
-                        "low": float(r.get("low", 0)),
-                        "close": float(r.get("close", 0)),
-                        "volume": float(r.get("volume", 0)),
-                    })
-        except Exception:
-            continue
-    rows = sorted({c["time"]: c for c in rows}.values(), key=lambda x: x["time"])
-    return rows
-
-def _map_bybit_interval(tf: str) -> str:
-    tf = tf.lower().strip()
-    if tf.endswith("m"):
-        return tf[:-1] or "1"
-    if tf.endswith("h"):
-        return str(int(tf[:-1] or "1") * 60)
-    if tf.endswith("d"):
-        return "D"
-    if tf.endswith("w"):
-        return "W"
-    if tf.endswith("mth") or tf == "m":
-        return "M"
-    return tf
+    return HistoryIndex(dirp).load(start_ts or None, end_ts or None)
 
 def _bybit_history_page(symbol: str, timeframe: str, start_ms: int, end_ms: int, limit: int = 1000, category: str = "linear"):
-    url = "https://api.bybit.com/v5/market/kline"
-    interval_param = _map_bybit_interval(timeframe)
-    params = {
-        "category": category,
-        "symbol": symbol,
-        "interval": interval_param,
-        "limit": limit,
-        "start": start_ms,
-        "end": end_ms,
-    }
-    r = requests.get(url, params=params, timeout=10)
-    if r.status_code != 200:
-        raise Exception(f"http_error {r.status_code} url={url} params={params}")
-    j = r.json()
-    if j.get("retCode") != 0 or "result" not in j or "list" not in j["result"]:
-        raise Exception(f"bybit_error retCode={j.get('retCode')} msg={j.get('retMsg')} url={url} params={params}")
-    items = j["result"]["list"]
-    items = list(reversed(items))
-    candles = []
-    for it in items:
-        try:
-            candles.append({
-                "time": int(it[0]) // 1000,
-                "open": float(it[1]),
-                "high": float(it[2]),
-                "low": float(it[3]),
-                "close": float(it[4]),
-                "volume": float(it[5]),
-            })
-        except Exception:
-            continue
-    return candles
+    return _history_downloader.fetch_page(symbol, timeframe, start_ms, end_ms, limit=limit, category=category)
 
-def _download_history(symbol: str, timeframe: str, start_ts: int, end_ts: int, limit: int = 1000, category: str = "linear") -> list[dict]:
-    all_candles: list[dict] = []
-    cur_start = start_ts * 1000
-    end_ms = end_ts * 1000
+def _timeframe_step_seconds(timeframe: str) -> int:
     tf = timeframe.lower().strip()
     mul = 1
     if tf.endswith("h"):
@@ -382,16 +328,29 @@ def _download_history(symbol: str, timeframe: str, start_ts: int, end_ts: int, l
         tf_num = int(tf_val)
     except Exception:
         tf_num = 1
-    step_ms = max(tf_num * mul, 1) * 60 * 1000
-    while cur_start < end_ms:
-        next_end = min(cur_start + step_ms * limit, end_ms)
-        chunk = _bybit_history_page(symbol, timeframe, cur_start, next_end, limit=limit, category=category)
-        if not chunk:
-            break
-        all_candles.extend(chunk)
-        last_ts = chunk[-1]["time"]
-        cur_start = (last_ts * 1000) + step_ms
-    return all_candles
+    return max(tf_num * mul, 1) * 60
+
+def _download_history(symbol: str, timeframe: str, start_ts: int, end_ts: int, limit: int = 1000, category: str = "linear") -> list[dict]:
+    step = _timeframe_step_seconds(timeframe)
+    return _history_downloader.download(symbol, timeframe, start_ts, end_ts, step, limit=limit, category=category)
+
+def _pull_history(exchange: str, symbol: str, timeframe: str, start_ts: int, end_ts: int, job_id: str, limit: int = 1000, category: str = "linear") -> dict:
+    """Fetch only the ranges missing on disk, page by page, then compact the chunks."""
+    index = HistoryIndex(_history_dir(exchange, symbol, timeframe))
+
+    def fetch_page(start_ms: int, end_ms: int) -> list[dict]:
+        return _bybit_history_page(symbol, timeframe, start_ms, end_ms, limit=limit, category=category)
+
+    def fetch_pages(windows: list[tuple[int, int]]):
+        return _history_downloader.iter_pages(symbol, timeframe, windows, limit=limit, category=category)
+
+    def on_page(progress: dict) -> None:
+        history_jobs[job_id] = {"status": "running", "job_id": job_id, **progress}
+
+    return pull_missing(
+        index, fetch_page, start_ts, end_ts, _timeframe_step_seconds(timeframe),
+        limit=limit, on_page=on_page, fetch_pages=fetch_pages,
+    )
 # === ROUTES ===
 
 
@@ -532,6 +491,19 @@ async def api_candles(
     mode_normalized = normalize_mode(mode)
     
     try:
+        if source == "history":
+            candles = await asyncio.to_thread(_load_history, exchange, symbol, timeframe, start, end)
+            if limit and len(candles) > limit:
+                candles = candles[-limit:]
+            return {
+                "exchange": exchange,
+                "symbol": symbol,
+                "timeframe": timeframe,
+                "mode": mode_normalized,
+                "source": "history",
+                "candles": candles,
+                "count": len(candles),
+            }
         if mode_normalized == "TEST":
             # Test mode: return synthetic candles
             candles = _make_test_candles(symbol=symbol, timeframe=timeframe, limit=limit)
@@ -544,25 +516,15 @@ async def api_candles(
                 "count": len(candles),
             }
         else:
-            market_service = MarketDataService()
-            ohlcv_data = await market_service.get_candles(
+            frame = await market_data_service.get_frame(
                 exchange=exchange,
                 symbol=symbol,
                 timeframe=timeframe,
                 limit=limit,
                 mode="live"
             )
-            
-            candles = []
-            for candle in ohlcv_data:
-                candles.append({
-                    "time": candle.time,
-                    "open": float(candle.open),
-                    "high": float(candle.high),
-                    "low": float(candle.low),
-                    "close": float(candle.close),
-                    "volume": float(candle.volume),
-                })
+            # Straight from the columns: no intermediate OHLCV objects
+            candles = frame.to_records()
             
             return {
                 "exchange": exchange,
@@ -608,13 +570,13 @@ async def api_history_pull(payload: dict):
         return history_jobs[job_id]
 
     try:
-        candles = await asyncio.to_thread(_download_history, symbol, timeframe, start_ts, end_ts, limit=1000, category=category)
-        _write_history_csv(_history_file(exchange, symbol, timeframe, start_ts, end_ts), candles)
+        stats = await asyncio.to_thread(_pull_history, exchange, symbol, timeframe, start_ts, end_ts, job_id, limit=1000, category=category)
         history_jobs[job_id] = {
             "status": "done",
-            "count": len(candles),
-            "path": str(_history_file(exchange, symbol, timeframe, start_ts, end_ts)),
+            "count": stats["fetched"],
+            "path": str(_history_dir(exchange, symbol, timeframe)),
             "job_id": job_id,
+            **stats,
         }
     except Exception as e:
         history_jobs[job_id] = {"status": "error", "error": str(e), "job_id": job_id}
@@ -648,6 +610,44 @@ async def api_selfcheck():
         "candles_sample_len": len(candles),
     }
 
+def _ai_prediction(closes: np.ndarray, highs: np.ndarray, lows: np.ndarray):
+    """Momentum prediction for /api/ai/predict (runs on the thread pool)"""
+    # Calculate predictions based on recent price action
+    recent_prices = closes[-20:]
+    current_price = float(recent_prices[-1])
+    
+    # Calculate support and resistance
+    support = float(lows.min()) if len(lows) else current_price * 0.98
+    resistance = float(highs.max()) if len(highs) else current_price * 1.02
+    
+    # Predict next price (momentum extrapolation)
+    if len(recent_prices) >= 5:
+        momentum = float((recent_prices[-1] - recent_prices[-5]) / recent_prices[-5])
+    else:
+        momentum = 0
+    
+    predicted_change = momentum * 2  # Extrapolate momentum
+    price_target = current_price * (1 + predicted_change / 100)
+    
+    # Signal strength based on volatility and momentum
+    if len(recent_prices) > 1:
+        volatility = float(np.std(recent_prices)) / current_price * 100
+    else:
+        volatility = 0
+    signal_strength = min(100, max(0, abs(momentum) * 100 - volatility * 10))
+    
+    # Sentiment
+    if momentum > 0.01:
+        sentiment = "Сильное бычье"
+    elif momentum > 0:
+        sentiment = "Бычье"
+    elif momentum < -0.01:
+        sentiment = "Сильное медвежье"
+    else:
+        sentiment = "Медвежье"
+    
+    return price_target, predicted_change, signal_strength, sentiment, support, resistance
+
 @app.get("/api/ai/predict")
 async def api_ai_predict(
     symbol: str = Query("BTCUSDT", description="Trading pair symbol"),
@@ -655,19 +655,10 @@ async def api_ai_predict(
 ):
     """AI market prediction endpoint - provides price predictions and market analysis"""
     try:
-        from core.market_data.service import MarketDataService
+        # Recent market data, resident and shared with the other AI readers
+        window = await recent_candles.window("bybit", symbol, timeframe, 100)
         
-        # Get recent market data
-        market_service = MarketDataService()
-        ohlcv_data = await market_service.get_candles(
-            exchange="bybit",
-            symbol=symbol,
-            timeframe=timeframe,
-            limit=100,
-            mode="live"
-        )
-        
-        if not ohlcv_data or len(ohlcv_data) < 10:
+        if len(window["close"]) < 10:
             return JSONResponse({
                 "price_target": None,
                 "price_change": None,
@@ -677,43 +668,14 @@ async def api_ai_predict(
                 "resistance": None
             })
         
-        # Calculate predictions based on recent price action
-        recent_prices = [float(c.close) for c in ohlcv_data[-20:]]
-        current_price = recent_prices[-1]
-        
-        # Simple momentum-based prediction
-        
-        # Calculate support and resistance
-        highs = [float(c.high) for c in ohlcv_data[-50:]]
-        lows = [float(c.low) for c in ohlcv_data[-50:]]
-        support = min(lows) if lows else current_price * 0.98
-        resistance = max(highs) if highs else current_price * 1.02
-        
-        # Predict next price (momentum extrapolation)
-        if len(recent_prices) >= 5:
-            momentum = (recent_prices[-1] - recent_prices[-5]) / recent_prices[-5]
-        else:
-            momentum = 0
-        
-        predicted_change = momentum * 2  # Extrapolate momentum
-        price_target = current_price * (1 + predicted_change / 100)
-        
-        # Signal strength based on volatility and momentum
-        if len(recent_prices) > 1:
-            volatility = np.std(recent_prices) / current_price * 100
-        else:
-            volatility = 0
-        signal_strength = min(100, max(0, abs(momentum) * 100 - volatility * 10))
-        
-        # Sentiment
-        if momentum > 0.01:
-            sentiment = "Сильное бычье"
-        elif momentum > 0:
-            sentiment = "Бычье"
-        elif momentum < -0.01:
-            sentiment = "Сильное медвежье"
-        else:
-            sentiment = "Медвежье"
+        # Copies: the views share the ring, whose forming bar the loop keeps
+        # rewriting while the thread computes
+        closes = np.array(window["close"][-50:])
+        highs = np.array(window["high"][-50:])
+        lows = np.array(window["low"][-50:])
+        price_target, predicted_change, signal_strength, sentiment, support, resistance = await run_in_thread(
+            _ai_prediction, closes, highs, lows
+        )
         
         return JSONResponse({
             "price_target": round(price_target, 2),
@@ -810,7 +772,9 @@ async def api_backtest_run(request: "Request"):
         rr_ratio = float(body.get("rr_ratio", q("rr_ratio", 4.0)))
         limit = int(body.get("limit", q("limit", 500)))
 
-        result = backtest_engine.run(
+        # Backtests are pure-Python loops; run them in the process pool
+        result = await run_in_process(
+            backtest_engine.run,
             symbol=symbol,
             interval=interval,
             strategy=strategy,
@@ -1036,6 +1000,75 @@ async def api_ml_predict(
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
+ML_BATCH_MAX_ITEMS = int(os.getenv("ML_BATCH_MAX_ITEMS", "500"))
+
+@app.post("/api/ml/predict/batch")
+async def api_ml_predict_batch(request: Request):
+    """
+    ML predictions for many symbols in one call.
+
+    Body: {"symbols": [...], "interval": "15m", "limit": 100} or
+    {"items": [{"symbol": ..., "interval": ...}, ...]} for mixed timeframes.
+    """
+    try:
+        body = await request.json()
+    except (ValueError, json.JSONDecodeError):
+        return JSONResponse({"error": "Invalid JSON"}, status_code=400)
+    if not isinstance(body, dict):
+        return JSONResponse({"error": "Expected a JSON object"}, status_code=400)
+    interval = str(body.get("interval", "15m"))
+    items = [(str(s), interval) for s in body.get("symbols") or []]
+    items += [
+        (str(it["symbol"]), str(it.get("interval", interval)))
+        for it in body.get("items") or []
+        if isinstance(it, dict) and it.get("symbol")
+    ]
+    if not items:
+        return JSONResponse({"error": "No symbols given"}, status_code=400)
+    if len(items) > ML_BATCH_MAX_ITEMS:
+        return JSONResponse({"error": f"At most {ML_BATCH_MAX_ITEMS} symbols per request"}, status_code=400)
+    try:
+        limit = int(body.get("limit", 100))
+    except (TypeError, ValueError):
+        return JSONResponse({"error": "limit must be an integer"}, status_code=400)
+    result = await ml_service.predict_batch(items, limit=limit)
+    return JSONResponse(result, status_code=500 if "error" in result else 200)
+
+@app.get("/api/ml/models")
+async def api_ml_models():
+    """List registered model versions and which one is promoted/active"""
+    return JSONResponse(ml_service.list_versions())
+
+@app.post("/api/ml/models/reload")
+async def api_ml_models_reload():
+    """Load the promoted model version without restarting the server"""
+    try:
+        version = await ml_service.reload()
+        return JSONResponse({"active": version})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.post("/api/ml/models/{version}/promote")
+async def api_ml_models_promote(version: str):
+    """Promote a stored model version and switch to it"""
+    try:
+        active = await ml_service.promote(version)
+        return JSONResponse({"active": active})
+    except ModelNotFound:
+        return JSONResponse({"error": f"unknown model version {version}"}, status_code=404)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.get("/api/system/executors")
+async def api_system_executors():
+    """Thread/process pool load: in-flight tasks, queue depth, wait and run times"""
+    return JSONResponse(executor_stats())
+
+@app.get("/api/market-data/stats")
+async def api_market_data_stats():
+    """Market data cache (hits, misses, evictions, bytes), request coalescing and resident candle counters"""
+    return JSONResponse({**market_data_service.stats(), "recent": recent_candles.stats()})
+
 @app.get("/api/risk/status")
 async def api_risk_status():
     """Get current risk management status"""
@@ -1304,6 +1337,46 @@ async def websocket_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         print("🔴 WebSocket disconnected")
 
+@app.websocket("/ws/candles")
+async def ws_candles(
+    websocket: WebSocket,
+    exchange: str = Query("bybit"),
+    symbol: str = Query("BTCUSDT"),
+    timeframe: str = Query("1m"),
+):
+    """
+    Live candles for one symbol/timeframe.
+    Sends the latest candles on connect (from the stream buffer for exchanges
+    without REST candles), then every kline update from the exchange stream.
+    """
+    await websocket.accept()
+    if market_data_hub is None or not market_data_hub.supports(exchange, timeframe):
+        await websocket.send_json({"type": "error", "message": f"No live stream for {exchange} {timeframe}"})
+        await websocket.close()
+        return
+    sub = market_data_hub.subscribe(exchange, symbol, timeframe)
+    try:
+        if exchange.lower() in market_data_service.providers:
+            frame = await market_data_service.get_frame(exchange, symbol, timeframe, limit=200)
+        else:
+            # No REST candles for this exchange: whatever the stream has pushed so far
+            frame = CandleFrame.from_records(market_data_hub.recent(exchange, symbol, timeframe, limit=200))
+        await websocket.send_json({
+            "type": "snapshot",
+            "exchange": exchange.lower(),
+            "symbol": symbol.upper(),
+            "timeframe": timeframe,
+            "candles": frame.to_records(),
+        })
+        while True:
+            await websocket.send_json(await sub.queue.get())
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        log.warning("Candle WebSocket error: %s", e)
+    finally:
+        market_data_hub.unsubscribe(sub)
+
 @app.websocket("/ws/dashboard")
 async def ws_dashboard(websocket: WebSocket):
     """
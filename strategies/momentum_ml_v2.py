@@ -15,6 +15,8 @@ import numpy as np
 from typing import List, Dict, Any
 from datetime import datetime
 
+from core.indicators import rolling_mean, rolling_min, rsi
+
 
 def momentum_ml_v2(df: pd.DataFrame, risk_per_trade: float = 100.0, rr_ratio: float = 4.0) -> List[Dict[str, Any]]:
     """
@@ -53,48 +55,28 @@ def momentum_ml_v2(df: pd.DataFrame, risk_per_trade: float = 100.0, rr_ratio: fl
     ma_short = 20
     ma_long = 50
     
-    # RSI calculation
-    def calculate_rsi(prices, period=14):
-        """Calculate RSI indicator"""
-        if len(prices) < period + 1:
-            return 50.0
-        
-        deltas = np.diff(prices)
-        gains = np.where(deltas > 0, deltas, 0)
-        losses = np.where(deltas < 0, -deltas, 0)
-        
-        avg_gain = np.mean(gains[-period:])
-        avg_loss = np.mean(losses[-period:])
-        
-        if avg_loss == 0:
-            return 100.0 if avg_gain > 0 else 50.0
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+    # Indicator series over the whole history, computed once
+    ma_short_series = rolling_mean(closes, ma_short)
+    ma_long_series = rolling_mean(closes, ma_long)
+    rsi_series = rsi(closes, 14)
+    avg_volume_series = rolling_mean(volumes, 20)
+    swing_low_series = rolling_min(lows, 20)
     
     # Check for signals starting from index where we have enough data
     for i in range(ma_long, len(df_list) - 3):
-        # Get recent data for indicators
-        recent_closes = closes[i-ma_long:i+1]
-        recent_lows = lows[i-ma_long:i+1]
-        recent_volumes = volumes[i-ma_long:i+1]
-        
-        # Calculate indicators
         current_price = closes[i]
-        ma_short_value = np.mean(recent_closes[-ma_short:])
-        ma_long_value = np.mean(recent_closes[-ma_long:])
-        rsi = calculate_rsi(recent_closes[-15:])
-        avg_volume = np.mean(recent_volumes[-20:])
-        current_volume = recent_volumes[-1]
+        ma_short_value = ma_short_series[i]
+        ma_long_value = ma_long_series[i]
+        rsi_value = rsi_series[i]
+        avg_volume = avg_volume_series[i]
+        current_volume = volumes[i]
         
-        # Find swing low for stop loss
-        lookback = min(20, i)
-        swing_low = min(recent_lows[-lookback:])
+        # Swing low over the last 20 bars for stop loss
+        swing_low = swing_low_series[i]
         
         # Entry conditions for LONG
         is_uptrend = ma_short_value > ma_long_value
-        is_oversold = rsi < 40
+        is_oversold = rsi_value < 40
         volume_confirmation = current_volume > avg_volume * 1.2
         price_above_ma = current_price > ma_short_value
         
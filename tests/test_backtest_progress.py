@@ -0,0 +1,86 @@
+import json
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.backtest import api as backtest_api
+from core.backtest.candle_store import read_csv_columns
+from core.backtest.engine import run_backtest
+from core.backtest.progress import PROGRESS_CHUNK, Stages, Throttle
+from core.backtest.store import BacktestStore
+from core.backtest.strategies import sma_cross
+from core.backtest.vector_engine import candles_to_arrays, run_backtest_vectorized
+from tests.test_backtest_vector_parity import make_candles
+
+
+def test_throttle_and_stages() -> None:
+    clock = [0.0]
+    seen = []
+    throttle = Throttle(seen.append, min_interval=1.0, clock=lambda: clock[0])
+    for p in (0.0, 0.1, 0.2):
+        throttle(p)
+    clock[0] = 1.5
+    throttle(0.3)
+    throttle(0.25)
+    throttle(1.0)
+    assert seen == [0.0, 0.3, 1.0]
+
+    out = []
+    stages = Stages(out.append, [("load", 1), ("simulate", 3)])
+    stages.stage("load")(1.0)
+    stages.stage("simulate")(0.5)
+    assert out == [0.25, 0.625]
+
+
+def test_engines_report_chunk_progress() -> None:
+    candles = make_candles(PROGRESS_CHUNK * 2 + 5, 3)
+    signals = sma_cross(candles, {"fast": 5, "slow": 20})
+
+    scalar = []
+    run_backtest(candles, signals, 1000.0, 0.0004, 0.0002, on_progress=scalar.append)
+    assert len(scalar) == 3 and scalar[-1] == 1.0
+    assert scalar == sorted(scalar)
+
+    vector = []
+    cols = candles_to_arrays(candles)
+    run_backtest_vectorized(cols["ts"], cols["close"], signals, 1000.0, 0.0004, 0.0002, on_progress=vector.append)
+    assert vector[0] == 0.0 and vector[-1] == 1.0
+    assert vector == sorted(vector)
+
+
+def test_csv_import_reports_progress(tmp_path) -> None:
+    path = tmp_path / "c.csv"
+    rows = ["ts,open,high,low,close,volume"] + [f"{1_700_000_000 + i * 60},1,2,0.5,1.5,3" for i in range(250_000)]
+    path.write_text("\n".join(rows) + "\n")
+    seen = []
+    cols = read_csv_columns(str(path), on_progress=seen.append)
+    assert cols["ts"].shape[0] == 250_000
+    assert len(seen) == 2 and 0.0 < seen[0] < seen[1] < 1.0
+
+
+def test_status_stream_pushes_changes_until_done(monkeypatch, tmp_path) -> None:
+    # a private store, so the test writes no job artifacts into reports/
+    store = BacktestStore(str(tmp_path))
+    monkeypatch.setattr(backtest_api, "_store", store)
+    monkeypatch.setattr(backtest_api, "_feed", backtest_api._StatusFeed(store))
+    app = FastAPI()
+    app.include_router(backtest_api.router)
+    job = store.create({"kind": "test"})
+
+    def work() -> None:
+        time.sleep(0.2)
+        store.set_running(job.job_id)
+        store.set_progress(job.job_id, 0.5)
+        store.set_done(job.job_id, {"metrics": {}})
+
+    threading.Thread(target=work, daemon=True).start()
+    with TestClient(app) as client:
+        with client.stream("GET", f"/api/backtest/stream/{job.job_id}") as r:
+            assert r.headers["content-type"].startswith("text/event-stream")
+            events = [json.loads(line[6:]) for line in r.iter_lines() if line.startswith("data: ")]
+
+    assert [e["status"] for e in events] == ["queued", "running", "running", "done"]
+    assert events[2]["progress"] == 0.5
+    assert client.get("/api/backtest/stream/missing").status_code == 404
@@ -0,0 +1,93 @@
+import time
+
+from core.backtest.scheduler import JobScheduler
+from core.backtest.store import BacktestStore
+
+
+def sleepy_job(payload, report):
+    report(0.5)
+    time.sleep(payload.get("sleep", 0.0))
+    return {"value": payload["value"]}
+
+
+def failing_job(payload, report):
+    raise ValueError("bad params")
+
+
+def wait_for(store, job_ids, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if all(store.get(j).status in ("done", "error", "cancelled") for j in job_ids):
+            return
+        time.sleep(0.05)
+    raise AssertionError("jobs did not finish")
+
+
+def test_queue_positions_cancel_and_results(tmp_path) -> None:
+    store = BacktestStore(str(tmp_path))
+    scheduler = JobScheduler(store, max_workers=1, per_user_limit=5)
+    try:
+        jobs = [store.create({"value": i}) for i in range(3)]
+        positions = [scheduler.submit(j.job_id, sleepy_job, {"value": i, "sleep": 0.3}) for i, j in enumerate(jobs)]
+        assert positions == [0, 1, 2]
+        assert store.get(jobs[0].job_id).status == "running"
+
+        assert scheduler.cancel(jobs[2].job_id)
+        assert scheduler.position(jobs[1].job_id) == 1
+        assert scheduler.position(jobs[2].job_id) is None
+
+        wait_for(store, [j.job_id for j in jobs])
+        assert store.get(jobs[0].job_id).result == {"value": 0}
+        assert store.get(jobs[1].job_id).result == {"value": 1}
+        assert store.get(jobs[2].job_id).status == "cancelled"
+        assert not scheduler.cancel(jobs[0].job_id)
+    finally:
+        scheduler.shutdown()
+
+
+def test_per_user_cap_lets_other_users_through(tmp_path) -> None:
+    store = BacktestStore(str(tmp_path))
+    scheduler = JobScheduler(store, max_workers=2, per_user_limit=1)
+    try:
+        a1, a2, b1 = (store.create({}) for _ in range(3))
+        scheduler.submit(a1.job_id, sleepy_job, {"value": 1, "sleep": 0.5}, user="alice")
+        assert scheduler.submit(a2.job_id, sleepy_job, {"value": 2}, user="alice") == 1
+        assert scheduler.submit(b1.job_id, sleepy_job, {"value": 3}, user="bob") == 0
+        assert store.get(b1.job_id).status == "running"
+        assert scheduler.stats()["per_user"] == {"alice": 1, "bob": 1}
+        wait_for(store, [a1.job_id, a2.job_id, b1.job_id])
+        assert store.get(a2.job_id).result == {"value": 2}
+    finally:
+        scheduler.shutdown()
+
+
+def test_priority_and_errors(tmp_path) -> None:
+    store = BacktestStore(str(tmp_path))
+    scheduler = JobScheduler(store, max_workers=1)
+    try:
+        first, low, high = (store.create({}) for _ in range(3))
+        scheduler.submit(first.job_id, failing_job, {})
+        scheduler.submit(low.job_id, sleepy_job, {"value": 0})
+        scheduler.submit(high.job_id, sleepy_job, {"value": 1}, priority=5)
+        assert scheduler.position(high.job_id) == 1
+        wait_for(store, [first.job_id, low.job_id, high.job_id])
+        assert store.get(first.job_id).error == "bad params"
+        assert store.get(high.job_id).updated_at <= store.get(low.job_id).updated_at
+    finally:
+        scheduler.shutdown()
+
+
+def test_parts_merge_in_order_and_one_failure_fails_the_job(tmp_path) -> None:
+    store = BacktestStore(str(tmp_path))
+    scheduler = JobScheduler(store, max_workers=2, per_user_limit=2)
+    try:
+        ok, bad = store.create({}), store.create({})
+        payloads = [{"value": i, "sleep": 0.2 * (3 - i)} for i in range(3)]
+        scheduler.submit_parts(ok.job_id, sleepy_job, payloads, lambda results: {"values": [r["value"] for r in results]})
+        scheduler.submit_parts(bad.job_id, failing_job, [{}, {}], lambda results: {"merged": True})
+        wait_for(store, [ok.job_id, bad.job_id])
+        assert store.get(ok.job_id).result == {"values": [0, 1, 2]}
+        assert store.get(bad.job_id).status == "error" and store.get(bad.job_id).result is None
+        assert not scheduler.cancel(bad.job_id)
+    finally:
+        scheduler.shutdown()
@@ -0,0 +1,77 @@
+import json
+import os
+import time
+
+from core.backtest.store import BacktestStore
+
+
+def test_progress_appends_events_and_result_is_written_once(tmp_path) -> None:
+    store = BacktestStore(str(tmp_path))
+    job = store.create({"symbol": "BTCUSDT"})
+    store.set_running(job.job_id)
+    for i in range(10):
+        store.set_progress(job.job_id, i / 10)
+    result_path = tmp_path / "results" / f"{job.job_id}.json"
+    assert not result_path.exists()
+
+    result = {"equity_curve": [[1, 1000.0]] * 100, "trades": [], "metrics": {"total_return": 0.1}}
+    store.set_done(job.job_id, result)
+    assert json.loads(result_path.read_text()) == result
+    assert "\n" not in result_path.read_text()
+
+    events = [json.loads(line) for line in (tmp_path / "events.jsonl").read_text().splitlines()]
+    assert [e["e"] for e in events] == ["create", "running"] + ["progress"] * 10 + ["done"]
+    assert all("result" not in e for e in events)
+
+
+def test_jobs_survive_restart(tmp_path) -> None:
+    store = BacktestStore(str(tmp_path))
+    done = store.create({"a": 1})
+    store.set_done(done.job_id, {"metrics": {"x": 1}})
+    failed = store.create({"a": 2})
+    store.set_error(failed.job_id, "boom")
+    running = store.create({"a": 3})
+    store.set_running(running.job_id)
+
+    with open(tmp_path / "events.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"e":"progress","job_id"')  # torn write
+
+    reloaded = BacktestStore(str(tmp_path))
+    job = reloaded.get(done.job_id)
+    assert job.status == "done" and job.request == {"a": 1}
+    assert job.result == {"metrics": {"x": 1}}
+    assert reloaded.get(failed.job_id).error == "boom"
+    interrupted = reloaded.get(running.job_id)
+    assert interrupted.status == "error" and "restart" in interrupted.error
+
+
+def test_expire_drops_old_jobs_and_compacts_log(tmp_path) -> None:
+    store = BacktestStore(str(tmp_path), ttl_seconds=60)
+    old = store.create({})
+    store.set_done(old.job_id, {"r": 1})
+    fresh = store.create({})
+    for i in range(5):
+        store.set_progress(fresh.job_id, i / 5)
+
+    assert store.expire(now=time.time() + 120) == 1
+    assert store.get(old.job_id) is None
+    assert not os.path.exists(tmp_path / "results" / f"{old.job_id}.json")
+    lines = (tmp_path / "events.jsonl").read_text().splitlines()
+    assert len(lines) == 1 and json.loads(lines[0])["job_id"] == fresh.job_id
+
+    assert json.loads(lines[0])["progress"] == 0.8
+
+
+def test_legacy_job_files_are_readable(tmp_path) -> None:
+    legacy = {
+        "job_id": "abc",
+        "status": "done",
+        "created_at": 1.0,
+        "updated_at": 2.0,
+        "progress": 1.0,
+        "request": {},
+        "result": {"metrics": {}},
+        "error": None,
+    }
+    (tmp_path / "abc.json").write_text(json.dumps(legacy, indent=2))
+    assert BacktestStore(str(tmp_path)).get("abc").result == {"metrics": {}}
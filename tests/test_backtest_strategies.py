@@ -0,0 +1,82 @@
+import math
+from typing import List
+
+import numpy as np
+import pytest
+
+from core.backtest.data import Candle
+from core.backtest.strategies import RollingMean, SmaCrossState, rolling_mean, sma_cross
+from tests.test_backtest_vector_parity import make_candles
+
+
+def naive_sma_cross(candles: List[Candle], fast: int, slow: int) -> List[int]:
+    # the original O(n*w) implementation, kept as the reference
+    closes = [c.close for c in candles]
+    sig = [0] * len(closes)
+
+    def sma(i: int, n: int) -> float:
+        if i + 1 < n:
+            return sum(closes[: i + 1]) / float(i + 1)
+        return sum(closes[i - n + 1 : i + 1]) / float(n)
+
+    prev = 0
+    for i in range(len(closes)):
+        f, s = sma(i, fast), sma(i, slow)
+        # equal means (flat closes) are not a cross, whatever their rounding residue
+        cur = 0 if math.isclose(f, s, rel_tol=1e-9) else 1 if f > s else -1
+        if i > 0:
+            if prev <= 0 and cur > 0:
+                sig[i] = 1
+            elif prev >= 0 and cur < 0:
+                sig[i] = -1
+        prev = cur
+    return sig
+
+
+@pytest.mark.parametrize("fast,slow", [(5, 20), (10, 30), (50, 200)])
+def test_sma_cross_matches_naive_reference(fast: int, slow: int) -> None:
+    candles = make_candles(5000, fast)
+    assert sma_cross(candles, {"fast": fast, "slow": slow}) == naive_sma_cross(candles, fast, slow)
+
+
+def flat_stretch_candles(n: int, seed: int) -> List[Candle]:
+    # a random walk that repeatedly stalls on one price for a while
+    candles = make_candles(n, seed)
+    rng = np.random.default_rng(seed)
+    price = candles[0].close
+    hold = 0
+    for c in candles:
+        if hold:
+            hold -= 1
+        else:
+            price = c.close
+            if rng.random() < 0.05:
+                hold = int(rng.integers(20, 300))
+        c.close = price
+    return candles
+
+
+@pytest.mark.parametrize("fast,slow", [(5, 20), (10, 30), (50, 200)])
+def test_sma_cross_matches_naive_reference_on_flat_stretches(fast: int, slow: int) -> None:
+    candles = flat_stretch_candles(20_000, fast)
+    signals = sma_cross(candles, {"fast": fast, "slow": slow})
+    assert signals == naive_sma_cross(candles, fast, slow)
+    state = SmaCrossState({"fast": fast, "slow": slow})
+    assert [state.update(c.close) for c in candles] == signals
+
+
+def test_rolling_mean_expanding_start_and_window() -> None:
+    out = rolling_mean([1.0, 2.0, 3.0, 4.0, 5.0], 3)
+    assert np.allclose(out, [1.0, 1.5, 2.0, 3.0, 4.0])
+    assert rolling_mean([], 3).size == 0
+
+
+def test_streaming_state_is_identical_to_batch() -> None:
+    candles = make_candles(3000, 4)
+    closes = [c.close for c in candles]
+    stream = RollingMean(25)
+    assert [stream.update(x) for x in closes] == rolling_mean(closes, 25).tolist()
+
+    params = {"fast": 7, "slow": 7}  # slow is bumped to fast + 5 like the batch form
+    state = SmaCrossState(params)
+    assert [state.update(x) for x in closes] == sma_cross(candles, params)
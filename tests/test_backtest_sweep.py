@@ -0,0 +1,105 @@
+import functools
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import core.backtest.api as backtest_api
+import core.backtest.jobs as backtest_jobs
+
+from core.backtest.engine import run_backtest
+from core.backtest.scheduler import JobScheduler
+from core.backtest.store import BacktestStore
+from core.backtest.strategies import sma_cross
+from core.backtest.sweep import expand_grid, rank_results, run_sweep, run_sweep_on_candles
+
+from tests.test_backtest_scheduler import wait_for
+from tests.test_backtest_vector_parity import make_candles
+
+
+def test_expand_grid_lists_and_ranges() -> None:
+    combos = expand_grid({"fast": [5, 10], "slow": {"start": 20, "stop": 40, "step": 10}})
+    assert len(combos) == 6
+    assert combos[0] == {"fast": 5, "slow": 20}
+    assert combos[-1] == {"fast": 10, "slow": 40}
+    assert expand_grid({}) == [{}]
+
+
+def test_expand_grid_rejects_bad_specs() -> None:
+    with pytest.raises(ValueError):
+        expand_grid({"fast": {"start": 10, "stop": 5, "step": 1}})
+    with pytest.raises(ValueError):
+        expand_grid({"a": list(range(200)), "b": list(range(200))})
+    for bad in ({"start": "5", "stop": 20}, [5, [10]], [{"fast": 5}], {1, 2}):
+        with pytest.raises(ValueError):
+            expand_grid({"fast": bad})
+
+
+def test_sweep_endpoint_rejects_bad_grid_with_400() -> None:
+    app = FastAPI()
+    app.include_router(backtest_api.router)
+    with TestClient(app) as client:
+        resp = client.post("/api/backtest/sweep", json={"grid": {"fast": {"start": "a", "stop": 5}}})
+        nested = client.post("/api/backtest/sweep", json={"grid": {"fast": [[5, 10]]}})
+        unknown_metric = client.post("/api/backtest/sweep", json={"grid": {"fast": [5]}, "rank_by": "sharpe"})
+    assert resp.status_code == 400 and "fast" in resp.json()["detail"]
+    assert nested.status_code == 400
+    assert unknown_metric.status_code == 400 and "rank_by" in unknown_metric.json()["detail"]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_sweep_matches_single_runs(max_workers: int) -> None:
+    candles = make_candles(1500, 3)
+    combos = expand_grid({"fast": [3, 5, 8], "slow": [20, 30]})
+    progress = []
+    results = run_sweep_on_candles(
+        candles, "sma_cross", combos, 1000.0, 0.0004, 0.0002,
+        max_workers=max_workers, on_progress=lambda done, total: progress.append((done, total)),
+    )
+    assert progress[-1] == (len(combos), len(combos))
+    assert [r["params"] for r in results] == combos
+    for r in results:
+        expected = run_backtest(candles, sma_cross(candles, r["params"]), 1000.0, 0.0004, 0.0002)
+        assert r["metrics"] == expected["metrics"]
+
+    ranked = rank_results(results, "total_return")
+    returns = [r["metrics"]["total_return"] for r in ranked]
+    assert returns == sorted(returns, reverse=True)
+    assert [r["rank"] for r in ranked] == list(range(1, len(combos) + 1))
+    with pytest.raises(ValueError):
+        rank_results(results, "sharpe")
+
+
+def test_sweep_parts_share_the_scheduler_pool_and_merge_like_one_run(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    with open("data/BTCUSDT_1m.csv", "w", encoding="utf-8") as f:
+        f.write("ts,open,high,low,close,volume\n")
+        for c in make_candles(800, 5):
+            f.write(f"{c.ts},{c.open},{c.high},{c.low},{c.close},{c.volume}\n")
+    payload = backtest_api.SweepRequest(
+        symbol="BTCUSDT", timeframe="1m", grid={"fast": [3, 5, 8], "slow": [20, 30]}, rank_by="final_balance"
+    ).model_dump()
+    parts = backtest_jobs.sweep_parts(payload, part_size=2)
+    assert [len(p["combos"]) for p in parts] == [2, 2, 2]
+
+    store = BacktestStore(str(tmp_path / "jobs"))
+    scheduler = JobScheduler(store, max_workers=3, per_user_limit=2)
+    try:
+        sweep = store.create(payload)
+        other = store.create({})
+        scheduler.submit_parts(
+            sweep.job_id, backtest_jobs.run_sweep_part, parts,
+            functools.partial(backtest_jobs.merge_sweep_parts, payload), user="alice",
+        )
+        # two parts take alice's share of the pool; bob still gets the third worker
+        assert scheduler.submit(other.job_id, backtest_jobs.run_sweep_part, parts[0], user="bob") == 0
+        stats = scheduler.stats()
+        assert (stats["running"], stats["queued_parts"], stats["per_user"]) == (3, 1, {"alice": 2, "bob": 1})
+        wait_for(store, [sweep.job_id, other.job_id])
+    finally:
+        scheduler.shutdown()
+
+    expected = run_sweep("BTCUSDT", "1m", None, None, "sma_cross", payload["grid"], 1000.0, 0.0004, 0.0002,
+                         rank_by="final_balance", max_workers=1)
+    assert store.get(sweep.job_id).result == expected
@@ -0,0 +1,89 @@
+"""
+Parity harness: the NumPy engine must reproduce the scalar reference engine.
+"""
+
+import random
+from typing import List
+
+import pytest
+
+from core.backtest.data import Candle
+from core.backtest.engine import run_backtest
+from core.backtest.strategies import buy_and_hold, sma_cross
+from core.backtest.vector_engine import candles_to_arrays, run_backtest_vectorized
+
+
+def make_candles(n: int, seed: int, start_price: float = 100.0) -> List[Candle]:
+    rng = random.Random(seed)
+    candles: List[Candle] = []
+    price = start_price
+    for i in range(n):
+        o = price
+        price = max(0.01, price * (1.0 + rng.gauss(0.0, 0.01)))
+        candles.append(
+            Candle(
+                ts=1_700_000_000 + i * 60,
+                open=o,
+                high=max(o, price) * 1.001,
+                low=min(o, price) * 0.999,
+                close=price,
+                volume=rng.uniform(1.0, 10.0),
+            )
+        )
+    return candles
+
+
+def random_signals(n: int, seed: int, density: float) -> List[int]:
+    rng = random.Random(seed)
+    return [rng.choice((-1, 1)) if rng.random() < density else 0 for _ in range(n)]
+
+
+def assert_parity(candles: List[Candle], signals: List[int], initial_balance: float, fee_rate: float, slippage: float) -> None:
+    expected = run_backtest(candles, signals, initial_balance, fee_rate, slippage)
+    cols = candles_to_arrays(candles)
+    actual = run_backtest_vectorized(cols["ts"], cols["close"], signals, initial_balance, fee_rate, slippage)
+
+    assert actual["equity_curve"] == expected["equity_curve"]
+    assert actual["trades"] == expected["trades"]
+    assert actual["metrics"] == expected["metrics"]
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("density", [0.01, 0.2, 1.0])
+def test_random_signals_match_scalar_engine(seed: int, density: float) -> None:
+    candles = make_candles(2000, seed)
+    assert_parity(candles, random_signals(len(candles), seed + 100, density), 1000.0, 0.0004, 0.0002)
+
+
+@pytest.mark.parametrize("params", [{"fast": 5, "slow": 20}, {"fast": 10, "slow": 30}])
+def test_sma_cross_matches_scalar_engine(params) -> None:
+    candles = make_candles(3000, 7)
+    assert_parity(candles, sma_cross(candles, params), 1000.0, 0.001, 0.0005)
+
+
+def test_buy_and_hold_and_forced_close_match() -> None:
+    candles = make_candles(500, 11)
+    assert_parity(candles, buy_and_hold(candles, {}), 1000.0, 0.0004, 0.0002)
+
+    signals = [0] * len(candles)
+    signals[10] = 1  # never sold: closed on the last bar
+    assert_parity(candles, signals, 1000.0, 0.0004, 0.0002)
+
+
+def test_unfilled_buys_match() -> None:
+    candles = make_candles(300, 5)
+    assert_parity(candles, random_signals(len(candles), 9, 0.3), 0.0, 0.0004, 0.0002)
+
+    candles[20].close = 0.0  # buy at a non-positive price does not fill
+    signals = [0] * len(candles)
+    signals[20] = 1
+    signals[25] = 1
+    signals[40] = -1
+    assert_parity(candles, signals, 1000.0, 0.0, 0.0)
+
+
+def test_length_mismatch_raises() -> None:
+    candles = make_candles(10, 1)
+    cols = candles_to_arrays(candles)
+    with pytest.raises(RuntimeError):
+        run_backtest_vectorized(cols["ts"], cols["close"], [0] * 9, 1000.0, 0.0, 0.0)
@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+
+from core.backtest.candle_store import CandleStore
+from core.backtest.data import load_candles, load_columns
+from core.executor import spawn_pool
+
+
+def write_csv(path, rows) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("ts,open,high,low,close,volume\n")
+        for r in rows:
+            f.write(",".join(str(v) for v in r) + "\n")
+
+
+def test_import_sorts_dedups_and_range_queries(tmp_path) -> None:
+    csv_path = tmp_path / "in.csv"
+    # out of order, one duplicate (last wins) and millisecond timestamps
+    b = 1_700_000_000
+    write_csv(csv_path, [
+        ((b + 300) * 1000, 3, 3, 3, 3, 1),
+        (b + 100, 1, 1, 1, 1, 1),
+        (b + 200, 2, 2, 2, 2, 1),
+        (b + 300, 9, 9, 9, 9, 1),
+        (b + 400, 4, 4, 4, 4, 1),
+    ])
+    store = CandleStore(str(tmp_path / "store"))
+    meta = store.import_csv("BTCUSDT", "1m", str(csv_path))
+    assert meta["rows"] == 4
+    assert (meta["first_ts"], meta["last_ts"]) == (b + 100, b + 400)
+
+    cols = store.query("BTCUSDT", "1m")
+    assert (cols["ts"] - b).tolist() == [100, 200, 300, 400]
+    assert cols["close"].tolist() == [1.0, 2.0, 9.0, 4.0]
+    assert isinstance(store.columns("BTCUSDT", "1m")["close"], np.memmap)
+
+    assert (store.query("BTCUSDT", "1m", b + 150, b + 300)["ts"] - b).tolist() == [200, 300]
+    assert (store.query("BTCUSDT", "1m", b + 200, None, limit=2)["ts"] - b).tolist() == [200, 300]
+    assert store.query("BTCUSDT", "1m", b + 500, None)["ts"].tolist() == []
+    assert store.query("ETHUSDT", "1m") is None
+
+
+def test_load_candles_reads_through_store_and_reimports_on_change(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    write_csv("data/BTCUSDT_1h.csv", [(t, t, t, t, t, 1) for t in range(0, 36_000, 3600)])
+
+    candles = load_candles("BTCUSDT", "1h", "3600", "10800")
+    assert [c.ts for c in candles] == [3600, 7200, 10800]
+    assert os.path.exists("data/store/BTCUSDT_1h/meta.json")
+
+    write_csv("data/BTCUSDT_1h.csv", [(t, 1, 1, 1, 2.5, 1) for t in range(0, 7200, 3600)])
+    cols = load_columns("BTCUSDT", "1h", None, None)
+    assert cols["ts"].tolist() == [0, 3600]
+    assert cols["close"].tolist() == [2.5, 2.5]
+    # meta.json, the lock file, the current generation and the one it replaced
+    assert len(os.listdir("data/store/BTCUSDT_1h")) == 4
+
+
+def _import_if_stale(root, csv_path):
+    return CandleStore(root).import_if_stale("BTCUSDT", "1m", csv_path)
+
+
+def test_concurrent_processes_import_once(tmp_path) -> None:
+    csv_path = str(tmp_path / "in.csv")
+    write_csv(csv_path, [(t, 1, 1, 1, 1, 1) for t in range(0, 60_000, 60)])
+    root = str(tmp_path / "store")
+
+    with spawn_pool(2) as pool:
+        imported = list(pool.map(_import_if_stale, [root, root], [csv_path, csv_path]))
+
+    assert sorted(imported) == [False, True]
+
+
+def test_readers_survive_generations_retired_under_them(tmp_path, monkeypatch) -> None:
+    store = CandleStore(str(tmp_path / "store"))
+    reader = CandleStore(str(tmp_path / "store"))
+    gens = [store.write("BTCUSDT", "1m", {c: np.arange(n, dtype=float) for c in ("ts", "open", "high", "low", "close", "volume")})
+            for n in (1, 2, 3)]
+    base = tmp_path / "store" / "BTCUSDT_1m"
+    # the replaced generation stays for readers that just resolved it
+    assert not (base / gens[0]["generation"]).exists()
+    assert (base / gens[1]["generation"]).exists()
+
+    # a reader that resolved the retired generation re-reads meta.json once
+    real_meta = reader.meta
+    stale = iter([gens[0]])
+    monkeypatch.setattr(reader, "meta", lambda *a: next(stale, None) or real_meta(*a))
+    assert reader.columns("BTCUSDT", "1m")["ts"].tolist() == [0, 1, 2]
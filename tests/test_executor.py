@@ -0,0 +1,64 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.executor import WorkPool, map_with_initializer, processes, run_in_process
+
+_state = {}
+
+
+def _remember(offset):
+    _state["offset"] = offset
+
+
+def _shift(x):
+    return x + _state["offset"], os.getpid()
+
+
+def test_thread_pool_reports_queue_depth_and_failures():
+    pool = WorkPool("thread", 1, lambda n: ThreadPoolExecutor(max_workers=n))
+    release = threading.Event()
+
+    async def scenario():
+        loop_thread = threading.get_ident()
+        blocked = [asyncio.ensure_future(pool.run(release.wait)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        during = pool.stats()
+        release.set()
+        await asyncio.gather(*blocked)
+        ran_on = await pool.run(threading.get_ident)
+        with pytest.raises(ZeroDivisionError):
+            await pool.run(divmod, 1, 0)
+        return during, ran_on != loop_thread
+
+    try:
+        during, off_loop = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    assert off_loop
+    assert (during["in_flight"], during["queue_depth"]) == (3, 2)
+    after = pool.stats()
+    assert (after["in_flight"], after["queue_depth"], after["peak_in_flight"]) == (0, 0, 3)
+    assert (after["submitted"], after["completed"], after["failed"]) == (5, 4, 1)
+
+
+def test_process_pool_runs_in_another_process():
+    try:
+        pid = asyncio.run(run_in_process(os.getpid))
+    finally:
+        processes.shutdown()
+    assert pid != os.getpid()
+    assert processes.stats()["completed"] >= 1
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_map_with_initializer_sets_up_each_worker_once(max_workers):
+    out = list(map_with_initializer(_shift, range(6), _remember, (10,), max_workers=max_workers, worker_state=_state))
+
+    assert [x for x, _ in out] == list(range(10, 16))
+    assert (os.getpid() in {pid for _, pid in out}) == (max_workers == 1)
+    assert _state == {}
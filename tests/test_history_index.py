@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+
+import pytest
+
+import core.market_data.history as history_module
+from core.market_data.history import HistoryIndex, missing_ranges, pull_missing, write_history_csv
+
+
+def candle(t: int, close: float) -> dict:
+    return {"time": t, "open": close, "high": close, "low": close, "close": close, "volume": 1.0}
+
+
+def test_range_query_merges_overlapping_chunks(tmp_path) -> None:
+    write_history_csv(tmp_path / "100-400.csv", [candle(t, 1.0) for t in range(100, 500, 100)])
+    write_history_csv(tmp_path / "300-600.csv", [candle(t, 2.0) for t in range(300, 700, 100)])
+    write_history_csv(tmp_path / "900-1000.csv", [candle(900, 3.0), candle(1000, 3.0)])
+
+    index = HistoryIndex(tmp_path)
+    rows = index.load(200, 650)
+    assert [r["time"] for r in rows] == [200, 300, 400, 500, 600]
+    # overlapping timestamps come from the chunk whose name sorts last
+    assert [r["close"] for r in rows] == [1.0, 2.0, 2.0, 2.0, 2.0]
+
+    assert [c["file"] for c in index.chunks_for(650, 950)] == ["900-1000.csv"]
+    assert index.load(None, None)[-1]["time"] == 1000
+
+
+def test_manifest_records_chunks_and_tracks_changes(tmp_path) -> None:
+    path = tmp_path / "a.csv"
+    write_history_csv(path, [candle(10, 1.0), candle(20, 1.0)])
+    index = HistoryIndex(tmp_path)
+    index.register(path)
+
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    (chunk,) = manifest["chunks"]
+    assert (chunk["file"], chunk["start"], chunk["end"], chunk["rows"]) == ("a.csv", 10, 20, 2)
+    assert chunk["sorted"] is True
+    assert len(chunk["checksum"]) == 8
+
+    # hand-written, unsorted chunk is picked up on the next query and sorted on read
+    (tmp_path / "b.csv").write_text("time,open,high,low,close,volume\n30,5,5,5,5,1\n15,5,5,5,5,1\n")
+    assert [r["time"] for r in index.load(None, None)] == [10, 15, 20, 30]
+    chunks = {c["file"]: c for c in json.loads((tmp_path / "manifest.json").read_text())["chunks"]}
+    assert chunks["b.csv"]["sorted"] is False
+
+    (tmp_path / "b.csv").unlink()
+    assert [c["file"] for c in index.refresh()] == ["a.csv"]
+
+
+def test_verified_refresh_catches_edits_that_keep_size_and_mtime(tmp_path) -> None:
+    path = tmp_path / "a.csv"
+    write_history_csv(path, [candle(10, 1.0), candle(20, 1.0)])
+    index = HistoryIndex(tmp_path)
+    index.register(path)
+    st = os.stat(path)
+    path.write_bytes(path.read_bytes().replace(b"\n20,", b"\n25,"))
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    assert index.refresh()[0]["end"] == 20  # size and mtime alone trust the stale entry
+    assert index.refresh(verify=True)[0]["end"] == 25
+    assert json.loads((tmp_path / "manifest.json").read_text())["chunks"][0]["end"] == 25
+
+
+def test_compact_holds_the_directory_lock_while_rewriting(tmp_path, monkeypatch) -> None:
+    write_history_csv(tmp_path / "60-120.csv", [candle(60, 1.0), candle(120, 1.0)])
+    write_history_csv(tmp_path / "180-240.csv", [candle(180, 1.0), candle(240, 1.0)])
+    index = HistoryIndex(tmp_path)
+    held = []
+
+    def try_lock():
+        acquired = index._lock.acquire(blocking=False)
+        if acquired:
+            index._lock.release()
+        held.append(not acquired)
+
+    def write(path, rows):
+        # another thread's register() would have to wait here
+        probe = threading.Thread(target=try_lock)
+        probe.start()
+        probe.join()
+        return write_history_csv(path, rows)
+
+    monkeypatch.setattr(history_module, "write_history_csv", write)
+    assert index.compact(60) == 2
+    assert held == [True] and [c["file"] for c in index.refresh()] == ["60-240.csv"]
+
+
+def test_missing_ranges() -> None:
+    chunks = [{"start": 120, "end": 240, "rows": 3}, {"start": 480, "end": 600, "rows": 3}]
+    assert missing_ranges(chunks, 0, 720, 60) == [(0, 60), (300, 420), (660, 720)]
+    assert missing_ranges(chunks, 120, 240, 60) == []
+    assert missing_ranges([], 0, 120, 60) == [(0, 120)]
+
+
+class FakeExchange:
+    """Serves one candle per minute; optionally fails after a number of pages."""
+
+    def __init__(self, fail_after: int | None = None) -> None:
+        self.calls: list[tuple[int, int]] = []
+        self.fail_after = fail_after
+
+    def __call__(self, start_ms: int, end_ms: int) -> list[dict]:
+        if self.fail_after is not None and len(self.calls) >= self.fail_after:
+            raise ConnectionError("boom")
+        self.calls.append((start_ms // 1000, end_ms // 1000))
+        return [candle(t, 1.0) for t in range(start_ms // 1000, end_ms // 1000 + 1, 60)]
+
+
+def test_pull_fetches_only_gaps_resumes_and_compacts(tmp_path) -> None:
+    index = HistoryIndex(tmp_path)
+    write_history_csv(tmp_path / "600-1200.csv", [candle(t, 2.0) for t in range(600, 1260, 60)])
+
+    failing = FakeExchange(fail_after=2)
+    with pytest.raises(ConnectionError):
+        pull_missing(index, failing, 0, 3000, 60, limit=5)
+    # the two pages written before the failure stay on disk
+    assert failing.calls == [(0, 240), (300, 540)]
+
+    exchange = FakeExchange()
+    stats = pull_missing(index, exchange, 0, 3000, 60, limit=5)
+    assert exchange.calls[0] == (1260, 1500)
+    assert all(start >= 1260 for start, _ in exchange.calls)
+    assert stats["gaps"] == [[1260, 3000]]
+
+    rows = index.load(None, None)
+    assert [r["time"] for r in rows] == list(range(0, 3060, 60))
+    assert [c["file"] for c in index.refresh()] == ["0-3000.csv"]
+    # the chunk that was already on disk was never re-downloaded
+    assert {r["close"] for r in rows if 600 <= r["time"] <= 1200} == {2.0}
+
+    again = FakeExchange()
+    assert pull_missing(index, again, 0, 3000, 60, limit=5)["pages"] == 0
+    assert again.calls == []
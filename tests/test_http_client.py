@@ -0,0 +1,88 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.exchange.binance_provider import BinanceExchangeProvider
+from core.exchange.http_client import ExchangeHTTP
+
+
+class StubServer:
+    """Records client ports and peak concurrency; answers with a Binance-style kline list."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.ports = set()
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.ports.add(self.client_address[1])
+                    stub.active += 1
+                    stub.peak = max(stub.peak, stub.active)
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.active -= 1
+                raw = json.dumps([[1_700_000_000_000, "1", "2", "0.5", "1.5", "10"]]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    s = StubServer()
+    yield s
+    s.close()
+
+
+def test_sync_requests_reuse_connection(stub) -> None:
+    http = ExchangeHTTP()
+    for _ in range(5):
+        assert http.get_json(f"{stub.url}/api/v3/klines")[0][4] == "1.5"
+    assert len(stub.ports) == 1
+
+
+def test_async_per_host_limit_and_keepalive(stub) -> None:
+    stub.delay = 0.05
+    http = ExchangeHTTP(per_host_limit=2)
+
+    async def run():
+        try:
+            await asyncio.gather(*(http.aget_json(f"{stub.url}/x") for _ in range(8)))
+            await http.aget_json(f"{stub.url}/x")
+        finally:
+            await http.aclose()
+
+    asyncio.run(run())
+    assert stub.peak <= 2
+    assert len(stub.ports) <= 2
+
+
+def test_provider_uses_shared_async_client(stub) -> None:
+    provider = BinanceExchangeProvider(testnet=True)
+    provider.base_url = stub.url
+    candles = asyncio.run(provider.fetch_klines("BTCUSDT", "1m", limit=1))
+    assert candles and candles[0]["close"] == 1.5
@@ -0,0 +1,118 @@
+"""
+The vectorized kernels against the last-value formulas they replaced.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from core.indicators import IndicatorCache, Indicators, atr, ema, mfi, obv, rsi, stochastic_k, williams_r
+from core.indicators.kernels import rolling_max, rolling_std
+
+
+def make_ohlcv(n: int, seed: int):
+    rng = random.Random(seed)
+    price = 100.0
+    rows = []
+    for i in range(n):
+        o = price
+        price = max(0.01, price * (1.0 + rng.gauss(0.0, 0.01)))
+        rows.append({
+            "time": 1_700_000_000 + i * 60,
+            "open": o,
+            "high": max(o, price) * (1.0 + rng.uniform(0, 0.002)),
+            "low": min(o, price) * (1.0 - rng.uniform(0, 0.002)),
+            "close": price,
+            "volume": rng.uniform(1.0, 10.0),
+        })
+    return rows
+
+
+def ref_rsi(prices, period=14):
+    deltas = np.diff(prices)
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
+    avg_gain = np.mean(gains[-period:])
+    avg_loss = np.mean(losses[-period:])
+    if avg_loss == 0:
+        return 100 if avg_gain > 0 else 50
+    return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def ref_ema(data, period):
+    alpha = 2 / (period + 1)
+    value = data[0]
+    for price in data[1:]:
+        value = alpha * price + (1 - alpha) * value
+    return value
+
+
+def ref_atr(h, lo, c, period=14):
+    tr = [max(h[i] - lo[i], abs(h[i] - c[i - 1]), abs(lo[i] - c[i - 1])) for i in range(1, len(h))]
+    return np.mean(tr[-period:])
+
+
+def ref_mfi(h, lo, c, v, period=14):
+    tp = (h + lo + c) / 3
+    mf = tp * v
+    pos = neg = 0.0
+    for i in range(1, period + 1):
+        if tp[-i] > tp[-i - 1]:
+            pos += mf[-i]
+        else:
+            neg += mf[-i]
+    return 100 if neg == 0 else 100 - 100 / (1 + pos / neg)
+
+
+@pytest.mark.parametrize("end", [30, 57, 200])
+def test_series_match_last_value_formulas_at_every_bar(end: int) -> None:
+    rows = make_ohlcv(200, 1)
+    h = np.array([r["high"] for r in rows])
+    lo = np.array([r["low"] for r in rows])
+    c = np.array([r["close"] for r in rows])
+    v = np.array([r["volume"] for r in rows])
+    i = end - 1
+
+    assert rsi(c)[i] == pytest.approx(ref_rsi(c[:end]), rel=1e-9)
+    assert ema(c, 12)[i] == pytest.approx(ref_ema(c[:end], 12), rel=1e-12)
+    assert atr(h, lo, c)[i] == pytest.approx(ref_atr(h[:end], lo[:end], c[:end]), rel=1e-9)
+    assert mfi(h, lo, c, v)[i] == pytest.approx(ref_mfi(h[:end], lo[:end], c[:end], v[:end]), rel=1e-9)
+    assert rolling_std(c, 20)[i] == pytest.approx(np.std(c[end - 20:end]), rel=1e-6)
+    hh, ll = np.max(h[end - 14:end]), np.min(lo[end - 14:end])
+    assert stochastic_k(h, lo, c)[i] == pytest.approx((c[i] - ll) / (hh - ll) * 100)
+    assert williams_r(h, lo, c)[i] == pytest.approx((hh - c[i]) / (hh - ll) * -100)
+    signs = np.sign(np.diff(c[:end]))
+    assert obv(c, v)[i] == pytest.approx(float(np.sum(signs * v[1:end])))
+
+
+def test_rolling_max_has_expanding_head() -> None:
+    assert rolling_max([3.0, 1.0, 4.0, 1.0, 5.0], 3).tolist() == [3.0, 3.0, 4.0, 4.0, 5.0]
+
+
+def test_indicators_memoize_and_cache_by_last_candle() -> None:
+    rows = make_ohlcv(120, 2)
+    ind = Indicators(rows)
+    assert ind.rsi() is ind.rsi()
+    line, signal, hist = ind.macd()
+    assert np.allclose(hist, line - signal)
+    assert hist[-1] != 0.0  # signal line is a real EMA of the MACD series
+
+    cache = IndicatorCache(max_entries=2)
+    a = cache.get(rows, "BTCUSDT", "15")
+    assert cache.get(list(rows), "BTCUSDT", "15") is a
+    assert cache.get(rows[:-1], "BTCUSDT", "15") is not a
+    assert cache.get(rows, None, None) is not a
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cache_sees_updates_to_the_forming_bar() -> None:
+    rows = make_ohlcv(120, 3)
+    cache = IndicatorCache()
+    before = cache.get(rows, "BTCUSDT", "15")
+    assert cache.get(rows, "btcusdt", "15m") is before  # one entry whichever spelling
+
+    forming = dict(rows[-1], close=rows[-1]["close"] * 1.05, high=rows[-1]["high"] * 1.05)
+    after = cache.get(rows[:-1] + [forming], "BTCUSDT", "15m")
+    assert after is not before
+    assert after.close[-1] == forming["close"] and after.rsi()[-1] != before.rsi()[-1]
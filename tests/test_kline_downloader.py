@@ -0,0 +1,109 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from core.market_data.history import page_windows
+from core.market_data.kline_downloader import BybitAPIError, BybitKlineDownloader, TokenBucket
+
+
+class StubBybit:
+    """Local /v5/market/kline stub: 1m candles, newest first, with scripted failures."""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.requests = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                with stub.lock:
+                    stub.requests.append(q)
+                    failure = stub.failures.pop(0) if stub.failures else None
+                time.sleep(random.uniform(0, 0.01))
+                if failure == 429:
+                    self._send(429, {"retCode": 10006, "retMsg": "Too many visits!"}, {"Retry-After": "0"})
+                    return
+                if failure == 10006:
+                    self._send(200, {"retCode": 10006, "retMsg": "Too many visits!"})
+                    return
+                if failure == 10001:
+                    self._send(200, {"retCode": 10001, "retMsg": "params error"})
+                    return
+                start, end = int(q["start"]), int(q["end"])
+                rows = [[str(t), "1", "2", "0.5", str(t // 60000), "10", "0"] for t in range(start, end + 1, 60000)]
+                self._send(200, {"retCode": 0, "result": {"list": list(reversed(rows))}})
+
+            def _send(self, status, body, headers=None):
+                raw = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(raw)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    s = StubBybit()
+    yield s
+    s.close()
+
+
+def test_page_windows_cover_range_without_overlap() -> None:
+    windows = page_windows(0, 600, 60, 5)
+    assert windows == [(0, 240_000), (300_000, 540_000), (600_000, 600_000)]
+
+
+def test_concurrent_download_is_ordered_and_complete(stub) -> None:
+    dl = BybitKlineDownloader(base_url=stub.url, rate_per_sec=1000, max_workers=4, backoff=0.01)
+    candles = dl.download("BTCUSDT", "1m", 0, 60 * 999, step=60, limit=50)
+    assert [c["time"] for c in candles] == list(range(0, 60 * 1000, 60))
+    assert [c["close"] for c in candles[:3]] == [0.0, 1.0, 2.0]
+    assert len(stub.requests) == 20
+    assert stub.requests[0]["interval"] == "1"
+
+
+def test_rate_limit_codes_are_retried(stub) -> None:
+    stub.failures = [429, 10006, 10006]
+    dl = BybitKlineDownloader(base_url=stub.url, rate_per_sec=1000, max_workers=1, backoff=0.01)
+    page = dl.fetch_page("BTCUSDT", "1m", 0, 120_000, limit=3)
+    assert [c["time"] for c in page] == [0, 60, 120]
+    assert dl.stats["retries"] == 3
+    assert dl.stats["requests"] == 4
+
+
+def test_non_retryable_errors_raise(stub) -> None:
+    stub.failures = [10001]
+    dl = BybitKlineDownloader(base_url=stub.url, rate_per_sec=1000, backoff=0.01)
+    with pytest.raises(BybitAPIError) as err:
+        dl.fetch_page("BTCUSDT", "1m", 0, 60_000, limit=2)
+    assert err.value.ret_code == 10001
+    assert len(stub.requests) == 1
+
+
+def test_token_bucket_enforces_rate() -> None:
+    bucket = TokenBucket(rate=100, capacity=1)
+    t0 = time.monotonic()
+    for _ in range(21):
+        bucket.acquire()
+    assert time.monotonic() - t0 >= 0.18
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+import core.market_data.cache as cache_module
+from core.market_data.cache import OHLCV_BYTES, MarketDataCache, estimate_size
+from core.market_data.models import OHLCV
+from core.market_data.service import get_market_data_service
+
+
+def candles(n):
+    return [OHLCV(time=i * 60, open=1.0, high=2.0, low=0.5, close=1.5, volume=3.0) for i in range(n)]
+
+
+def test_entries_expire_by_ttl_without_touching_fresh_ones(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: clock[0]))
+    cache = MarketDataCache(ttl_seconds=30)
+    cache.set("a", candles(2))
+    clock[0] += 20
+    cache.set("b", candles(2))
+    cache.set("short", candles(2), ttl_seconds=5)
+
+    clock[0] += 15  # "a" (35s old) and "short" are due, "b" is not
+    assert cache.get("a") is None and cache.get("short") is None
+    assert cache.get("b") is not None
+    stats = cache.stats()
+    assert (stats["items"], stats["expirations"], stats["hits"], stats["misses"]) == (1, 2, 1, 2)
+    assert stats["bytes"] == estimate_size(candles(2))
+
+
+def test_evicts_least_recently_used_by_size():
+    size = estimate_size(candles(100))
+    cache = MarketDataCache(ttl_seconds=60, max_bytes=int(size * 3.5))
+    for key in "abc":
+        cache.set(key, candles(100))
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("d", candles(100))
+
+    assert cache.get("b") is None
+    assert all(cache.get(k) is not None for k in "acd")
+    assert cache.stats()["evictions"] == 1 and cache.bytes == 3 * size
+
+    cache.set("huge", candles(1000))  # larger than the whole cache: not stored, nothing evicted
+    assert cache.get("huge") is None and len(cache) == 3
+
+
+def test_replacing_a_key_keeps_accounting_and_heap_bounded():
+    cache = MarketDataCache(ttl_seconds=60)
+    for i in range(1000):
+        cache.set("k", candles(i % 5 + 1))
+    assert len(cache) == 1 and cache.bytes == estimate_size(candles(1000 % 5 or 5))
+    assert len(cache._expiry) <= 2 * len(cache) + 64
+
+
+def test_size_estimate_and_shared_service():
+    assert estimate_size(candles(10)) > 10 * OHLCV_BYTES
+    assert get_market_data_service() is get_market_data_service()
+    assert "cache" in get_market_data_service().stats()
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+import core.market_data.frame as frame_module
+from core.backtest.data import Candle as StoreCandle
+from core.backtest.data import columns_to_candles
+from core.backtest.types import Candle as BacktestCandle
+from core.dashboard.logic import CandleData
+from core.dashboard.service import Candle as DashboardCandle
+from core.market_data import CandleFrame
+from core.market_data.cache import estimate_size
+from core.market_data.models import OHLCV
+from core.market_data.service import MarketDataService
+from tests.test_market_data_resample import PagedProvider, make_candles
+
+
+def test_adapters_round_trip_every_candle_type():
+    candles = make_candles(50)
+    frame = CandleFrame.from_records(candles)
+    assert frame.to_ohlcv() == candles
+
+    for cls in (StoreCandle, BacktestCandle, CandleData, DashboardCandle):
+        objects = frame.to_objects(cls)
+        assert isinstance(objects[0], cls) and CandleFrame.from_records(objects) == frame
+
+    records = frame.to_records()
+    assert records[0] == {"time": candles[0].time, "open": candles[0].open, "high": candles[0].high,
+                          "low": candles[0].low, "close": candles[0].close, "volume": candles[0].volume}
+    assert CandleFrame.from_records(records) == frame
+    # feeds in milliseconds, with a missing volume
+    raw = [{"ts": str(c.time * 1000), "open": c.open, "high": c.high, "low": c.low, "close": c.close} for c in candles]
+    from_feed = CandleFrame.from_records(raw)
+    assert from_feed.ts.tolist() == frame.ts.tolist() and not from_feed.volume.any()
+
+
+def test_backtest_store_columns_load_through_the_frame():
+    cols = CandleFrame.from_records(make_candles(20)).columns(time_key="ts")
+    candles = columns_to_candles(cols)
+    assert candles[0] == StoreCandle(ts=int(cols["ts"][0]), open=float(cols["open"][0]), high=float(cols["high"][0]),
+                                     low=float(cols["low"][0]), close=float(cols["close"][0]),
+                                     volume=float(cols["volume"][0]))
+    # plain Python values, as the scalar engine and strategies expect
+    assert type(candles[-1].ts) is int and type(candles[-1].close) is float
+
+
+def test_slices_are_views_and_json_matches_records():
+    frame = CandleFrame.from_records(make_candles(100))
+    last = frame.tail(10)
+    assert len(last) == 10 and np.shares_memory(last.close, frame.close)
+    window = frame.between(int(frame.ts[20]), int(frame.ts[29]))
+    assert window.ts.tolist() == frame.ts[20:30].tolist() and np.shares_memory(window.ts, frame.ts)
+    assert len(frame[frame.close > frame.open]) == int((frame.close > frame.open).sum())
+    with pytest.raises(TypeError):
+        frame[0]
+
+    assert json.loads(frame.to_json()) == frame.to_records()
+    columns = json.loads(frame.to_json(orient="columns"))
+    assert columns["time"] == frame.ts.tolist() and columns["close"] == frame.close.tolist()
+    # 48 bytes a bar instead of an object and a dict per bar
+    assert frame.nbytes == 48 * len(frame) and estimate_size(frame) == frame.nbytes
+
+
+def test_dataframe_is_optional(monkeypatch):
+    monkeypatch.setattr(frame_module, "pd", None)
+    with pytest.raises(RuntimeError):
+        CandleFrame.from_records(make_candles(5)).to_dataframe()
+
+
+def test_service_frames_are_cached_and_read_only():
+    service = MarketDataService(providers={"test": PagedProvider(make_candles(600), native_timeframes={"1m"})})
+
+    async def scenario():
+        first = await service.get_frame("test", "BTCUSDT", "5m", limit=50)
+        second = await service.get_frame("test", "BTCUSDT", "5m", limit=50)
+        candles = await service.get_candles("test", "BTCUSDT", "5m", limit=50)
+        return first, second, candles
+
+    first, second, candles = asyncio.run(scenario())
+
+    assert first is second and len(first) == 50
+    assert isinstance(candles[0], OHLCV) and candles == first.to_ohlcv()
+    with pytest.raises(ValueError):
+        first.close[0] = 0.0
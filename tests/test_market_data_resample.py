@@ -0,0 +1,178 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import core.services.download_bybit as download_bybit
+from core.market_data.bybit_provider import BybitMarketDataProvider
+from core.market_data.models import OHLCV
+from core.market_data.provider_base import MarketDataProvider
+from core.market_data.resample import resample, to_columns, to_ohlcv
+import core.market_data.service as service_module
+from core.market_data.service import MarketDataService
+
+
+def make_candles(n, start=1_700_000_000 - 1_700_000_000 % 3600 + 23 * 60, step=60, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, n))
+    return [
+        OHLCV(time=start + i * step, open=float(c - 0.1), high=float(c + 1), low=float(c - 1), close=float(c), volume=float(i % 7 + 1))
+        for i, c in enumerate(close)
+    ]
+
+
+def reference(candles, bucket):
+    out = {}
+    for c in sorted(candles, key=lambda c: c.time):
+        b = c.time // bucket * bucket
+        if b not in out:
+            out[b] = OHLCV(b, c.open, c.high, c.low, c.close, c.volume)
+        else:
+            cur = out[b]
+            cur.high, cur.low, cur.close, cur.volume = max(cur.high, c.high), min(cur.low, c.low), c.close, cur.volume + c.volume
+    return list(out.values())
+
+
+class PagedProvider(MarketDataProvider):
+    native_timeframes = frozenset({"1m", "15m"})
+    max_page_size = 1000
+
+    def __init__(self, candles, native_timeframes=None):
+        self.candles = candles
+        if native_timeframes:
+            self.native_timeframes = frozenset(native_timeframes)
+        self.calls = []
+
+    async def get_ohlcv(self, symbol, timeframe, limit=500, since=None, end=None):
+        self.calls.append((timeframe, limit, end))
+        step = 900 if timeframe == "15m" else 60
+        rows = [c for c in self.candles if c.time % step == 0 and (end is None or c.time <= end)]
+        return rows[-limit:]
+
+
+def test_resample_matches_reference_and_flags_edges():
+    candles = make_candles(1000)
+    shuffled = candles[::-1] + candles[:10]  # unsorted, with duplicates
+    del shuffled[500:520]  # a gap inside the data
+
+    cols = resample(to_columns(shuffled), 900)
+    expected = reference({c.time: c for c in shuffled}.values(), 900)
+
+    assert to_ohlcv({k: cols[k] for k in ("time", "open", "high", "low", "close", "volume")}) == expected
+    assert cols["count"].sum() == len({c.time for c in shuffled})
+    assert not cols["complete"][0]  # data starts at :23 past the hour
+    assert cols["complete"][1:-1].all()
+    assert not cols["complete"][-1]  # 1000 minutes do not end on a 15m boundary
+    with pytest.raises(ValueError):
+        resample(cols, 90)
+
+
+def test_service_pages_enough_base_data_for_the_limit():
+    candles = make_candles(30_000)
+    provider = PagedProvider(candles, native_timeframes={"1m"})
+    service = MarketDataService(providers={"test": provider})
+
+    got = asyncio.run(service.get_candles("test", "BTCUSDT", "4h", limit=20))
+
+    assert len(got) == 20
+    assert [tf for tf, _, _ in provider.calls] == ["1m"] * 6  # 21 x 240 base bars, 1000 per page
+    assert got == reference(candles, 14400)[-20:]
+    assert got[-1].time + 14400 > candles[-1].time  # still-forming bar included
+
+    closed = asyncio.run(service.get_candles("test", "BTCUSDT", "4h", limit=20, include_partial=False))
+    assert closed == reference(candles, 14400)[-21:-1]
+
+
+def test_native_forming_bar_is_dropped_until_it_closes(monkeypatch):
+    candles = make_candles(50, start=1_700_000_000 - 1_700_000_000 % 900, step=900)
+    last = candles[-1].time
+    clock = [last + 300.0]
+    monkeypatch.setattr(service_module, "time", SimpleNamespace(time=lambda: clock[0]))
+    service = MarketDataService(providers={"test": PagedProvider(candles, native_timeframes={"15m"})})
+
+    # one 15m bar covers a 15m bucket whether or not it has closed
+    assert resample(to_columns(candles), 900, 900)["complete"][-1]
+    assert not resample(to_columns(candles), 900, 900, now=clock[0])["complete"][-1]
+
+    forming = asyncio.run(service.get_candles("test", "BTCUSDT", "15m", limit=5, include_partial=False))
+    clock[0] = last + 900.0
+    closed = asyncio.run(service.get_candles("test", "BTCUSDT", "15m", limit=5, include_partial=False))
+
+    assert [c.time for c in forming] == [c.time for c in candles[-6:-1]]
+    assert [c.time for c in closed] == [c.time for c in candles[-5:]]
+
+
+def test_service_resamples_from_the_finest_native_divisor_that_fits(monkeypatch):
+    monkeypatch.setattr(service_module, "MAX_BASE_CANDLES", 300)
+    provider = PagedProvider(make_candles(6000))
+    service = MarketDataService(providers={"test": provider})
+
+    got = asyncio.run(service.get_candles("test", "BTCUSDT", "45m", limit=10))
+    assert len(got) == 10 and all(c.time % 2700 == 0 for c in got)
+    assert {tf for tf, _, _ in provider.calls} == {"15m"}  # 11 x 45 1m bars would not fit
+
+    asyncio.run(service.get_candles("test", "BTCUSDT", "5m", limit=10))
+    assert provider.calls[-1][0] == "1m"
+    with pytest.raises(ValueError):
+        asyncio.run(service.get_candles("test", "BTCUSDT", "30s", limit=10))
+
+
+def bybit_klines(candles):
+    async def get_klines_async(symbol, interval, limit, end=None):
+        rows = [c for c in candles if end is None or c.time <= end][-limit:]
+        return [{"time": c.time * 1000, "open": c.open, "high": c.high, "low": c.low, "close": c.close, "volume": c.volume} for c in rows]
+
+    return get_klines_async
+
+
+def test_backfill_stops_where_the_exchange_history_ends(monkeypatch):
+    listed = make_candles(1000, start=1_700_000_000 - 1_700_000_000 % 3600, step=300)
+    monkeypatch.setattr(download_bybit, "get_klines_async", bybit_klines(listed))
+    provider = BybitMarketDataProvider()
+    provider.native_timeframes = frozenset({"5m"})
+    service = MarketDataService(providers={"bybit": provider})
+
+    paged = asyncio.run(provider.get_ohlcv_paged("NEWCOIN", "5m", 2500, end=listed[-1].time))
+    got = asyncio.run(service.get_candles("bybit", "NEWCOIN", "5m", limit=2000))
+
+    # no filler bars before the listing
+    assert [c.time for c in paged] == [c.time for c in listed]
+    assert [c.time for c in got] == [c.time for c in listed]
+    assert service.series[("bybit", "NEWCOIN", "5m")].exhausted
+
+
+def test_exchange_errors_raise_instead_of_filling_the_series(monkeypatch):
+    async def failing(symbol, interval, limit, end=None):
+        return {"error": "timed out"}
+
+    monkeypatch.setattr(download_bybit, "get_klines_async", failing)
+    service = MarketDataService(providers={"bybit": BybitMarketDataProvider()})
+
+    with pytest.raises(Exception, match="timed out"):
+        asyncio.run(service.get_candles("bybit", "OUTAGEUSDT", "1m", limit=20))
+    series = service.series[("bybit", "OUTAGEUSDT", "1m")]
+    assert len(series) == 0 and not series.exhausted
+
+
+def test_default_limit_dashboards_share_one_series_up_to_1h():
+    provider = BybitMarketDataProvider()
+    bases = {tf: MarketDataService._base_timeframe(provider, service_module.timeframe_to_seconds(tf), True, 500)[0]
+             for tf in ("1m", "5m", "15m", "1h", "4h")}
+    assert bases == {"1m": "1m", "5m": "1m", "15m": "1m", "1h": "1m", "4h": "3m"}
+
+
+def test_idle_series_are_evicted(monkeypatch):
+    candles = make_candles(100)
+    clock = [candles[-1].time + 30.0]
+    monkeypatch.setattr(service_module, "time", SimpleNamespace(time=lambda: clock[0]))
+    service = MarketDataService(providers={"test": PagedProvider(candles, native_timeframes={"1m"})})
+
+    asyncio.run(service.get_candles("test", "BTCUSDT", "1m", limit=20))
+    clock[0] += service_module.SERIES_IDLE_SECONDS / 2
+    asyncio.run(service.get_candles("test", "ETHUSDT", "1m", limit=20))
+    assert service.stats()["series"]["count"] == 2 and service.stats()["series"]["bytes"] > 0
+    clock[0] += service_module.SERIES_IDLE_SECONDS / 2
+    asyncio.run(service.get_candles("test", "ETHUSDT", "1m", limit=20))
+
+    assert list(service.series) == [("test", "ETHUSDT", "1m")]
@@ -0,0 +1,117 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import core.market_data.ring as ring_module
+from core.indicators import get_indicators
+from core.market_data.frame import CandleFrame
+from core.market_data.resample import to_columns
+from core.market_data.ring import CandleRing, RecentCandles
+from tests.test_market_data_resample import make_candles
+
+
+def test_ring_views_are_contiguous_zero_copy_and_wrap():
+    candles = make_candles(25)
+    ring = CandleRing(capacity=10)
+    assert ring.extend(to_columns(candles[:7])) == 7
+    view = ring.view(5)
+    assert view["time"].tolist() == [c.time for c in candles[2:7]]
+
+    ring.extend(to_columns(candles[7:12]))  # wraps; the 5-bar view survives 10 - 5 appends
+    assert view["time"].tolist() == [c.time for c in candles[2:7]]
+    assert len(ring) == 10 and ring.view()["time"].tolist() == [c.time for c in candles[2:12]]
+
+    latest = ring.view(10)
+    assert all(latest[name].base is not None for name in latest)
+    assert np.shares_memory(latest["close"], ring.view(3)["close"])
+    with pytest.raises(ValueError):
+        latest["close"][0] = 0.0
+
+    # the forming bar is updated in place, older bars are ignored, a long run keeps its tail
+    forming = candles[11]
+    ring.extend({**to_columns([forming]), "close": np.array([123.0])})
+    ring.extend(to_columns(candles[:3]))
+    assert latest["close"][-1] == 123.0 and ring.last_time == forming.time
+    ring.extend(to_columns(candles[12:]))
+    assert ring.view()["time"].tolist() == [c.time for c in candles[15:]]
+    assert ring.view(100)["close"].shape == (10,)
+
+
+class CountingService:
+    def __init__(self, candles):
+        self.candles = candles
+        self.calls = []
+
+    async def get_frame(self, exchange, symbol, timeframe, limit=500, **kwargs):
+        self.calls.append(limit)
+        await asyncio.sleep(0)
+        return CandleFrame.from_records(self.candles[-limit:])
+
+
+def test_readers_share_one_resident_copy(monkeypatch):
+    candles = make_candles(400)
+    clock = [candles[299].time + 10.0]
+    monkeypatch.setattr(ring_module, "time", SimpleNamespace(time=lambda: clock[0]))
+    service = CountingService(candles[:300])
+    recent = RecentCandles(service=service, capacity=250, refresh_seconds=60)
+
+    async def scenario():
+        windows = await asyncio.gather(
+            recent.window("bybit", "BTCUSDT", "1m", 100),
+            recent.window("bybit", "btcusdt", "1m", 200),
+            recent.window("bybit", "BTCUSDT", "1m", 50),
+        )
+        # three bars later the next read only pulls what is missing
+        service.candles = candles[:303]
+        clock[0] = candles[302].time + 10.0
+        fresh = await recent.window("bybit", "BTCUSDT", "1m", 200)
+        await recent.stop()
+        return windows, fresh
+
+    windows, fresh = asyncio.run(scenario())
+
+    assert [len(w["close"]) for w in windows] == [100, 200, 50]
+    assert np.shares_memory(windows[0]["close"], windows[1]["close"])
+    assert fresh["time"][-1] == candles[302].time and fresh["close"].tolist() == [c.close for c in candles[103:303]]
+    # one load for three readers, then a small tail fetch
+    assert service.calls[0] == 250 and len(service.calls) == 2 and service.calls[1] < 10
+    assert recent.stats()["rings"] == 1 and recent.stats()["loads"] == 1
+
+
+def test_indicators_accept_ring_columns():
+    candles = make_candles(120)
+    ring = CandleRing(capacity=200)
+    ring.extend(to_columns(candles))
+    cols = ring.view(100)
+
+    ind = get_indicators(cols, "RINGTEST", "1m")
+    assert get_indicators(cols, "RINGTEST", "1m") is ind
+    assert ind.sma(20)[-1] == pytest.approx(get_indicators(candles[-100:]).sma(20)[-1])
+    assert not np.shares_memory(ind.close, cols["close"])
+
+
+def test_ai_predict_hands_the_thread_copies_not_ring_views(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import server
+
+    ring = CandleRing(capacity=200)
+    ring.extend(to_columns(make_candles(120)))
+    seen = []
+
+    class Recent:
+        async def window(self, exchange, symbol, timeframe, limit):
+            return ring.view(limit)
+
+    async def run_in_thread(fn, *arrays):
+        seen.extend(arrays)
+        return fn(*arrays)
+
+    monkeypatch.setattr(server, "recent_candles", Recent())
+    monkeypatch.setattr(server, "run_in_thread", run_in_thread)
+
+    assert TestClient(server.app).get("/api/ai/predict?symbol=BTCUSDT&timeframe=1m").status_code == 200
+    assert len(seen) == 3
+    assert not any(np.shares_memory(a, ring.view()[name]) for a, name in zip(seen, ("close", "high", "low")))
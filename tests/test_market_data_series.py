@@ -0,0 +1,59 @@
+import asyncio
+from types import SimpleNamespace
+
+import core.market_data.service as service_module
+from core.market_data.models import OHLCV
+from core.market_data.provider_base import MarketDataProvider
+from core.market_data.service import MarketDataService
+
+START = 1_700_000_000 - 1_700_000_000 % 86400
+TIMEFRAMES = ("1m", "5m", "15m", "1h", "4h")
+
+
+class ClockProvider(MarketDataProvider):
+    """1m candles up to the fake clock; the forming bar's close is the clock itself."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.calls = []
+
+    async def get_ohlcv(self, symbol, timeframe, limit=500, since=None, end=None):
+        self.calls.append((limit, end))
+        forming = int(self.clock[0]) // 60 * 60
+        last = min(forming, int(end) // 60 * 60 if end is not None else forming)
+        first = max(START, last - (limit - 1) * 60)
+        return [
+            OHLCV(t, t / 1e4, t / 1e4 + 1, t / 1e4 - 1, (self.clock[0] if t == forming else t) / 1e4, 1.0)
+            for t in range(first, last + 1, 60)
+        ]
+
+
+def refresh_all(service):
+    return {tf: asyncio.run(service.get_candles("test", "BTCUSDT", tf, limit=50)) for tf in TIMEFRAMES}
+
+
+def test_dashboard_timeframes_share_one_base_fetch_per_minute(monkeypatch):
+    clock = [START + 20 * 86400 + 10]
+    monkeypatch.setattr(service_module, "time", SimpleNamespace(time=lambda: clock[0]))
+    provider = ClockProvider(clock)
+    service = MarketDataService(providers={"test": provider})
+    aggregated = []
+    real_aggregate = service._aggregate
+    monkeypatch.setattr(service, "_aggregate", lambda *a, **k: aggregated.append(a[1]) or real_aggregate(*a, **k))
+
+    first = refresh_all(service)
+    assert all(len(candles) == 50 for candles in first.values())
+    cold_calls = len(provider.calls)
+
+    clock[0] += 30  # same minute: no network, every timeframe served from cache
+    aggregated.clear()
+    assert refresh_all(service) == first
+    assert len(provider.calls) == cold_calls and aggregated == []
+
+    clock[0] += 60  # a new 1m bar: one small incremental fetch for all five timeframes
+    latest = refresh_all(service)
+    assert provider.calls[cold_calls:] == [(2, None)]
+    assert len(service.series) == 1
+
+    fresh = refresh_all(MarketDataService(providers={"test": ClockProvider(clock)}))
+    assert latest == fresh
@@ -0,0 +1,101 @@
+import asyncio
+
+import core.market_data.bybit_provider as bybit_provider
+from core.market_data.bybit_provider import BybitMarketDataProvider
+from core.market_data.service import MarketDataService
+from core.market_data.singleflight import SingleFlight
+from tests.test_market_data_resample import PagedProvider, make_candles
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        if value == "bad":
+            raise RuntimeError("boom")
+        return value
+
+    async def scenario():
+        same = await asyncio.gather(*(flights.do("k", lambda: fetch("x")) for _ in range(10)))
+        failed = await asyncio.gather(*(flights.do("b", lambda: fetch("bad")) for _ in range(3)), return_exceptions=True)
+
+        # a caller that gives up does not cancel the call for the others
+        first = asyncio.ensure_future(flights.do("c", lambda: fetch("y")))
+        second = asyncio.ensure_future(flights.do("c", lambda: fetch("y")))
+        await asyncio.sleep(0)
+        first.cancel()
+        return same, failed, await second
+
+    same, failed, survived = asyncio.run(scenario())
+
+    assert same == ["x"] * 10 and survived == "y"
+    assert all(isinstance(e, RuntimeError) for e in failed)
+    assert calls == ["x", "bad", "y"]
+    assert flights.stats() == {"calls": 3, "coalesced": 12, "in_flight": 0, "coalesced_ratio": 0.8}
+
+
+class SlowProvider(PagedProvider):
+    async def get_ohlcv(self, *args, **kwargs):
+        await asyncio.sleep(0.01)
+        return await super().get_ohlcv(*args, **kwargs)
+
+
+def test_dashboard_tabs_refreshing_together_fetch_once():
+    provider = SlowProvider(make_candles(3000), native_timeframes={"1m"})
+    service = MarketDataService(providers={"test": provider})
+
+    async def tabs():
+        return await asyncio.gather(
+            *(service.get_candles("test", "BTCUSDT", tf, limit=20) for tf in ("1m", "5m", "15m") * 4)
+        )
+
+    results = asyncio.run(tabs())
+
+    assert all(len(r) == 20 for r in results)
+    # twelve tabs, one fill deep enough for the 15m ones
+    assert provider.calls == [("1m", 21 * 15, None)]
+    assert service.stats()["series_refresh"]["coalesced"] == 11
+
+
+def test_bybit_provider_dedupes_identical_downloads(monkeypatch):
+    downloads = []
+
+    async def fake_download(symbol, timeframe, limit, end=None):
+        downloads.append((symbol, timeframe, limit, end))
+        await asyncio.sleep(0.01)
+        return [{"time": 1_700_000_000_000 + i * 60_000, "open": 1, "high": 2, "low": 0.5, "close": 1.5, "volume": 3} for i in range(limit)]
+
+    monkeypatch.setattr(bybit_provider, "download_klines_async", fake_download)
+    providers = [BybitMarketDataProvider() for _ in range(10)]
+
+    async def scenario():
+        return await asyncio.gather(*(p.get_ohlcv("BTCUSDT", "1m", limit=5) for p in providers))
+
+    results = asyncio.run(scenario())
+
+    assert downloads == [("BTCUSDT", "1m", 5, None)]
+    assert all(r == results[0] and r is not results[0] for r in results[1:])
+    assert results[0][0].time == 1_700_000_000  # milliseconds normalised to seconds
+
+
+def test_bybit_provider_does_not_share_results_across_ranges(monkeypatch):
+    limit = 5
+    downloads = []
+
+    async def fake_download(symbol, timeframe, limit, end=None):
+        downloads.append(end)
+        return [{"time": 1_700_000_000 + i * 60, "open": 1, "high": 2, "low": 0.5, "close": 1.5, "volume": 3} for i in range(limit)]
+
+    monkeypatch.setattr(bybit_provider, "download_klines_async", fake_download)
+    provider = BybitMarketDataProvider()
+
+    async def scenario():
+        return await asyncio.gather(
+            provider.get_ohlcv("BTCUSDT", "1m", limit=limit), provider.get_ohlcv("BTCUSDT", "1m", limit=limit, end=1_800_000_000)
+        )
+
+    asyncio.run(scenario())
+    assert sorted(downloads, key=str) == sorted([None, 1_800_000_000], key=str)
@@ -0,0 +1,237 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import core.market_data.service as service_module
+import core.market_data.stream as stream_module
+from core.market_data.service import MarketDataService
+from core.market_data.models import OHLCV
+from core.market_data.stream import BinanceKlineFeed, BybitKlineFeed, MarketDataHub, bybit_ws_url
+from tests.test_market_data_resample import PagedProvider, make_candles
+
+
+class StubSocket:
+    """In-process stand-in for an exchange websocket."""
+
+    def __init__(self):
+        self.sent = []
+        self.inbox = asyncio.Queue()
+        self.closed = False
+
+    async def send(self, text):
+        self.sent.append(json.loads(text))
+
+    async def recv(self):
+        message = await self.inbox.get()
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+    async def close(self):
+        self.closed = True
+
+
+class StubExchange:
+    def __init__(self):
+        self.sockets = []
+
+    async def connect(self, url):
+        sock = StubSocket()
+        self.sockets.append(sock)
+        return sock
+
+
+def bybit_kline(symbol, start, close, confirm=False, interval="1"):
+    return json.dumps({
+        "topic": f"kline.{interval}.{symbol}",
+        "data": [{
+            "start": start * 1000, "open": "1", "high": str(max(2, close)), "low": "0.5",
+            "close": str(close), "volume": "3", "confirm": confirm,
+        }],
+    })
+
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+def test_one_upstream_subscription_fans_out_to_every_client():
+    exchange = StubExchange()
+
+    async def scenario():
+        hub = MarketDataHub(feeds={"bybit": BybitKlineFeed()}, connect=exchange.connect)
+        clients = [hub.subscribe("bybit", "btcusdt", "1m") for _ in range(3)]
+        await settle()
+        sock = exchange.sockets[0]
+        await sock.inbox.put(bybit_kline("BTCUSDT", 600, 1.5))
+        await sock.inbox.put(bybit_kline("BTCUSDT", 600, 1.7, confirm=True))
+        await sock.inbox.put(bybit_kline("BTCUSDT", 660, 1.8))
+        await sock.inbox.put(json.dumps({"op": "pong"}))
+        await settle()
+        received = [[c.queue.get_nowait() for _ in range(c.queue.qsize())] for c in clients]
+        recent = hub.recent("bybit", "BTCUSDT", "1m")
+        for client in clients:
+            hub.unsubscribe(client)
+        await settle()
+        stats = hub.stats()
+        await hub.stop()
+        return sock, received, recent, stats
+
+    sock, received, recent, stats = asyncio.run(scenario())
+
+    assert sock.sent == [
+        {"op": "subscribe", "args": ["kline.1.BTCUSDT"]},
+        {"op": "unsubscribe", "args": ["kline.1.BTCUSDT"]},
+    ]
+    assert all(len(r) == 3 for r in received)
+    assert [(e["candle"]["time"], e["candle"]["close"], e["closed"]) for e in received[0]] == [
+        (600, 1.5, False), (600, 1.7, True), (660, 1.8, False)
+    ]
+    assert [(c.time, c.close) for c in recent] == [(600, 1.7), (660, 1.8)]
+    assert stats["messages"] == 4 and stats["updates"] == 3 and stats["subscribers"] == 0
+
+
+def test_reconnect_resubscribes_active_topics(monkeypatch):
+    monkeypatch.setattr(stream_module.asyncio, "sleep", _no_sleep(asyncio.sleep))
+    exchange = StubExchange()
+
+    async def scenario():
+        hub = MarketDataHub(feeds={"bybit": BybitKlineFeed()}, connect=exchange.connect)
+        hub.subscribe("bybit", "BTCUSDT", "1m")
+        hub.watch("bybit", "ETHUSDT", "5m")
+        await settle()
+        await exchange.sockets[0].inbox.put(ConnectionError("reset"))
+        await settle()
+        stats = hub.stats()
+        await hub.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+
+    first, second = exchange.sockets
+    assert first.closed and stats["reconnects"] == 1
+    assert sorted(second.sent[0]["args"]) == ["kline.1.BTCUSDT", "kline.5.ETHUSDT"]
+
+
+def _no_sleep(real_sleep):
+    async def sleep(delay, *args):
+        await real_sleep(0)
+
+    return sleep
+
+
+def test_binance_messages_parse_into_candles():
+    feed = BinanceKlineFeed()
+    assert feed.topic("BTCUSDT", "1h") == "btcusdt@kline_1h"
+    assert feed.subscribe_message(["btcusdt@kline_1h"]) == {"method": "SUBSCRIBE", "params": ["btcusdt@kline_1h"], "id": 1}
+    [(symbol, timeframe, candle, closed)] = feed.parse({
+        "e": "kline", "s": "BTCUSDT",
+        "k": {"t": 3_600_000, "s": "BTCUSDT", "i": "1h", "o": "1", "h": "2", "l": "0.5", "c": "1.5", "v": "9", "x": True},
+    })
+    assert (symbol, timeframe, candle.time, candle.close, candle.volume, closed) == ("BTCUSDT", "1h", 3600, 1.5, 9.0, True)
+    assert feed.parse({"result": None, "id": 1}) == []
+
+
+def test_streamed_candles_keep_the_series_fresh_without_rest(monkeypatch):
+    candles = make_candles(300)
+    clock = [candles[-1].time + 30.0]
+    monkeypatch.setattr(service_module, "time", SimpleNamespace(time=lambda: clock[0]))
+    provider = PagedProvider(candles, native_timeframes={"1m"})
+    service = MarketDataService(providers={"bybit": provider})
+    exchange = StubExchange()
+
+    async def scenario():
+        hub = MarketDataHub(feeds={"bybit": BybitKlineFeed()}, connect=exchange.connect, service=service)
+        service.hub = hub
+        await service.get_candles("bybit", "BTCUSDT", "5m", limit=20)
+        await settle()
+        sock = exchange.sockets[0]
+        last = candles[-1].time
+        # the forming bar closes, the next one opens and trades
+        clock[0] = last + 61
+        await sock.inbox.put(bybit_kline("BTCUSDT", last, 42.0, confirm=True))
+        await sock.inbox.put(bybit_kline("BTCUSDT", last + 60, 43.0))
+        # a bar far ahead of the series is a gap for REST, not the stream
+        await sock.inbox.put(bybit_kline("BTCUSDT", last + 600, 1.0))
+        await settle()
+        result = await service.get_candles("bybit", "BTCUSDT", "1m", limit=5)
+        await hub.stop()
+        return sock, result
+
+    sock, result = asyncio.run(scenario())
+
+    assert sock.sent == [{"op": "subscribe", "args": ["kline.1.BTCUSDT"]}]
+    assert len(provider.calls) == 1  # the initial fill only
+    assert [c.close for c in result[-2:]] == [42.0, 43.0]
+    assert service.series[("bybit", "BTCUSDT", "1m")].last_time == candles[-1].time + 60
+    assert result[-1].time == candles[-1].time + 60
+
+
+def test_bybit_stream_follows_the_rest_network():
+    assert bybit_ws_url("https://api-testnet.bybit.com") == "wss://stream-testnet.bybit.com/v5/public/linear"
+    assert bybit_ws_url("https://api.bybit.com") == "wss://stream.bybit.com/v5/public/linear"
+
+
+def test_watches_expire_unless_renewed(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(stream_module, "time", SimpleNamespace(time=lambda: clock[0]))
+    exchange = StubExchange()
+
+    async def scenario():
+        hub = MarketDataHub(feeds={"bybit": BybitKlineFeed()}, connect=exchange.connect, watch_idle_seconds=60)
+        hub.watch("bybit", "ETHUSDT", "1m")
+        hub.watch("bybit", "BTCUSDT", "1m")
+        hub.subscribe("bybit", "BTCUSDT", "1m")
+        await settle()
+        clock[0] += 30
+        hub.watch("bybit", "XRPUSDT", "1m")
+        clock[0] += 45
+        hub.watch("bybit", "SOLUSDT", "1m")
+        await settle()
+        stats = hub.stats()
+        await hub.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+
+    sent = exchange.sockets[0].sent
+    assert sorted(sent[0]["args"]) == ["kline.1.BTCUSDT", "kline.1.ETHUSDT"]
+    # ETH went idle; BTC did too, but a client still streams it
+    assert {"op": "unsubscribe", "args": ["kline.1.ETHUSDT"]} in sent
+    assert not any(m["op"] == "unsubscribe" and m["args"] != ["kline.1.ETHUSDT"] for m in sent)
+    assert stats["watched"] == 2 and stats["topics"] == 3
+
+
+def test_service_only_watches_symbols_with_candles():
+    exchange = StubExchange()
+    service = MarketDataService(providers={"bybit": PagedProvider([], native_timeframes={"1m"})})
+
+    async def scenario():
+        hub = MarketDataHub(feeds={"bybit": BybitKlineFeed()}, connect=exchange.connect, service=service)
+        service.hub = hub
+        candles = await service.get_candles("bybit", "NOSUCHCOIN", "1m", limit=20)
+        stats = hub.stats()
+        await hub.stop()
+        return candles, stats
+
+    candles, stats = asyncio.run(scenario())
+
+    assert candles == [] and stats["watched"] == 0 and not exchange.sockets
+
+
+def test_candle_socket_snapshot_comes_from_the_stream_without_rest(monkeypatch):
+    import server
+
+    hub = MarketDataHub(feeds={"binance": BinanceKlineFeed()}, connect=StubExchange().connect)
+    for t in (60, 120):
+        hub._publish(("binance", "BTCUSDT", "1m"), OHLCV(time=t, open=1, high=2, low=0.5, close=1.5, volume=3), True)
+    monkeypatch.setattr(server, "market_data_hub", hub)
+
+    with TestClient(server.app).websocket_connect("/ws/candles?exchange=binance&symbol=btcusdt&timeframe=1m") as ws:
+        snapshot = ws.receive_json()
+
+    assert snapshot["type"] == "snapshot"
+    assert [c["time"] for c in snapshot["candles"]] == [60, 120]
@@ -0,0 +1,45 @@
+import asyncio
+
+import core.ml.ml_service as ml_service
+from core.ml.ml_service import MLService
+from core.ml.registry import ModelRegistry
+from tests.test_indicators import make_ohlcv
+
+DATA = {f"SYM{i}": make_ohlcv(200, seed=i) for i in range(6)}
+
+
+def fake_klines(symbol, interval, limit):
+    return [dict(c) for c in DATA["SYM0"][-limit:]]
+
+
+async def fake_klines_async(symbol, interval, limit):
+    if symbol not in DATA:
+        return {"error": f"unknown symbol {symbol}"}
+    return [dict(c) for c in DATA[symbol][-limit:]]
+
+
+def test_batch_matches_single_predictions_in_one_model_call(tmp_path, monkeypatch):
+    monkeypatch.setattr(ml_service, "get_klines", fake_klines)
+    monkeypatch.setattr(ml_service, "get_klines_async", fake_klines_async)
+    service = MLService(registry=ModelRegistry(str(tmp_path)), legacy_path=str(tmp_path / "none.pkl"))
+    assert asyncio.run(service.train(limit=200))["status"] == "success"
+
+    calls = []
+    real = service.model.model.predict_proba
+    monkeypatch.setattr(service.model.model, "predict_proba", lambda X: calls.append(len(X)) or real(X))
+
+    items = [(s, "15m") for s in DATA] + [("NOPE", "15m")]
+    out = asyncio.run(service.predict_batch(items))
+
+    assert calls == [len(DATA)]
+    assert out["count"] == len(items)
+    assert [p["symbol"] for p in out["predictions"]] == [s for s, _ in items]
+    assert out["predictions"][-1]["error"] == "unknown symbol NOPE"
+    for p in out["predictions"][:-1]:
+        single = asyncio.run(service.predict(p["symbol"], "15m"))
+        assert (single["signal"], single["probabilities"]) == (p["signal"], p["probabilities"])
+
+
+def test_batch_without_model_reports_error(tmp_path):
+    service = MLService(registry=ModelRegistry(str(tmp_path)), legacy_path=str(tmp_path / "none.pkl"))
+    assert "error" in asyncio.run(service.predict_batch([("BTCUSDT", "15m")]))
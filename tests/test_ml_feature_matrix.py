@@ -0,0 +1,38 @@
+"""
+The batch feature matrix against per-window AdvancedMLStrategy.extract_features.
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from core.ml.ml_strategy import AdvancedMLStrategy
+from tests.test_indicators import make_ohlcv
+
+
+def per_window(strategy, candles, window):
+    rows = [asyncio.run(strategy.extract_features(candles[i:i + window]))[0] for i in range(len(candles) - window + 1)]
+    return np.vstack(rows)
+
+
+@pytest.mark.parametrize("window", [51, 110])
+def test_feature_matrix_matches_per_window(window):
+    strategy = AdvancedMLStrategy()
+    candles = make_ohlcv(260, seed=5)
+    # a flat stretch exercises the zero-range branches
+    for c in candles[100:130]:
+        c.update(open=50.0, high=50.0, low=50.0, close=50.0)
+
+    matrix = strategy.extract_feature_matrix(candles, window=window)
+
+    assert matrix.shape == (len(candles) - window + 1, 32)
+    np.testing.assert_allclose(matrix, per_window(strategy, candles, window), rtol=1e-7, atol=1e-9)
+
+
+def test_feature_matrix_rejects_short_input():
+    strategy = AdvancedMLStrategy()
+    with pytest.raises(ValueError):
+        strategy.extract_feature_matrix(make_ohlcv(40, seed=1), window=51)
+    with pytest.raises(ValueError):
+        strategy.extract_feature_matrix(make_ohlcv(100, seed=1), window=30)
@@ -0,0 +1,54 @@
+"""
+Incremental feature rows against the batch feature matrix.
+"""
+
+import numpy as np
+
+from core.ml.feature_matrix import feature_matrix
+from core.ml.feature_stream import FeatureStream, FeatureStreams
+from tests.test_indicators import make_ohlcv
+
+
+def columns(candles):
+    return {k: np.array([c[k] for c in candles]) for k in ("close", "high", "low", "volume")}
+
+
+def test_stream_rows_match_feature_matrix():
+    candles = make_ohlcv(300, seed=11)
+    for c in candles[120:150]:
+        c.update(open=40.0, high=40.0, low=40.0, close=40.0)
+    stream = FeatureStream(51)
+
+    rows = [r for r in (stream.update(c) for c in candles) if r is not None]
+
+    np.testing.assert_allclose(np.vstack(rows), feature_matrix(columns(candles), 51), rtol=1e-7, atol=1e-9)
+
+
+def test_forming_bar_is_replaced_not_appended():
+    candles = make_ohlcv(80, seed=3)
+    stream = FeatureStream(51)
+    stream.seed(candles[:-1])
+    stream.update(dict(candles[-1], close=candles[-1]["close"] * 0.99))
+
+    row = stream.update(candles[-1])
+
+    assert stream.last_time == candles[-1]["time"]
+    np.testing.assert_allclose(row, feature_matrix(columns(candles), 51)[-1], rtol=1e-7, atol=1e-9)
+    # a stale candle changes nothing
+    assert stream.update(candles[10]) is row
+
+
+def test_ingest_rolls_forward_and_reseeds_after_a_gap():
+    candles = make_ohlcv(200, seed=4)
+    streams = FeatureStreams()
+    expected = feature_matrix(columns(candles), 51)
+
+    assert streams.ingest("BTCUSDT", "15", candles[:30]) is None
+    streams.ingest("BTCUSDT", "15", candles[:120])
+    row = streams.ingest("BTCUSDT", "15", candles[118:123])
+    np.testing.assert_allclose(row, expected[122 - 50], rtol=1e-7, atol=1e-9)
+
+    # a short poll that skips bars cannot be applied incrementally
+    assert streams.ingest("BTCUSDT", "15", candles[150:153]) is None
+    row = streams.ingest("BTCUSDT", "15", candles[:160])
+    np.testing.assert_allclose(row, expected[159 - 50], rtol=1e-7, atol=1e-9)
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from core.market_data.history import HistoryIndex, write_history_csv
+from core.ml.walk_forward import FeatureCache, history_columns, next_bar_labels, run_walk_forward, walk_forward_folds
+from tests.test_indicators import make_ohlcv
+
+
+def test_folds_are_consecutive_and_purged():
+    folds = walk_forward_folds(1000, n_folds=4)
+
+    assert [test for _, test in folds] == [(200, 400), (400, 600), (600, 800), (800, 1000)]
+    for (train_start, train_end), (test_start, _) in folds:
+        assert train_start == 0 and train_end == test_start - 1
+
+    rolling = walk_forward_folds(1000, n_folds=2, test_size=100, train_size=300)
+    assert rolling == [((499, 799), (800, 900)), ((599, 899), (900, 1000))]
+    with pytest.raises(ValueError):
+        walk_forward_folds(50, n_folds=5)
+
+
+def test_next_bar_labels():
+    labels = next_bar_labels(np.array([100.0, 100.5, 100.4, 100.41]), threshold=0.001)
+    assert labels.tolist() == [1, 0, 0, -1]
+
+
+def test_walk_forward_reads_history_and_reuses_cached_features(tmp_path):
+    candles = make_ohlcv(900, seed=21)
+    directory = Path(tmp_path) / "history" / "bybit" / "BTCUSDT" / "15"
+    directory.mkdir(parents=True)
+    for part in (candles[:500], candles[450:]):
+        path = directory / f"{part[0]['time']}-{part[-1]['time']}.csv"
+        write_history_csv(path, part)
+        HistoryIndex(directory).register(path)
+    cols = history_columns("BTCUSDT", "15", root=str(tmp_path / "history"))
+    assert cols["ts"].tolist() == [c["time"] for c in candles]
+
+    cache = FeatureCache(str(tmp_path / "features"))
+    report = run_walk_forward("BTCUSDT", "15", columns=cols, n_folds=3, cache=cache, max_workers=1, fee_rate=0.001)
+
+    assert report["meta"]["feature_cache"]["hit"] is False
+    assert [f["fold"] for f in report["folds"]] == [1, 2, 3]
+    for fold in report["folds"]:
+        assert fold["error"] is None
+        assert 0.0 <= fold["accuracy"] <= 1.0
+        assert fold["train"]["end_ts"] < fold["test"]["start_ts"]
+        assert fold["pnl"] == pytest.approx(fold["backtest"]["final_balance"] - fold["backtest"]["initial_balance"])
+    assert report["summary"]["total_pnl"] == pytest.approx(sum(f["pnl"] for f in report["folds"]))
+
+    again = run_walk_forward("BTCUSDT", "15", columns=cols, n_folds=3, cache=cache, max_workers=1, fee_rate=0.001)
+    assert again["meta"]["feature_cache"]["hit"] is True
+    assert again["summary"] == report["summary"]
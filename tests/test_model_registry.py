@@ -0,0 +1,83 @@
+import asyncio
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+import core.ml.ml_service as ml_service
+from core.ml.ml_service import MLService
+from core.ml.registry import ModelNotFound, ModelRegistry
+
+
+def fitted(seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(200, 32))
+    y = (X[:, 0] + rng.normal(scale=0.1, size=200) > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    return LogisticRegression().fit(scaler.transform(X), y), scaler
+
+
+def test_publish_promote_and_mmap_load(tmp_path):
+    reg = ModelRegistry(str(tmp_path))
+    assert reg.current_version() is None
+    with pytest.raises(ModelNotFound):
+        reg.load()
+
+    model, scaler = fitted(0)
+    v1 = reg.publish(model, scaler, {"RSI": 1.0}, {"feature_names": ["RSI"], "metrics": {"acc": 0.5}})
+    v2 = reg.publish(*fitted(1), promote=False)
+
+    assert reg.current_version() == v1
+    assert [m["version"] for m in reg.versions()] == [v1, v2]
+    assert not any(name.startswith(".tmp") for name in os.listdir(tmp_path))
+
+    loaded = reg.load()
+    assert loaded.version == v1
+    assert loaded.meta["metrics"] == {"acc": 0.5}
+    assert isinstance(loaded.scaler.mean_, np.memmap)
+    np.testing.assert_array_equal(loaded.scaler.mean_, scaler.mean_)
+
+    reg.promote(v2)
+    assert reg.current_version() == v2
+    with pytest.raises(ModelNotFound):
+        reg.promote("nope")
+    with pytest.raises(ModelNotFound):
+        reg.load("../etc")
+
+
+def test_service_hot_reloads_promoted_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(ml_service, "RELOAD_CHECK_SECONDS", 0.0)
+    reg = ModelRegistry(str(tmp_path / "registry"))
+    service = MLService(registry=reg, legacy_path=str(tmp_path / "missing.pkl"))
+
+    asyncio.run(service.ensure_current())
+    assert service.version is None
+
+    v1 = reg.publish(*fitted(0))
+    asyncio.run(service.ensure_current())
+    assert service.version == v1
+
+    # another process promotes a new version; the next check picks it up
+    model2, scaler2 = fitted(1)
+    v2 = reg.publish(model2, scaler2)
+    asyncio.run(service.ensure_current())
+    assert service.version == v2
+    np.testing.assert_array_equal(service.model.scaler.mean_, scaler2.mean_)
+
+    asyncio.run(service.promote(v1))
+    assert service.version == v1 and reg.current_version() == v1
+
+
+def test_service_imports_legacy_pickle(tmp_path):
+    model, scaler = fitted(2)
+    legacy = tmp_path / "anton_model.pkl"
+    joblib.dump({"model": model, "scaler": scaler, "feature_importance": {}, "metadata": {"version": "1.0"}}, legacy)
+    service = MLService(registry=ModelRegistry(str(tmp_path / "registry")), legacy_path=str(legacy))
+
+    version = asyncio.run(service.reload())
+
+    assert version is not None and service.version == version
+    assert service.list_versions()["versions"][0]["source"] == "anton_model.pkl"
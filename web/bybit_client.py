@@ -1,5 +1,6 @@
 import os
-import requests
+
+from core.exchange.http_client import get_http
 
 # Testnet URLs
 BASE_URL = os.getenv("BYBIT_TESTNET_URL", "https://api-testnet.bybit.com")
@@ -42,21 +43,19 @@ def _map_interval(interval: str) -> str:
 
 
 # ---------- get klines ----------
-def get_klines(symbol: str = "BTCUSDT", interval: str = "1m", limit: int = 200):
-    url = f"{BASE_URL}/v5/market/kline"
-
+def _kline_params(symbol: str, interval: str, limit: int, end: int | None = None) -> dict:
     params = {
         "symbol": symbol,
         "interval": _map_interval(interval),
         "limit": limit
     }
+    if end is not None:
+        # unix seconds -> Bybit milliseconds (inclusive)
+        params["end"] = int(end) * 1000
+    return params
 
-    try:
-        r = requests.get(url, params=params, timeout=10)
-        data = r.json()
-    except Exception as e:
-        return {"error": str(e)}
 
+def _parse_klines(data):
     if "result" not in data or "list" not in data["result"]:
         return {"error": "bad response", "raw": data}
 
@@ -78,9 +77,32 @@ def get_klines(symbol: str = "BTCUSDT", interval: str = "1m", limit: int = 200):
     return candles
 
 
+def get_klines(symbol: str = "BTCUSDT", interval: str = "1m", limit: int = 200):
+    url = f"{BASE_URL}/v5/market/kline"
+
+    try:
+        data = get_http().get_json(url, params=_kline_params(symbol, interval, limit))
+    except Exception as e:
+        return {"error": str(e)}
+
+    return _parse_klines(data)
+
+
+async def get_klines_async(symbol: str = "BTCUSDT", interval: str = "1m", limit: int = 200, end: int | None = None):
+    """Same as get_klines, over the shared async client (no executor thread); ``end`` pages back in time."""
+    url = f"{BASE_URL}/v5/market/kline"
+
+    try:
+        data = await get_http().aget_json(url, params=_kline_params(symbol, interval, limit, end))
+    except Exception as e:
+        return {"error": str(e)}
+
+    return _parse_klines(data)
+
+
 async def fetch_ohlcv(symbol: str = "BTCUSDT", interval: str = "1m", limit: int = 200):
     """
-    Async wrapper for get_klines to fetch OHLCV data from Bybit Testnet.
+    Async fetch of OHLCV data from Bybit Testnet.
     
     Args:
         symbol: Trading pair symbol
@@ -90,11 +112,8 @@ async def fetch_ohlcv(symbol: str = "BTCUSDT", interval: str = "1m", limit: int
     Returns:
         List of candle dictionaries with time, open, high, low, close, volume
     """
-    import asyncio
     try:
-        # Run synchronous get_klines in thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        candles = await loop.run_in_executor(None, get_klines, symbol, interval, limit)
+        candles = await get_klines_async(symbol, interval, limit)
         
         if isinstance(candles, dict) and 'error' in candles:
             return []